@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Replay benchmark for lambda_handler against in-memory AWS backends
+
+Imports lambda/index.py with stubbed S3/DynamoDB/Secrets Manager and a
+freshly generated RSA key, replays a mixed request stream and reports
+p50/p95/p99 latency and requests/sec per route, plus micro-benchmarks of
+the signing path. Results are saved as JSON so runs can be compared
+across commits.
+
+Request streams are JSONL, one request per line:
+
+    {"method": "POST", "path": "/api/files/upload", "body": {"filename": "a.txt"}}
+    {"method": "GET", "path": "/api/files/download/{fileId}"}
+    {"method": "GET", "path": "/api/files", "query": {"limit": "50"}}
+
+"{fileId}" anywhere in a path or body is replaced by a random existing file.
+
+Examples:
+    python3 benchmarks/bench_handler.py                       # generated mix
+    python3 benchmarks/bench_handler.py --requests benchmarks/sample-requests.jsonl --iterations 5000
+    python3 benchmarks/bench_handler.py --latency-ms 5 --concurrency 8
+    python3 benchmarks/bench_handler.py --verify               # check every signed URL returned
+    python3 benchmarks/bench_handler.py --compare benchmarks/results/handler-abc123-....json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cloudfront_verifier import SignedUrlVerifier  # noqa: E402
+from report import compare_results, environment_info, micro_benchmark, save_results, summarize_latencies  # noqa: E402
+from stubs import load_index  # noqa: E402
+
+# Default request mix (weight, request template)
+DEFAULT_MIX = [
+    (30, {'method': 'POST', 'path': '/api/files/upload',
+          'body': {'filename': 'report.pdf', 'contentType': 'application/pdf'}}),
+    (5, {'method': 'POST', 'path': '/api/files/upload/batch',
+         'body': {'files': [{'filename': f'batch-{i}.jpg', 'contentType': 'image/jpeg'} for i in range(20)]}}),
+    (35, {'method': 'GET', 'path': '/api/files/download/{fileId}'}),
+    (5, {'method': 'POST', 'path': '/api/files/download/batch',
+         'body': {'fileIds': ['{fileId}'] * 20}}),
+    (15, {'method': 'GET', 'path': '/api/files', 'query': {'limit': '100'}}),
+    (10, {'method': 'DELETE', 'path': '/api/files/{fileId}'}),
+]
+
+
+def load_requests(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def route_label(request):
+    return request.get('route') or f"{request['method']} {request['path']}"
+
+
+class FileIdPool:
+    """Known file IDs, updated from upload/delete responses"""
+
+    def __init__(self, file_ids, rng):
+        self.file_ids = list(file_ids)
+        self.rng = rng
+        self._lock = threading.Lock()
+
+    def pick(self):
+        with self._lock:
+            return self.rng.choice(self.file_ids) if self.file_ids else 'missing-file'
+
+    def add(self, file_ids):
+        with self._lock:
+            self.file_ids.extend(file_ids)
+
+    def remove(self, file_id):
+        with self._lock:
+            try:
+                self.file_ids.remove(file_id)
+            except ValueError:
+                pass
+
+
+def substitute(value, pool):
+    if isinstance(value, str):
+        return value.replace('{fileId}', pool.pick()) if '{fileId}' in value else value
+    if isinstance(value, list):
+        return [substitute(item, pool) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, pool) for key, item in value.items()}
+    return value
+
+
+def build_event(request, pool):
+    path = substitute(request['path'], pool)
+    body = request.get('body')
+    return {
+        'httpMethod': request['method'],
+        'path': path,
+        'queryStringParameters': request.get('query'),
+        'headers': request.get('headers') or {},
+        'body': json.dumps(substitute(body, pool)) if body is not None else None,
+    }
+
+
+def track_files(request, event, response, pool):
+    """Keep the ID pool in step with uploads and deletes"""
+    if response.get('statusCode') != 200:
+        return
+    if request['method'] == 'DELETE':
+        pool.remove(event['path'].rsplit('/', 1)[-1])
+        return
+    if request['method'] == 'POST' and request['path'].startswith('/api/files/upload'):
+        body = json.loads(response['body'])
+        if 'fileId' in body:
+            pool.add([body['fileId']])
+        elif isinstance(body.get('files'), list):
+            pool.add([entry['fileId'] for entry in body['files'] if entry.get('success')])
+
+
+def seed_files(index, backends, count):
+    table = backends.table(index)
+    file_ids = []
+    for i in range(count):
+        item = index.build_upload_item(f"seed-{i}.bin", 'application/octet-stream')
+        table.items[item['file_id']] = item
+        file_ids.append(item['file_id'])
+    return file_ids
+
+
+def signed_urls(value):
+    """Every signed URL (uploadUrl/downloadUrl/...) in a decoded response body"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.endswith('Url') and isinstance(item, str):
+                yield item
+            else:
+                yield from signed_urls(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from signed_urls(item)
+
+
+def verify_response(verifier, response, failures):
+    """Check the signed URLs in a handler response like CloudFront would"""
+    if response.get('statusCode') != 200 or response.get('isBase64Encoded'):
+        return
+    for url in signed_urls(json.loads(response['body'])):
+        ok, reason = verifier.check(url)
+        if not ok:
+            failures.append({'url': url, 'reason': reason})
+
+
+def replay(index, stream, pool, concurrency, verifier=None):
+    """
+    Run the stream through lambda_handler; returns per-route latencies, errors,
+    elapsed time and signed URLs that failed verification (with a verifier)
+    """
+    latencies = {}
+    errors = {}
+    failures = []
+    lock = threading.Lock()
+    cursor = iter(stream)
+
+    def worker():
+        while True:
+            with lock:
+                request = next(cursor, None)
+            if request is None:
+                return
+            event = build_event(request, pool)
+            start = time.perf_counter()
+            response = index.lambda_handler(event, None)
+            elapsed = time.perf_counter() - start
+            label = route_label(request)
+            with lock:
+                latencies.setdefault(label, []).append(elapsed)
+                if response.get('statusCode', 500) >= 500:
+                    errors[label] = errors.get(label, 0) + 1
+            track_files(request, event, response, pool)
+            if verifier is not None:
+                verify_response(verifier, response, failures)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return latencies, errors, time.perf_counter() - start, failures
+
+
+def verify_signing_paths(index, verifier):
+    """
+    Verify the output of every signing path offline; returns failure descriptions
+    """
+    failures = []
+    saved = (index.SIGNER_IMPLEMENTATION, index.URL_EXPIRY_WINDOW)
+    try:
+        for implementation in ('fast', 'botocore'):
+            index.SIGNER_IMPLEMENTATION = implementation
+            for window in (0, 300):
+                index.URL_EXPIRY_WINDOW = window
+                for method in ('GET', 'PUT'):
+                    for key in ('uploads/verify.bin', 'uploads/x.bin?partNumber=2&uploadId=abc'):
+                        for _ in range(2):  # second GET with a window is a memoized hit
+                            url = index.generate_signed_url(key, 900, method=method)
+                            ok, reason = verifier.check(url)
+                            if not ok:
+                                failures.append(f'{implementation}/{method}/window={window} {key}: {reason}')
+        index.SIGNER_IMPLEMENTATION, index.URL_EXPIRY_WINDOW = saved
+        for url, error in index.sign_many([f'uploads/many-{i}.bin' for i in range(32)], 900):
+            ok, reason = verifier.check(url) if url else (False, error)
+            if not ok:
+                failures.append(f'sign_many: {reason}')
+
+        # The resource /api/files/cookies issues must cover sharded keys too
+        cookies = index.generate_signed_cookies('uploads/*', 900)
+        try:
+            verifier.verify_cookies(f'https://{index.CLOUDFRONT_DOMAIN}/uploads/ab/cd/0123abcd_a.jpg', cookies)
+        except Exception as e:
+            failures.append(f'cookies: {e}')
+    finally:
+        index.SIGNER_IMPLEMENTATION, index.URL_EXPIRY_WINDOW = saved
+    return failures
+
+
+def signing_micro_benchmarks(index, iterations, verifier=None):
+    """generate_signed_url and response serialization in isolation"""
+    results = {}
+    saved = (index.SIGNER_IMPLEMENTATION, index.URL_EXPIRY_WINDOW)
+    try:
+        index.URL_EXPIRY_WINDOW = 0
+        for implementation in ('fast', 'botocore'):
+            index.SIGNER_IMPLEMENTATION = implementation
+            results[f'generate_signed_url.{implementation}.canned'] = micro_benchmark(
+                lambda: index.generate_signed_url('uploads/bench_object.bin', 3600, method='GET'), iterations)
+            results[f'generate_signed_url.{implementation}.custom'] = micro_benchmark(
+                lambda: index.generate_signed_url('uploads/bench_object.bin', 900, method='PUT'), iterations)
+
+        index.SIGNER_IMPLEMENTATION = 'fast'
+        index.URL_EXPIRY_WINDOW = 300
+        results['generate_signed_url.memoized_hit'] = micro_benchmark(
+            lambda: index.generate_signed_url('uploads/bench_object.bin', 3600, method='GET'), iterations * 10)
+    finally:
+        index.SIGNER_IMPLEMENTATION, index.URL_EXPIRY_WINDOW = saved
+
+    page = {'success': True, 'count': 100, 'files': [
+        {'fileId': f'{i:08x}_file.bin', 'filename': 'file.bin', 'contentType': 'application/octet-stream',
+         'uploadedAt': '2025-10-16T10:30:00', 'status': 'pending'} for i in range(100)]}
+    results['create_response.list_page_100'] = micro_benchmark(lambda: index.create_response(200, page), iterations)
+
+    def metrics_cycle():
+        token = index.metrics.start_invocation()
+        for name in ('KeyLoad', 'DynamoDB', 'Signing', 'S3', 'Serialize'):
+            with index.metrics.phase(name):
+                pass
+        index.metrics.finish_invocation(token, 200)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results['metrics.invocation_overhead'] = micro_benchmark(metrics_cycle, iterations * 10)
+
+    if verifier is not None:
+        canned = index.generate_signed_url('uploads/bench_object.bin', 3600, method='GET')
+        custom = index.generate_signed_url('uploads/bench_object.bin', 900, method='PUT')
+        results['verifier.canned'] = micro_benchmark(lambda: verifier.verify(canned), iterations)
+        results['verifier.custom'] = micro_benchmark(lambda: verifier.verify(custom), iterations)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay benchmark for lambda_handler with stubbed AWS backends')
+    parser.add_argument('--requests', help='JSONL request stream (default: generated mix)')
+    parser.add_argument('--iterations', type=int, default=2000, help='requests to replay (default 2000)')
+    parser.add_argument('--seed-files', type=int, default=500, help='metadata items to pre-load (default 500)')
+    parser.add_argument('--concurrency', type=int, default=1, help='replay threads (default 1, like one Lambda)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per AWS call')
+    parser.add_argument('--micro-iterations', type=int, default=500, help='iterations per micro-benchmark')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='extra Lambda environment variable (repeatable)')
+    parser.add_argument('--verify', action='store_true',
+                        help='verify every signed URL offline, like CloudFront would (exit 1 on failures)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the request mix')
+    parser.add_argument('--output', help='results file (default benchmarks/results/handler-<rev>-<time>.json)')
+    parser.add_argument('--compare', help='baseline results file to diff against')
+    args = parser.parse_args()
+
+    env = dict(item.split('=', 1) for item in args.env)
+    index, backends = load_index(env=env, latency_ms=args.latency_ms)
+    rng = random.Random(args.seed)
+
+    if args.requests:
+        templates = load_requests(args.requests)
+        stream = [templates[i % len(templates)] for i in range(args.iterations)]
+    else:
+        weights = [weight for weight, _ in DEFAULT_MIX]
+        stream = rng.choices([request for _, request in DEFAULT_MIX], weights=weights, k=args.iterations)
+
+    pool = FileIdPool(seed_files(index, backends, args.seed_files), rng)
+
+    # Warm the container: key load, signer construction, first-call imports
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        index.lambda_handler({'httpMethod': 'GET', 'path': '/api/files/download/' + pool.pick()}, None)
+        index.lambda_handler({'httpMethod': 'GET', 'path': '/api/files', 'queryStringParameters': {'limit': '1'}}, None)
+
+    print(f"Replaying {len(stream)} requests (concurrency {args.concurrency}, "
+          f"backend latency {args.latency_ms}ms)...")
+    verifier = SignedUrlVerifier({index.CLOUDFRONT_KEY_PAIR_ID: backends.public_key})
+    latencies, errors, elapsed, url_failures = replay(index, stream, pool, args.concurrency,
+                                                      verifier if args.verify else None)
+
+    routes = {label: summarize_latencies(values, elapsed) for label, values in sorted(latencies.items())}
+    for label, count in errors.items():
+        routes[label]['errors'] = count
+    overall = summarize_latencies([value for values in latencies.values() for value in values], elapsed)
+
+    print("Running signing micro-benchmarks...")
+    if args.verify:
+        url_failures.extend({'path': failure} for failure in verify_signing_paths(index, verifier))
+    verified = verifier.verified
+    micro = signing_micro_benchmarks(index, args.micro_iterations, verifier)
+
+    results = {
+        'environment': environment_info(),
+        'config': {
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'latency_ms': args.latency_ms,
+            'seed_files': args.seed_files,
+            'requests': args.requests or 'generated',
+            'env': env,
+        },
+        'overall': overall,
+        'routes': routes,
+        'micro': micro,
+        'backend_calls': backends.call_counts(),
+    }
+    if args.verify:
+        results['verification'] = {'verified': verified, 'failed': url_failures[:20],
+                                   'failures': len(url_failures)}
+
+    print(f"\n{'route':<45} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rps':>9}")
+    for label, summary in list(routes.items()) + [('ALL', overall)]:
+        print(f"{label:<45} {summary['count']:>6} {summary['p50_ms']:>8.3f} {summary['p95_ms']:>8.3f} "
+              f"{summary['p99_ms']:>8.3f} {summary['rps']:>9.1f}")
+
+    print(f"\n{'micro-benchmark':<45} {'us/op':>10} {'ops/s':>12}")
+    for name, summary in micro.items():
+        print(f"{name:<45} {summary['us_per_op']:>10.2f} {summary['ops_per_sec']:>12.1f}")
+
+    path = save_results('handler', results, args.output)
+    print(f"\nResults saved to {path}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+    if args.verify:
+        print(f"\nVerified {verified} signed URL(s), {len(url_failures)} failure(s)")
+        for failure in url_failures[:10]:
+            print(f"  ✗ {failure}")
+        if url_failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
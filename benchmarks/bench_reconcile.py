@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for scripts/reconcile-storage.py against in-memory backends
+
+Seeds the stub bucket and metadata table with matching files plus a known
+amount of drift (orphan objects, stale pending and multipart rows, rows
+whose object is gone, unconfirmed uploads and too-recent entries), then:
+
+  1. runs a report-only pass and checks every category was found exactly,
+  2. runs a --fix all pass and checks the repairs,
+  3. runs a final pass that must find no fixable drift.
+
+Reports rows/sec of the parallel scan, keys/sec of the merge and the calls
+made to each backend. --run-size below the row count forces the on-disk
+spill and multi-way merge.
+
+Examples:
+    python3 benchmarks/bench_reconcile.py --files 100000
+    python3 benchmarks/bench_reconcile.py --files 200000 --run-size 20000 --segments 32 --workers 16
+    python3 benchmarks/bench_reconcile.py --latency-ms 2
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from report import environment_info, save_results  # noqa: E402
+from stubs import load_index  # noqa: E402
+
+
+def load_reconcile():
+    path = os.path.join(BENCH_DIR, '..', 'scripts', 'reconcile-storage.py')
+    spec = importlib.util.spec_from_file_location('reconcile_storage', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(index, backends, files, drift):
+    """
+    Populate matching rows/objects plus drift of each kind; returns the
+    expected finding counts
+    """
+    table = backends.table(index)
+    bucket = backends.s3._bucket(index.BUCKET_NAME)
+    now = time.time()
+    old = now - 3 * 24 * 3600
+    old_iso = (datetime.utcnow() - timedelta(days=3)).isoformat()
+
+    def row(name, status, generated=None):
+        item = index.build_upload_item(name, 'application/octet-stream')
+        item['status'] = status
+        if generated:
+            item['upload_url_generated_at'] = generated
+        table.items[item['file_id']] = item
+        return item
+
+    def obj(key, modified):
+        bucket[key] = {'Body': b'x', 'ContentType': 'application/octet-stream', 'ETag': '"0"',
+                       'LastModified': modified}
+
+    for i in range(files):
+        item = row(f"file-{i}.bin", 'uploaded')
+        obj(item['object_key'], old)
+    for i in range(drift):
+        obj(f"uploads/{i:08x}_orphan.bin", old)
+        obj(f"uploads/{i:08x}_recent.bin", now)
+        row(f"stale-{i}.bin", 'pending', old_iso)
+        row(f"in-progress-{i}.bin", 'pending')
+        row(f"missing-{i}.bin", 'uploaded')
+        obj(row(f"unconfirmed-{i}.bin", 'pending')['object_key'], now)
+
+        multipart = row(f"multipart-{i}.bin", 'uploading', old_iso)
+        upload = backends.s3.create_multipart_upload(Bucket=index.BUCKET_NAME, Key=multipart['object_key'])
+        multipart['upload_id'] = upload['UploadId']
+        multipart['ttl'] = int(old)
+
+    return {
+        'matched': files,
+        'orphan-object': drift,
+        'recent-orphan': drift,
+        'stale-upload': 2 * drift,
+        'in-progress': drift,
+        'missing-object': drift,
+        'unconfirmed': drift,
+    }
+
+
+def run_pass(reconcile, index, backends, args, fix=()):
+    reconciler = reconcile.Reconciler(
+        backends.s3, backends.dynamodb, index.BUCKET_NAME, index.TABLE_NAME,
+        segments=args.segments, workers=args.workers, run_size=args.run_size, page_size=args.page_size,
+        fix=fix, progress_seconds=0
+    )
+    summary = reconciler.run()
+    summary['error_samples'] = reconciler.errors[:5]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconciliation throughput benchmark with stubbed AWS backends')
+    parser.add_argument('--files', type=int, default=50000, help='matching files to seed (default 50000)')
+    parser.add_argument('--drift', type=int, default=500, help='entries of each drift kind (default 500)')
+    parser.add_argument('--segments', type=int, default=16, help='scan segments (default 16)')
+    parser.add_argument('--workers', type=int, default=8, help='scan workers (default 8)')
+    parser.add_argument('--run-size', type=int, default=10000, help='rows per sorted run (default 10000)')
+    parser.add_argument('--page-size', type=int, help='items per Scan call (default: whole segment)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per AWS call')
+    parser.add_argument('--output', help='results file (default benchmarks/results/reconcile-<rev>-<time>.json)')
+    args = parser.parse_args()
+
+    index, backends = load_index(latency_ms=args.latency_ms)
+    reconcile = load_reconcile()
+    print(f"Seeding {args.files} files and {args.drift} of each drift kind...")
+    expected = seed(index, backends, args.files, args.drift)
+
+    failures = []
+    passes = {}
+    for name, fix in (('report', ()), ('fix', reconcile.FIXABLE), ('verify', ())):
+        print(f"Running {name} pass...")
+        summary = run_pass(reconcile, index, backends, args, fix)
+        passes[name] = summary
+        print(f"  {summary['rows_scanned']} rows at {summary['rows_per_second']:.0f} rows/s, "
+              f"{summary['keys_merged']} keys at {summary['keys_per_second']:.0f} keys/s, "
+              f"{summary['runs']} run(s), findings {summary['findings']}")
+        if summary['errors']:
+            failures.append(f"{name}: {summary['errors']} error(s) {summary['error_samples']}")
+
+    found = passes['report']['findings']
+    for finding, count in expected.items():
+        if found.get(finding, 0) != count:
+            failures.append(f"report: expected {count} {finding}, found {found.get(finding, 0)}")
+
+    fixed = passes['fix']['fixed']
+    if fixed['objects_deleted'] != expected['orphan-object']:
+        failures.append(f"fix: deleted {fixed['objects_deleted']} objects, expected {expected['orphan-object']}")
+    rows_expected = expected['stale-upload'] + expected['missing-object']
+    if fixed['rows_deleted'] != rows_expected:
+        failures.append(f"fix: deleted {fixed['rows_deleted']} rows, expected {rows_expected}")
+    if fixed['uploads_aborted'] != args.drift or backends.s3.uploads:
+        failures.append(f"fix: aborted {fixed['uploads_aborted']} uploads, {len(backends.s3.uploads)} left open")
+
+    leftover = {finding: count for finding, count in passes['verify']['findings'].items()
+                if finding in reconcile.FIXABLE}
+    if leftover:
+        failures.append(f"verify: drift left after fixing: {leftover}")
+
+    results = {
+        'environment': environment_info(),
+        'config': {key: getattr(args, key) for key in
+                   ('files', 'drift', 'segments', 'workers', 'run_size', 'page_size', 'latency_ms')},
+        'passes': passes,
+        'backend_calls': backends.call_counts(),
+        'failures': failures,
+    }
+    path = save_results('reconcile', results, args.output)
+
+    print(f"\n{'pass':<8} {'rows':>9} {'rows/s':>10} {'keys':>9} {'keys/s':>10} {'scan s':>8} {'merge s':>8}")
+    for name, summary in passes.items():
+        print(f"{name:<8} {summary['rows_scanned']:>9} {summary['rows_per_second']:>10.0f} "
+              f"{summary['keys_merged']:>9} {summary['keys_per_second']:>10.0f} "
+              f"{summary['scan_seconds']:>8.2f} {summary['merge_seconds']:>8.2f}")
+    print(f"\nBackend calls: {json.dumps(results['backend_calls'])}")
+    print(f"Results saved to {path}")
+
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Per-request routing overhead of lambda/index.py
+
+Times the work route_request does around a handler (reading the request
+line, matching the route table, decoding the body when the route takes
+one) with every handler replaced by a no-op, for REST API (payload 1.0)
+and HTTP API / function URL (payload 2.0) events. The same requests go
+through a copy of the if/elif chain the route table replaced, which
+decoded every body before routing, as a baseline. A last set of timings
+runs whole lambda_handler invocations of the cheapest route (config),
+metrics included, against in-memory backends.
+
+Examples:
+    python3 benchmarks/bench_router.py
+    python3 benchmarks/bench_router.py --iterations 200000 --body-kb 64
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import sys
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import environment_info, micro_benchmark, save_results  # noqa: E402
+from stubs import load_index  # noqa: E402
+
+NO_CONTENT = {'statusCode': 200, 'headers': {}, 'body': ''}
+
+
+def requests(body_kb):
+    """(label, method, path, body) covering exact, prefix, nested and legacy routes"""
+    batch = json.dumps({'fileIds': [f"{i:08x}_file-{i}.bin" for i in range(max(1, body_kb * 1024 // 24))]})
+    return [
+        ('upload', 'POST', '/api/files/upload', json.dumps({'filename': 'a.txt', 'contentType': 'text/plain'})),
+        ('download', 'GET', '/api/files/download/0123abcd_report.pdf', None),
+        ('download.batch', 'POST', '/api/files/download/batch', batch),
+        ('list', 'GET', '/api/files', None),
+        ('multipart.parts', 'POST', '/api/files/multipart/0123abcd_video.mp4/parts', json.dumps({'startPart': 1})),
+        ('delete', 'DELETE', '/api/files/0123abcd_report.pdf', None),
+        ('config', 'GET', '/api/files/config', None),
+        # Percent-encoded in the v2 rawPath, decoded before matching
+        ('download.encoded', 'GET', '/api/files/download/0123abcd_quarterly report é.pdf', None),
+        ('legacy.download', 'GET', '/api/files/generate-download-url/0123abcd_report.pdf', None),
+        ('not_found', 'GET', '/api/unknown', None),
+    ]
+
+
+def event_v1(method, path, body):
+    return {'httpMethod': method, 'path': path, 'headers': {'content-type': 'application/json'}, 'body': body,
+            'isBase64Encoded': False}
+
+
+def event_v2(method, path, body):
+    return {'version': '2.0', 'rawPath': quote(path), 'rawQueryString': '', 'headers': {'content-type': 'application/json'},
+            'requestContext': {'stage': '$default', 'http': {'method': method, 'path': path}},
+            'body': body, 'isBase64Encoded': False}
+
+
+def no_op(*args):
+    return NO_CONTENT
+
+
+def no_op_routes(index):
+    """index.ROUTES with every handler replaced by no_op"""
+    routes = []
+    for methods, path, target, takes_body in index.ROUTES:
+        if isinstance(target, dict):
+            target = {key: (no_op, body) for key, (handler, body) in target.items()}
+        else:
+            target = no_op
+        routes.append((methods, path, target, takes_body))
+    return routes
+
+
+def chain_route(index, event):
+    """
+    The if/elif router the route table replaced, with no-op handlers
+    """
+    http_method = event.get('httpMethod', 'GET')
+    path = event.get('path', '')
+    body = event.get('body', '{}')
+
+    index.print(f"Request: {http_method} {path}")
+
+    if body and event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    if body:
+        try:
+            body_data = json.loads(body) if isinstance(body, str) else body
+        except ValueError:
+            body_data = {}
+    else:
+        body_data = {}
+
+    if path == '/api/files/upload' and http_method == 'POST':
+        return no_op(event, body_data)
+    elif path == '/api/files/upload/batch' and http_method == 'POST':
+        return no_op(event, body_data)
+    elif path == '/api/files/download/batch' and http_method == 'POST':
+        return no_op(event, body_data)
+    elif path.startswith('/api/files/download/'):
+        return no_op(event, path.split('/')[-1])
+    elif path == '/api/files/multipart' and http_method == 'POST':
+        return no_op(event, body_data)
+    elif path.startswith('/api/files/multipart/'):
+        segments = path[len('/api/files/multipart/'):].split('/')
+        action = segments[1] if len(segments) > 1 else ''
+        if action == '' and http_method == 'GET':
+            return no_op(event, segments[0])
+        elif action in ('parts', 'complete') and http_method == 'POST':
+            return no_op(event, segments[0], body_data)
+        elif (action == 'abort' and http_method == 'POST') or (action == '' and http_method == 'DELETE'):
+            return no_op(event, segments[0])
+        return index.create_response(404, {'error': 'Not found', 'path': path})
+    elif path == '/api/files/delete/batch' and http_method == 'POST':
+        return no_op(event, body_data)
+    elif path == '/api/files' and http_method == 'GET':
+        return no_op(event)
+    elif path.startswith('/api/files/') and http_method == 'DELETE':
+        return no_op(event, path.split('/')[-1])
+    elif path == '/api/files/cookies' and http_method in ('GET', 'POST'):
+        return no_op(event, body_data)
+    elif path == '/api/files/config':
+        return no_op(event)
+    elif path == '/api/files/generate-upload-url':
+        return no_op(event, body_data)
+    elif path.startswith('/api/files/generate-download-url/'):
+        return no_op(event, path.split('/')[-1])
+    elif path == '/api/files/list':
+        return no_op(event)
+    elif path.startswith('/api/files/delete/'):
+        return no_op(event, path.split('/')[-1])
+    return index.create_response(404, {'error': 'Not found', 'path': path})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Routing overhead benchmark')
+    parser.add_argument('--iterations', type=int, default=50000, help='calls per timing (default 50000)')
+    parser.add_argument('--body-kb', type=int, default=16, help='size of the batch request body (default 16)')
+    parser.add_argument('--output', help='results file (default benchmarks/results/router-<rev>-<time>.json)')
+    args = parser.parse_args()
+
+    index, backends = load_index()
+    # Per-request log lines would dominate the timings
+    index.print = lambda *args, **kwargs: None
+    compiled = index.ROUTES, index.ROUTE_TABLE, index.ROUTE_PREFIXES, index.ROUTE_METHODS
+    index.ROUTES = no_op_routes(index)
+    index.ROUTE_TABLE, index.ROUTE_PREFIXES, index.ROUTE_METHODS = index.compile_routes(index.ROUTES)
+
+    results = {}
+    print(f"{'request':<18} {'chain us':>9} {'v1 us':>9} {'v2 us':>9}")
+    for label, method, path, body in requests(args.body_kb):
+        v1 = event_v1(method, path, body)
+        v2 = event_v2(method, path, body)
+        timings = {
+            'chain': micro_benchmark(lambda: chain_route(index, v1), args.iterations),
+            'v1': micro_benchmark(lambda: index.route_request(v1), args.iterations),
+            'v2': micro_benchmark(lambda: index.route_request(v2), args.iterations),
+        }
+        results[f'route.{label}'] = timings
+        print(f"{label:<18} {timings['chain']['us_per_op']:>9.2f} {timings['v1']['us_per_op']:>9.2f} "
+              f"{timings['v2']['us_per_op']:>9.2f}")
+
+    index.ROUTES, index.ROUTE_TABLE, index.ROUTE_PREFIXES, index.ROUTE_METHODS = compiled
+    config_v1 = event_v1('GET', '/api/files/config', None)
+    config_v2 = event_v2('GET', '/api/files/config', None)
+    handler_iterations = max(1, args.iterations // 10)
+    # EMF lines go to stdout
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, event in (('v1', config_v1), ('v2', config_v2)):
+            results[f'lambda_handler.config.{name}'] = micro_benchmark(lambda: index.lambda_handler(event, None),
+                                                                       handler_iterations)
+    print(f"\nlambda_handler config: v1 {results['lambda_handler.config.v1']['us_per_op']:.2f} us, "
+          f"v2 {results['lambda_handler.config.v2']['us_per_op']:.2f} us")
+
+    path = save_results('router', {
+        'environment': environment_info(),
+        'config': {'iterations': args.iterations, 'body_kb': args.body_kb},
+        'results': results,
+    }, args.output)
+    print(f"Results saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
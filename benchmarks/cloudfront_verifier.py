@@ -0,0 +1,225 @@
+"""
+Offline verifier for CloudFront signed URLs and signed cookies
+
+Checks what the edge checks, without a distribution: the Expires/Policy,
+Signature and Key-Pair-Id parameters are parsed, CloudFront-safe base64 is
+undone, the RSA-SHA1 (PKCS#1 v1.5) signature is verified against the public
+key registered for the key pair, and the policy's resource (with * and ?
+wildcards), DateLessThan, DateGreaterThan and IpAddress conditions are
+enforced. Intentionally independent of lambda/fast_signer.py, so it can
+catch mistakes in the signing fast paths.
+
+    from cloudfront_verifier import SignedUrlVerifier
+    verifier = SignedUrlVerifier({'KLOCALTESTKEY': backends.public_key})
+    claims = verifier.verify(url)          # raises InvalidSignature
+    ok, reason = verifier.check(url)
+
+A 2048-bit key verifies in tens of microseconds, so thousands of URLs per
+second can be checked from a load test or benchmark.
+"""
+
+import base64
+import ipaddress
+import json
+import re
+import time
+from functools import lru_cache
+
+SIGNING_PARAMS = ('Expires', 'Policy', 'Signature', 'Key-Pair-Id')
+COOKIE_NAMES = ('CloudFront-Expires', 'CloudFront-Policy', 'CloudFront-Signature', 'CloudFront-Key-Pair-Id')
+
+_REVERSE_TABLE = bytes.maketrans(b'-_~', b'+=/')
+
+
+class InvalidSignature(Exception):
+    """The request would be rejected by CloudFront (403)"""
+
+    def __init__(self, reason, message):
+        super().__init__(f"{reason}: {message}")
+        self.reason = reason
+
+
+def cloudfront_b64decode(value):
+    """
+    Decode CloudFront-safe base64 ('-' for '+', '_' for '=', '~' for '/')
+    """
+    try:
+        return base64.b64decode(value.encode('ascii').translate(_REVERSE_TABLE), validate=True)
+    except (ValueError, UnicodeEncodeError) as e:
+        raise InvalidSignature('malformed', f'invalid CloudFront base64: {e}')
+
+
+@lru_cache(maxsize=1024)
+def _wildcard_pattern(resource):
+    # CloudFront wildcards: * matches any run of characters, ? exactly one;
+    # everything else (including [ and ]) is literal
+    parts = ['.*' if char == '*' else '.' if char == '?' else re.escape(char) for char in resource]
+    return re.compile(''.join(parts) + r'\Z', re.DOTALL)
+
+
+def resource_matches(resource, url):
+    """
+    True when a policy Resource (possibly with * and ? wildcards) covers url
+    """
+    if '*' not in resource and '?' not in resource:
+        return resource == url
+    return _wildcard_pattern(resource).match(url) is not None
+
+
+def split_signed_url(url):
+    """
+    Separate a signed URL into (base_url, {signing param: value})
+    The base URL keeps any other query parameters in their original order,
+    which is what the policy resource is compared with
+    """
+    base, _, query = url.partition('?')
+    kept = []
+    params = {}
+    for pair in query.split('&') if query else []:
+        name, _, value = pair.partition('=')
+        if name in SIGNING_PARAMS:
+            if name in params:
+                raise InvalidSignature('malformed', f'duplicate {name} parameter')
+            params[name] = value
+        else:
+            kept.append(pair)
+    return (f"{base}?{'&'.join(kept)}" if kept else base), params
+
+
+def canned_policy(resource, expires):
+    """
+    The policy CloudFront reconstructs for a canned-policy signature
+    """
+    return ('{"Statement":[{"Resource":%s,"Condition":{"DateLessThan":{"AWS:EpochTime":%d}}}]}'
+            % (json.dumps(resource), expires)).encode('utf-8')
+
+
+class SignedUrlVerifier:
+    """
+    Verifies signed URLs/cookies against public keys by key-pair ID
+
+    public_keys maps key-pair ID to a cryptography RSA public key or PEM
+    (str/bytes). clock returns the current Unix time.
+    """
+
+    def __init__(self, public_keys, clock=time.time):
+        from cryptography.exceptions import InvalidSignature as CryptoInvalidSignature
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        self._keys = {}
+        for key_id, key in public_keys.items():
+            if isinstance(key, str):
+                key = key.encode('ascii')
+            if isinstance(key, bytes):
+                key = serialization.load_pem_public_key(key)
+            self._keys[key_id] = key
+        self._padding = padding.PKCS1v15()
+        self._hash = hashes.SHA1()
+        self._crypto_error = CryptoInvalidSignature
+        self.clock = clock
+        self.verified = 0
+        self.rejected = 0
+
+    def add_key(self, key_id, public_key):
+        self._keys[key_id] = public_key
+
+    def verify(self, url, source_ip=None, now=None):
+        """
+        Verify a signed URL; returns the policy claims
+        ({'resource', 'expires', 'not_before', 'ip', 'key_id', 'policy': 'canned'|'custom'})
+        Raises InvalidSignature with a reason code on any failure
+        """
+        base_url, params = split_signed_url(url)
+        return self._verify(base_url, params.get('Expires'), params.get('Policy'),
+                            params.get('Signature'), params.get('Key-Pair-Id'), source_ip, now)
+
+    def verify_cookies(self, url, cookies, source_ip=None, now=None):
+        """
+        Verify a request for url carrying signed cookies (dict of cookie values)
+        """
+        base_url, params = split_signed_url(url)
+        if params:
+            raise InvalidSignature('malformed', 'URL carries signing parameters as well as cookies')
+        values = [cookies.get(name) for name in COOKIE_NAMES]
+        return self._verify(base_url, *values, source_ip=source_ip, now=now)
+
+    def check(self, url, source_ip=None, now=None):
+        """
+        (True, claims) or (False, reason) instead of raising
+        """
+        try:
+            return True, self.verify(url, source_ip, now)
+        except InvalidSignature as e:
+            return False, e.reason
+
+    def _verify(self, base_url, expires, policy, signature, key_id, source_ip=None, now=None):
+        try:
+            claims = self._check(base_url, expires, policy, signature, key_id, source_ip,
+                                 self.clock() if now is None else now)
+        except InvalidSignature:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        return claims
+
+    def _check(self, base_url, expires, policy, signature, key_id, source_ip, now):
+        if not signature or not key_id:
+            raise InvalidSignature('missing-parameter', 'Signature and Key-Pair-Id are required')
+        if (expires is None) == (policy is None):
+            raise InvalidSignature('missing-parameter', 'exactly one of Expires and Policy is required')
+
+        public_key = self._keys.get(key_id)
+        if public_key is None:
+            raise InvalidSignature('unknown-key', f'no trusted key {key_id}')
+
+        if expires is not None:
+            if not expires.isdigit():
+                raise InvalidSignature('malformed', 'Expires must be a Unix timestamp')
+            claims = {'policy': 'canned', 'resource': base_url, 'expires': int(expires),
+                      'not_before': None, 'ip': None}
+            document = canned_policy(base_url, claims['expires'])
+        else:
+            document = cloudfront_b64decode(policy)
+            claims = self._parse_policy(document)
+
+        try:
+            public_key.verify(cloudfront_b64decode(signature), document, self._padding, self._hash)
+        except self._crypto_error:
+            raise InvalidSignature('bad-signature', 'signature does not match the policy')
+
+        if not resource_matches(claims['resource'], base_url):
+            raise InvalidSignature('resource-mismatch', f"{base_url} is not covered by {claims['resource']}")
+        if now >= claims['expires']:
+            raise InvalidSignature('expired', f"expired at {claims['expires']}")
+        if claims['not_before'] is not None and now < claims['not_before']:
+            raise InvalidSignature('not-yet-valid', f"valid from {claims['not_before']}")
+        if claims['ip'] is not None:
+            if source_ip is None:
+                raise InvalidSignature('ip-mismatch', f"policy requires a source IP in {claims['ip']}")
+            if ipaddress.ip_address(source_ip) not in ipaddress.ip_network(claims['ip'], strict=False):
+                raise InvalidSignature('ip-mismatch', f"{source_ip} is not in {claims['ip']}")
+
+        claims['key_id'] = key_id
+        return claims
+
+    @staticmethod
+    def _parse_policy(document):
+        try:
+            statements = json.loads(document)['Statement']
+            if len(statements) != 1:
+                raise InvalidSignature('malformed-policy', 'policy must have exactly one statement')
+            statement = statements[0]
+            condition = statement['Condition']
+            return {
+                'policy': 'custom',
+                'resource': statement.get('Resource', '*'),
+                'expires': int(condition['DateLessThan']['AWS:EpochTime']),
+                'not_before': (int(condition['DateGreaterThan']['AWS:EpochTime'])
+                               if 'DateGreaterThan' in condition else None),
+                'ip': condition['IpAddress']['AWS:SourceIp'] if 'IpAddress' in condition else None,
+            }
+        except InvalidSignature:
+            raise
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            raise InvalidSignature('malformed-policy', f'unreadable policy: {e!r}')
@@ -0,0 +1,114 @@
+"""
+Shared helpers for benchmark scripts: latency summaries, result files and
+comparisons across commits
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize_latencies(latencies_s, elapsed_s=None):
+    """p50/p95/p99/mean/max in milliseconds plus requests/sec"""
+    values = sorted(latencies_s)
+    count = len(values)
+    total = elapsed_s if elapsed_s is not None else sum(values)
+    return {
+        'count': count,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'mean_ms': round(sum(values) / count * 1000, 3) if count else 0.0,
+        'max_ms': round(values[-1] * 1000, 3) if count else 0.0,
+        'rps': round(count / total, 1) if total else 0.0,
+    }
+
+
+def micro_benchmark(func, iterations=1000, warmup=50):
+    """Time func() per call; returns microseconds per op and ops/sec"""
+    for _ in range(warmup):
+        func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return {
+        'iterations': iterations,
+        'us_per_op': round(elapsed / iterations * 1e6, 2),
+        'ops_per_sec': round(iterations / elapsed, 1),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def environment_info():
+    return {
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def save_results(name, results, output=None):
+    """Write results JSON; default path is benchmarks/results/<name>-<rev>-<time>.json"""
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime())
+        output = os.path.join(RESULTS_DIR, f"{name}-{results['environment']['git_revision']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return output
+
+
+def _flatten(data, prefix=''):
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare_results(baseline_path, current, fields=('p50_ms', 'p95_ms', 'p99_ms', 'rps', 'us_per_op', 'ops_per_sec')):
+    """Print metric deltas between a saved baseline and the current results"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    before = _flatten({k: v for k, v in baseline.items() if k != 'environment'})
+    after = _flatten({k: v for k, v in current.items() if k != 'environment'})
+
+    print(f"\nComparison against {baseline_path} "
+          f"({baseline.get('environment', {}).get('git_revision', '?')} -> "
+          f"{current.get('environment', {}).get('git_revision', '?')})")
+    print(f"{'metric':<60} {'baseline':>12} {'current':>12} {'delta':>9}")
+    for path in sorted(set(before) & set(after)):
+        if path.rsplit('.', 1)[-1] not in fields:
+            continue
+        old, new = before[path], after[path]
+        delta = ((new - old) / old * 100) if old else 0.0
+        print(f"{path:<60} {old:>12.3f} {new:>12.3f} {delta:>+8.1f}%")
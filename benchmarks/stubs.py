@@ -0,0 +1,666 @@
+"""
+In-memory stand-ins for the AWS services used by lambda/index.py
+
+Lets lambda_handler run locally (benchmarks, the local server, offline
+tools) without network access. The stubs implement the subset of the boto3
+client/resource API the Lambda uses, with DynamoDB-style pagination and
+optional per-call latency to model network round trips.
+
+    from stubs import load_index
+    index, backends = load_index()
+    index.lambda_handler({'httpMethod': 'GET', 'path': '/api/files'}, None)
+"""
+
+import base64
+import hashlib
+import importlib
+import os
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+# Configuration index.py reads at import time
+DEFAULT_ENV = {
+    'BUCKET_NAME': 'local-bucket',
+    'TABLE_NAME': 'local-files-metadata',
+    'CONTENT_INDEX_TABLE_NAME': 'local-content-index',
+    'CLOUDFRONT_DOMAIN': 'cdn.local.test',
+    'CLOUDFRONT_KEY_PAIR_ID': 'KLOCALTESTKEY',
+    'PRIVATE_KEY_SECRET_ARN': 'arn:aws:secretsmanager:us-east-1:000000000000:secret:local-key',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+
+
+def client_error(code, message, operation):
+    """Build the botocore ClientError real clients raise"""
+    from botocore.exceptions import ClientError
+    status = 404 if code in ('NoSuchKey', '404', 'NoSuchUpload', 'ResourceNotFoundException') else 400
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation
+    )
+
+
+class StubService:
+    """Shared lock, call counting and simulated latency"""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.calls = {}
+        self._lock = threading.RLock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------------
+
+def evaluate_condition(condition, item):
+    """Evaluate a boto3.dynamodb.conditions expression against an item"""
+    from boto3.dynamodb.conditions import AttributeBase
+
+    operator = condition.expression_operator
+    values = condition._values
+
+    if operator == 'AND':
+        return all(evaluate_condition(value, item) for value in values)
+    if operator == 'OR':
+        return any(evaluate_condition(value, item) for value in values)
+    if operator == 'NOT':
+        return not evaluate_condition(values[0], item)
+
+    def resolve(value):
+        return item.get(value.name) if isinstance(value, AttributeBase) else value
+
+    name = values[0].name
+    if operator == 'attribute_exists':
+        return name in item
+    if operator == 'attribute_not_exists':
+        return name not in item
+    if name not in item:
+        return operator == '<>'
+
+    left = item[name]
+    if operator == '=':
+        return left == resolve(values[1])
+    if operator == '<>':
+        return left != resolve(values[1])
+    if operator == '<':
+        return left < resolve(values[1])
+    if operator == '<=':
+        return left <= resolve(values[1])
+    if operator == '>':
+        return left > resolve(values[1])
+    if operator == '>=':
+        return left >= resolve(values[1])
+    if operator == 'BETWEEN':
+        return resolve(values[1]) <= left <= resolve(values[2])
+    if operator == 'begins_with':
+        return str(left).startswith(resolve(values[1]))
+    if operator == 'contains':
+        return resolve(values[1]) in left
+    if operator == 'IN':
+        return left in resolve(values[1])
+    raise NotImplementedError(f"Condition operator {operator} not supported by stub")
+
+
+def _project(item, projection, attribute_names=None):
+    if not projection:
+        return dict(item)
+    attribute_names = attribute_names or {}
+    names = [attribute_names.get(name.strip(), name.strip()) for name in projection.split(',')]
+    return {name: item[name] for name in names if name in item}
+
+
+class StubTable:
+    """Subset of boto3's DynamoDB Table resource"""
+
+    def __init__(self, service, name, hash_key='file_id', indexes=None):
+        self.service = service
+        self.name = name
+        self.hash_key = hash_key
+        # index name -> (hash key, range key)
+        self.indexes = indexes or {}
+        self.items = {}
+
+    def _key(self, key):
+        return key[self.hash_key]
+
+    def _check(self, condition, item):
+        if condition is not None and not evaluate_condition(condition, item or {}):
+            raise client_error('ConditionalCheckFailedException', 'The conditional request failed', 'PutItem')
+
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        self.service._call('PutItem')
+        with self.service._lock:
+            self._check(ConditionExpression, self.items.get(self._key(Item)))
+            self.items[self._key(Item)] = dict(Item)
+        return {}
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.service._call('GetItem')
+        with self.service._lock:
+            item = self.items.get(self._key(Key))
+            return {'Item': _project(item, ProjectionExpression, ExpressionAttributeNames)} if item is not None else {}
+
+    def delete_item(self, Key, ReturnValues='NONE', ConditionExpression=None, **kwargs):
+        self.service._call('DeleteItem')
+        with self.service._lock:
+            self._check(ConditionExpression, self.items.get(self._key(Key)))
+            old = self.items.pop(self._key(Key), None)
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            return {'Attributes': old}
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        """Supports 'SET a = :v, b = b + :n' and 'REMOVE a' clauses"""
+        self.service._call('UpdateItem')
+        values = ExpressionAttributeValues or {}
+        names = ExpressionAttributeNames or {}
+
+        with self.service._lock:
+            current = self.items.get(self._key(Key))
+            self._check(ConditionExpression, current)
+            item = dict(current) if current is not None else dict(Key)
+
+            for clause, body in _split_update_expression(UpdateExpression):
+                for assignment in body:
+                    if clause == 'REMOVE':
+                        item.pop(names.get(assignment, assignment), None)
+                        continue
+                    target, expression = [part.strip() for part in assignment.split('=', 1)]
+                    value = _evaluate_update_value(expression, item, values, names)
+                    path = [names.get(part, part) for part in target.split('.')]
+                    if len(path) == 1:
+                        item[path[0]] = value
+                        continue
+                    # Nested map attribute (parent maps must already exist, as in DynamoDB)
+                    parent = item
+                    for name in path[:-1]:
+                        if not isinstance(parent.get(name), dict):
+                            raise client_error('ValidationException', 'The document path provided in the '
+                                               'update expression is invalid for update', 'UpdateItem')
+                        parent[name] = dict(parent[name])
+                        parent = parent[name]
+                    parent[path[-1]] = value
+
+            self.items[self._key(Key)] = item
+
+        if ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+            return {'Attributes': dict(item)}
+        if ReturnValues == 'ALL_OLD' and current is not None:
+            return {'Attributes': dict(current)}
+        return {}
+
+    def _page(self, rows, key_fields, Limit=None, ExclusiveStartKey=None, order=None, reverse=False):
+        """Apply ExclusiveStartKey/Limit to rows already ordered by order(row)"""
+        if ExclusiveStartKey:
+            order = order or (lambda row: row[self.hash_key])
+            start = order(ExclusiveStartKey)
+            rows = [row for row in rows if (order(row) < start if reverse else order(row) > start)]
+        if Limit is not None and len(rows) > Limit:
+            page = rows[:Limit]
+            return page, {field: page[-1][field] for field in key_fields if field in page[-1]}
+        return rows, None
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, FilterExpression=None,
+             Segment=None, TotalSegments=None, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.service._call('Scan')
+        with self.service._lock:
+            rows = [self.items[key] for key in sorted(self.items)]
+        if TotalSegments:
+            rows = [row for row in rows if zlib.crc32(str(self._key(row)).encode('utf-8')) % TotalSegments == Segment]
+
+        page, last_key = self._page(rows, [self.hash_key], Limit, ExclusiveStartKey)
+        items = [row for row in page if FilterExpression is None or evaluate_condition(FilterExpression, row)]
+        response = {'Items': [_project(row, ProjectionExpression, ExpressionAttributeNames) for row in items],
+                    'Count': len(items), 'ScannedCount': len(page)}
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    def query(self, KeyConditionExpression, IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, **kwargs):
+        self.service._call('Query')
+        hash_key, range_key = self.indexes[IndexName] if IndexName else (self.hash_key, None)
+        with self.service._lock:
+            rows = [row for row in self.items.values()
+                    if hash_key in row and evaluate_condition(KeyConditionExpression, row)]
+        if range_key:
+            rows = [row for row in rows if range_key in row]
+            order = lambda row: (row[range_key], self._key(row))
+        else:
+            order = lambda row: self._key(row)
+        rows.sort(key=order, reverse=not ScanIndexForward)
+
+        key_fields = [field for field in (self.hash_key, hash_key, range_key) if field]
+        key_fields = list(dict.fromkeys(key_fields))
+        page, last_key = self._page(rows, key_fields, Limit, ExclusiveStartKey, order, not ScanIndexForward)
+        items = [row for row in page if FilterExpression is None or evaluate_condition(FilterExpression, row)]
+        response = {'Items': [_project(row, ProjectionExpression, ExpressionAttributeNames) for row in items],
+                    'Count': len(items), 'ScannedCount': len(page)}
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+
+def _split_update_expression(expression):
+    """Split 'SET a = :a, b = :b REMOVE c' into [('SET', [...]), ('REMOVE', [...])]"""
+    clauses = []
+    for token in expression.replace('\n', ' ').split(' '):
+        if token.upper() in ('SET', 'REMOVE', 'ADD'):
+            clauses.append([token.upper(), ''])
+        elif clauses:
+            clauses[-1][1] += ' ' + token
+    return [(clause, [part.strip() for part in _split_top_level(body) if part.strip()])
+            for clause, body in clauses]
+
+
+def _split_top_level(text):
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _evaluate_update_value(expression, item, values, names):
+    def operand(token):
+        token = token.strip()
+        if token.startswith(':'):
+            return values[token]
+        if token.startswith('if_not_exists('):
+            attribute, default = token[len('if_not_exists('):-1].split(',', 1)
+            attribute = names.get(attribute.strip(), attribute.strip())
+            return item[attribute] if attribute in item else operand(default)
+        if token.startswith('list_append('):
+            first, second = _split_top_level(token[len('list_append('):-1])
+            return list(operand(first)) + list(operand(second))
+        return item.get(names.get(token, token))
+
+    for sign in (' + ', ' - '):
+        if sign in expression:
+            left, right = expression.split(sign, 1)
+            return operand(left) + operand(right) if sign == ' + ' else operand(left) - operand(right)
+    return operand(expression)
+
+
+class StubDynamoDB(StubService):
+    """Subset of boto3.resource('dynamodb')"""
+
+    def __init__(self, latency_ms=0.0, indexes=None, unprocessed_rate=0.0, hash_keys=None):
+        super().__init__(latency_ms)
+        self.tables = {}
+        self.default_indexes = indexes or {}
+        # table name -> partition key attribute (default file_id)
+        self.hash_keys = hash_keys or {}
+        # Fraction of batch requests to hand back as unprocessed (throttling)
+        self.unprocessed_rate = unprocessed_rate
+        self._random = __import__('random').Random(0)
+
+    def Table(self, name):
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = StubTable(self, name, hash_key=self.hash_keys.get(name, 'file_id'),
+                                              indexes=dict(self.default_indexes))
+            return self.tables[name]
+
+    def _throttled(self):
+        return self.unprocessed_rate and self._random.random() < self.unprocessed_rate
+
+    def batch_write_item(self, RequestItems, **kwargs):
+        self._call('BatchWriteItem')
+        unprocessed = {}
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise client_error('ValidationException', 'Too many items requested', 'BatchWriteItem')
+            table = self.Table(table_name)
+            for request in requests:
+                if self._throttled():
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                with self._lock:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        table.items[table._key(item)] = dict(item)
+                    else:
+                        table.items.pop(table._key(request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': unprocessed}
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._call('BatchGetItem')
+        responses = {}
+        unprocessed = {}
+        for table_name, request in RequestItems.items():
+            if len(request['Keys']) > 100:
+                raise client_error('ValidationException', 'Too many items requested', 'BatchGetItem')
+            table = self.Table(table_name)
+            responses[table_name] = []
+            for key in request['Keys']:
+                if self._throttled():
+                    unprocessed.setdefault(table_name, {'Keys': []})['Keys'].append(key)
+                    continue
+                with self._lock:
+                    item = table.items.get(table._key(key))
+                if item is not None:
+                    responses[table_name].append(_project(item, request.get('ProjectionExpression')))
+        return {'Responses': responses, 'UnprocessedKeys': unprocessed}
+
+
+# ---------------------------------------------------------------------------
+# S3
+# ---------------------------------------------------------------------------
+
+class StubS3(StubService):
+    """Subset of boto3.client('s3')"""
+
+    def __init__(self, latency_ms=0.0):
+        super().__init__(latency_ms)
+        self.buckets = {}
+        self.uploads = {}
+
+    def _bucket(self, name):
+        with self._lock:
+            return self.buckets.setdefault(name, {})
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType='binary/octet-stream', ChecksumSHA256=None, **kwargs):
+        self._call('PutObject')
+        body = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        obj = {'Body': body, 'ContentType': ContentType, 'ETag': etag, 'LastModified': time.time()}
+        if ChecksumSHA256 is not None:
+            # S3 rejects bodies that do not match the x-amz-checksum-sha256 header
+            if ChecksumSHA256 != base64.b64encode(hashlib.sha256(body).digest()).decode('ascii'):
+                raise client_error('BadDigest', 'The SHA256 you specified did not match the calculated checksum.',
+                                   'PutObject')
+            obj['ChecksumSHA256'] = ChecksumSHA256
+        with self._lock:
+            self._bucket(Bucket)[Key] = obj
+        return {'ETag': etag}
+
+    def head_object(self, Bucket, Key, ChecksumMode=None, **kwargs):
+        self._call('HeadObject')
+        obj = self._bucket(Bucket).get(Key)
+        if obj is None:
+            raise client_error('404', 'Not Found', 'HeadObject')
+        response = {'ContentLength': len(obj['Body']), 'ETag': obj['ETag'], 'ContentType': obj['ContentType']}
+        if ChecksumMode == 'ENABLED' and 'ChecksumSHA256' in obj:
+            response['ChecksumSHA256'] = obj['ChecksumSHA256']
+        return response
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._call('GetObject')
+        obj = self._bucket(Bucket).get(Key)
+        if obj is None:
+            raise client_error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+        import io
+        return {'Body': io.BytesIO(obj['Body']), 'ContentLength': len(obj['Body']), 'ETag': obj['ETag']}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call('DeleteObject')
+        with self._lock:
+            self._bucket(Bucket).pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call('DeleteObjects')
+        objects = Delete['Objects']
+        if len(objects) > 1000:
+            raise client_error('MalformedXML', 'Too many objects', 'DeleteObjects')
+        with self._lock:
+            bucket = self._bucket(Bucket)
+            for obj in objects:
+                bucket.pop(obj['Key'], None)
+        return {'Deleted': [{'Key': obj['Key']} for obj in objects], 'Errors': []}
+
+    def create_multipart_upload(self, Bucket, Key, ContentType='binary/octet-stream', **kwargs):
+        self._call('CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {'Bucket': Bucket, 'Key': Key, 'ContentType': ContentType, 'Parts': {}}
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _upload(self, Bucket, Key, UploadId, operation):
+        upload = self.uploads.get(UploadId)
+        if upload is None or upload['Bucket'] != Bucket or upload['Key'] != Key:
+            raise client_error('NoSuchUpload', 'The specified upload does not exist.', operation)
+        return upload
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=b'', **kwargs):
+        """Stands in for the PUT a client sends to a signed part URL"""
+        self._call('UploadPart')
+        body = Body.encode('utf-8') if isinstance(Body, str) else bytes(Body)
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        with self._lock:
+            self._upload(Bucket, Key, UploadId, 'UploadPart')['Parts'][PartNumber] = (body, etag)
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, MaxParts=1000, PartNumberMarker=0, **kwargs):
+        self._call('ListParts')
+        with self._lock:
+            parts = self._upload(Bucket, Key, UploadId, 'ListParts')['Parts']
+            numbers = sorted(number for number in parts if number > PartNumberMarker)
+            page = numbers[:MaxParts]
+            response = {
+                'Parts': [{'PartNumber': number, 'ETag': parts[number][1], 'Size': len(parts[number][0])}
+                          for number in page],
+                'IsTruncated': len(numbers) > MaxParts,
+            }
+        if response['IsTruncated']:
+            response['NextPartNumberMarker'] = page[-1]
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call('CompleteMultipartUpload')
+        with self._lock:
+            upload = self._upload(Bucket, Key, UploadId, 'CompleteMultipartUpload')
+            chunks, digests = [], b''
+            for part in MultipartUpload['Parts']:
+                stored = upload['Parts'].get(part['PartNumber'])
+                if stored is None or stored[1] != part['ETag']:
+                    raise client_error('InvalidPart', 'One or more of the specified parts could not be found.',
+                                       'CompleteMultipartUpload')
+                chunks.append(stored[0])
+                digests += bytes.fromhex(stored[1].strip('"'))
+            etag = '"%s-%d"' % (hashlib.md5(digests).hexdigest(), len(chunks))
+            self._bucket(Bucket)[Key] = {'Body': b''.join(chunks), 'ContentType': upload['ContentType'],
+                                         'ETag': etag, 'LastModified': time.time()}
+            del self.uploads[UploadId]
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._call('AbortMultipartUpload')
+        with self._lock:
+            self._upload(Bucket, Key, UploadId, 'AbortMultipartUpload')
+            del self.uploads[UploadId]
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, StartAfter=None, **kwargs):
+        self._call('ListObjectsV2')
+        with self._lock:
+            keys = sorted(key for key in self._bucket(Bucket) if key.startswith(Prefix))
+        start = ContinuationToken or StartAfter
+        if start:
+            keys = [key for key in keys if key > start]
+        page = keys[:MaxKeys]
+        bucket = self._bucket(Bucket)
+        response = {
+            'Contents': [{'Key': key, 'Size': len(bucket[key]['Body']), 'ETag': bucket[key]['ETag'],
+                          'LastModified': bucket[key]['LastModified']} for key in page if key in bucket],
+            'KeyCount': len(page),
+            'IsTruncated': len(keys) > MaxKeys,
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Secrets Manager
+# ---------------------------------------------------------------------------
+
+class StubSecretsManager(StubService):
+    """Subset of boto3.client('secretsmanager')"""
+
+    def __init__(self, secrets=None, latency_ms=0.0):
+        super().__init__(latency_ms)
+        self.secrets = dict(secrets or {})
+
+    def get_secret_value(self, SecretId, **kwargs):
+        self._call('GetSecretValue')
+        if SecretId not in self.secrets:
+            raise client_error('ResourceNotFoundException', f'Secret {SecretId} not found', 'GetSecretValue')
+        return {'SecretString': self.secrets[SecretId], 'ARN': SecretId}
+
+    def put_secret_value(self, SecretId, SecretString, **kwargs):
+        self._call('PutSecretValue')
+        self.secrets[SecretId] = SecretString
+        return {'ARN': SecretId}
+
+
+class StubSSM(StubService):
+    """Subset of boto3.client('ssm') (String parameters only)"""
+
+    def __init__(self, parameters=None, latency_ms=0.0):
+        super().__init__(latency_ms)
+        self.parameters = dict(parameters or {})
+
+    def get_parameter(self, Name, **kwargs):
+        self._call('GetParameter')
+        if Name not in self.parameters:
+            raise client_error('ParameterNotFound', f'Parameter {Name} not found', 'GetParameter')
+        return {'Parameter': {'Name': Name, 'Type': 'String', 'Value': self.parameters[Name]}}
+
+    def get_parameters(self, Names, **kwargs):
+        self._call('GetParameters')
+        if len(Names) > 10:
+            raise client_error('ValidationException', 'Member must have length less than or equal to 10',
+                               'GetParameters')
+        return {
+            'Parameters': [{'Name': name, 'Type': 'String', 'Value': self.parameters[name]}
+                           for name in Names if name in self.parameters],
+            'InvalidParameters': [name for name in Names if name not in self.parameters],
+        }
+
+    def put_parameter(self, Name, Value, Overwrite=False, **kwargs):
+        self._call('PutParameter')
+        if Name in self.parameters and not Overwrite:
+            raise client_error('ParameterAlreadyExists', f'Parameter {Name} already exists', 'PutParameter')
+        self.parameters[Name] = Value
+        return {'Version': 1}
+
+
+# ---------------------------------------------------------------------------
+# Wiring
+# ---------------------------------------------------------------------------
+
+def generate_private_key_pem(key_size=2048):
+    """Generate an RSA key pair for local signing; returns (private_key, pem)"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.TraditionalOpenSSL,
+        serialization.NoEncryption()
+    ).decode('utf-8')
+    return private_key, pem
+
+
+class LocalBackends:
+    """The stub services installed into an index module"""
+
+    def __init__(self, latency_ms=0.0, secrets_latency_ms=None, unprocessed_rate=0.0):
+        self.private_key, self.private_key_pem = generate_private_key_pem()
+        self.s3 = StubS3(latency_ms)
+        self.dynamodb = StubDynamoDB(
+            latency_ms,
+            indexes={'status-uploaded-at-index': ('status', 'upload_url_generated_at')},
+            unprocessed_rate=unprocessed_rate,
+            hash_keys={os.environ.get('CONTENT_INDEX_TABLE_NAME', DEFAULT_ENV['CONTENT_INDEX_TABLE_NAME']): 'content_hash'}
+        )
+        self.secretsmanager = StubSecretsManager(
+            {os.environ.get('PRIVATE_KEY_SECRET_ARN', DEFAULT_ENV['PRIVATE_KEY_SECRET_ARN']): self.private_key_pem},
+            latency_ms if secrets_latency_ms is None else secrets_latency_ms
+        )
+        self.ssm = StubSSM(latency_ms=latency_ms)
+
+    def add_signing_key(self, key_id, secret_arn, active=True):
+        """Store a new key and publish it as the active (or inactive) key, like rotate-keys.py"""
+        private_key, pem = generate_private_key_pem()
+        self.secretsmanager.secrets[secret_arn] = pem
+        prefix = '/cloudfront-signer/active' if active else '/cloudfront-signer/inactive'
+        self.ssm.parameters[f'{prefix}-key-id'] = key_id
+        self.ssm.parameters[f'{prefix}-secret-arn'] = secret_arn
+        return private_key
+
+    @property
+    def public_key(self):
+        return self.private_key.public_key()
+
+    def table(self, index):
+        return self.dynamodb.Table(index.TABLE_NAME)
+
+    def install(self, index):
+        """Point index's lazily created clients at the stubs"""
+        index._s3_client = self.s3
+        index._dynamodb = self.dynamodb
+        index._secretsmanager = self.secretsmanager
+        index._ssm = self.ssm
+        return self
+
+    def call_counts(self):
+        return {
+            's3': dict(self.s3.calls),
+            'dynamodb': dict(self.dynamodb.calls),
+            'secretsmanager': dict(self.secretsmanager.calls),
+            'ssm': dict(self.ssm.calls),
+        }
+
+
+def load_index(env=None, latency_ms=0.0, secrets_latency_ms=None, unprocessed_rate=0.0, fresh=True):
+    """
+    Import lambda/index.py wired to in-memory backends
+
+    env overrides DEFAULT_ENV; with fresh=True the module is re-imported so
+    module-level settings pick up the new environment.
+    Returns (index module, LocalBackends).
+    """
+    for name, value in DEFAULT_ENV.items():
+        os.environ.setdefault(name, value)
+    for name, value in (env or {}).items():
+        os.environ[name] = str(value)
+    # Never reach for real AWS credentials during import-time warm-up
+    os.environ['PRELOAD_SIGNING_KEY'] = 'false'
+
+    lambda_dir = os.path.abspath(LAMBDA_DIR)
+    if lambda_dir not in sys.path:
+        sys.path.insert(0, lambda_dir)
+
+    if fresh and 'index' in sys.modules:
+        index = importlib.reload(sys.modules['index'])
+    else:
+        index = importlib.import_module('index')
+
+    backends = LocalBackends(latency_ms, secrets_latency_ms, unprocessed_rate).install(index)
+    return index, backends
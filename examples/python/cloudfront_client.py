@@ -0,0 +1,514 @@
+"""
+Client library for the CloudFront Signed URLs API
+
+- One pooled requests.Session (keep-alive, retries) shared by all calls
+- Signed URLs cached per file and reused until shortly before they expire
+- Streaming uploads from file objects; multipart uploads for large files
+- Chunked streaming downloads to disk; parallel HTTP Range downloads for
+  large objects
+- TransferManager runs many transfers on a thread pool and reports MB/s
+  and files/s
+
+Example:
+    from cloudfront_client import SignedUrlClient, TransferManager
+
+    client = SignedUrlClient("https://xxxx.execute-api.us-east-1.amazonaws.com/prod")
+    manager = TransferManager(client, max_workers=8)
+    results = manager.upload_files(["a.bin", "b.bin"])
+    print(manager.stats.summary())
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MB = 1024 * 1024
+
+# Batch endpoints accept at most this many files per request (MAX_BATCH_SIZE)
+API_BATCH_SIZE = 500
+# Multipart part URLs signed per request (MULTIPART_MAX_URLS)
+PART_URL_BATCH = 100
+
+
+def create_session(pool_size=32, retries=3, backoff=0.3):
+    """
+    requests.Session with a connection pool sized for pool_size concurrent
+    transfers and retries with backoff on connection errors and 5xx/429
+    Streamed PUT bodies cannot be replayed, so uploads are not retried here
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD', 'DELETE']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def file_sha256(path, chunk_size=MB):
+    """Hex SHA-256 of a local file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SignedUrlCache:
+    """Signed URLs by key, valid until expiry minus a safety margin"""
+
+    def __init__(self, margin_seconds=60, clock=time.time):
+        self.margin = margin_seconds
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] - self.margin > self.clock():
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, url, expires_in):
+        with self._lock:
+            self._entries[key] = (url, self.clock() + expires_in)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class TransferStats:
+    """Thread-safe byte/file counters for one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.bytes = 0
+            self.files = 0
+            self.failed = 0
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def file_done(self, success=True):
+        with self._lock:
+            if success:
+                self.files += 1
+            else:
+                self.failed += 1
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            'files': self.files,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'seconds': round(elapsed, 3),
+            'mb_per_sec': round(self.bytes / MB / elapsed, 2),
+            'files_per_sec': round(self.files / elapsed, 2),
+        }
+
+    def format(self):
+        s = self.summary()
+        return (f"{s['files']} file(s), {s['bytes'] / MB:.1f} MB in {s['seconds']:.2f}s - "
+                f"{s['mb_per_sec']:.2f} MB/s, {s['files_per_sec']:.2f} files/s"
+                + (f", {s['failed']} failed" if s['failed'] else ''))
+
+
+class _ProgressReader:
+    """File object wrapper that counts bytes as requests streams them"""
+
+    def __init__(self, fileobj, stats, length=None):
+        self._fileobj = fileobj
+        self._stats = stats
+        self._remaining = length
+
+    def __len__(self):
+        return self._remaining if self._remaining is not None else 0
+
+    def read(self, size=-1):
+        if self._remaining is not None:
+            size = self._remaining if size is None or size < 0 else min(size, self._remaining)
+        data = self._fileobj.read(size)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        if data and self._stats is not None:
+            self._stats.add_bytes(len(data))
+        return data
+
+
+class SignedUrlClient:
+    """
+    API calls plus the signed URL transfers, over one pooled session
+    """
+
+    def __init__(self, api_url, session=None, pool_size=32, timeout=(5, 60),
+                 chunk_size=1 * MB, url_margin_seconds=60, stats=None):
+        self.api_url = api_url.rstrip('/')
+        self.session = session or create_session(pool_size)
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.url_cache = SignedUrlCache(url_margin_seconds)
+        self.stats = stats or TransferStats()
+
+    # -- API ---------------------------------------------------------------
+
+    def _api(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.api_url}{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def request_upload(self, filename, content_type='application/octet-stream'):
+        """Returns (file_id, upload_url)"""
+        data = self._api('POST', '/api/files/upload', json={'filename': filename, 'contentType': content_type})
+        return data['fileId'], data['uploadUrl']
+
+    def request_uploads(self, files):
+        """files: [(filename, content_type)]; returns [(file_id, upload_url) or None]"""
+        results = []
+        for start in range(0, len(files), API_BATCH_SIZE):
+            chunk = files[start:start + API_BATCH_SIZE]
+            data = self._api('POST', '/api/files/upload/batch', json={
+                'files': [{'filename': name, 'contentType': content_type} for name, content_type in chunk]
+            })
+            for entry in data['files']:
+                results.append((entry['fileId'], entry['uploadUrl']) if entry.get('success') else None)
+        return results
+
+    def download_url(self, file_id):
+        """Signed download URL for file_id, served from cache while still valid"""
+        url = self.url_cache.get(file_id)
+        if url is None:
+            data = self._api('GET', f'/api/files/download/{file_id}')
+            url = data['downloadUrl']
+            self.url_cache.put(file_id, url, data.get('expiresIn', 3600))
+        return url
+
+    def prefetch_download_urls(self, file_ids):
+        """Fill the URL cache for many files with the batch endpoint"""
+        missing = [file_id for file_id in dict.fromkeys(file_ids) if self.url_cache.get(file_id) is None]
+        for start in range(0, len(missing), API_BATCH_SIZE):
+            data = self._api('POST', '/api/files/download/batch',
+                             json={'fileIds': missing[start:start + API_BATCH_SIZE]})
+            for file_id, entry in data['files'].items():
+                if entry.get('success'):
+                    self.url_cache.put(file_id, entry['downloadUrl'], data.get('expiresIn', 3600))
+
+    def list_files(self, limit=100, status=None, include_urls=False):
+        """
+        Iterate over all files, following nextToken
+        With include_urls, rows carry downloadUrl and the URLs are cached for
+        later downloads
+        """
+        params = {'limit': str(limit)}
+        if status:
+            params['status'] = status
+        if include_urls:
+            params['includeUrls'] = 'true'
+        while True:
+            data = self._api('GET', '/api/files', params=params)
+            for entry in data['files']:
+                if entry.get('downloadUrl'):
+                    self.url_cache.put(entry['fileId'], entry['downloadUrl'], data.get('expiresIn', 3600))
+                yield entry
+            if not data.get('nextToken'):
+                return
+            params['nextToken'] = data['nextToken']
+
+    def delete_file(self, file_id):
+        self.url_cache.invalidate(file_id)
+        return self._api('DELETE', f'/api/files/{file_id}')
+
+    def delete_files(self, file_ids):
+        for file_id in file_ids:
+            self.url_cache.invalidate(file_id)
+        return self._api('POST', '/api/files/delete/batch', json={'fileIds': list(file_ids)})
+
+    # -- Uploads -----------------------------------------------------------
+
+    def put_stream(self, upload_url, fileobj, length, content_type=None, extra_headers=None):
+        """PUT length bytes from fileobj without reading them into memory"""
+        headers = dict(extra_headers or {}, **{'Content-Length': str(length)})
+        if content_type:
+            headers['Content-Type'] = content_type
+        response = self.session.put(upload_url, data=_ProgressReader(fileobj, self.stats, length),
+                                    headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def upload_fileobj(self, fileobj, filename, length, content_type='application/octet-stream', upload_url=None):
+        """Upload from an open binary file object; returns file_id"""
+        file_id = None
+        if upload_url is None:
+            file_id, upload_url = self.request_upload(filename, content_type)
+        self.put_stream(upload_url, fileobj, length, content_type)
+        return file_id
+
+    def upload_file(self, path, filename=None, content_type=None, upload_url=None, file_id=None):
+        """Stream a local file with one PUT; returns file_id"""
+        filename = filename or os.path.basename(path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            uploaded_id = self.upload_fileobj(f, filename, os.path.getsize(path), content_type, upload_url)
+        return file_id or uploaded_id
+
+    def upload_file_deduplicated(self, path, filename=None, content_type=None):
+        """
+        Upload a file unless the service already stores identical content
+        Returns (file_id, uploaded); the checksum header lets the service
+        index the content for later uploads
+        """
+        filename = filename or os.path.basename(path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        data = self._api('POST', '/api/files/upload', json={
+            'filename': filename, 'contentType': content_type, 'sha256': file_sha256(path)
+        })
+        if data.get('deduplicated'):
+            return data['fileId'], False
+        with open(path, 'rb') as f:
+            self.put_stream(data['uploadUrl'], f, os.path.getsize(path), content_type, data.get('headers'))
+        return data['fileId'], True
+
+    def upload_multipart(self, path, filename=None, content_type=None, part_size=64 * MB, max_workers=8):
+        """
+        Upload a large file in parallel parts; parts already recorded by the
+        API (from an earlier, interrupted attempt) are skipped
+        """
+        filename = filename or os.path.basename(path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        size = os.path.getsize(path)
+
+        started = self._api('POST', '/api/files/multipart', json={
+            'filename': filename, 'contentType': content_type, 'fileSize': size, 'partSize': part_size
+        })
+        return self.resume_multipart(path, started['fileId'], max_workers=max_workers)
+
+    def resume_multipart(self, path, file_id, max_workers=8, part_retries=2):
+        """
+        Upload the missing parts of a multipart upload and complete it
+        Parts whose URL could not be signed or whose PUT returned no ETag are
+        requested again up to part_retries times; complete is only called
+        once every part has an ETag
+        """
+        state = self._api('GET', f'/api/files/multipart/{file_id}')
+        part_size = state['partSize']
+        size = os.path.getsize(path)
+        part_count = max(1, -(-size // part_size))
+        etags = {part['partNumber']: part['etag'] for part in state['completedParts']}
+
+        def upload_part(number, url):
+            offset = (number - 1) * part_size
+            length = min(part_size, size - offset)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                response = self.put_stream(url, f, length)
+            return number, response.headers.get('ETag')
+
+        def send(executor, request):
+            data = self._api('POST', f'/api/files/multipart/{file_id}/parts', json=request)
+            futures = [executor.submit(upload_part, entry['partNumber'], entry['uploadUrl'])
+                       for entry in data['parts'] if entry.get('success')]
+            finished = [(number, etag) for number, etag in (future.result() for future in futures) if etag]
+            # Record these parts so a restart can skip them
+            if finished:
+                self._api('POST', f'/api/files/multipart/{file_id}/parts', json={
+                    'completedParts': [{'partNumber': n, 'etag': etag} for n, etag in finished]
+                })
+            etags.update(finished)
+
+        def missing():
+            return [number for number in range(1, part_count + 1) if not etags.get(number)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(1, part_count + 1, PART_URL_BATCH):
+                end = min(start + PART_URL_BATCH - 1, part_count)
+                if all(etags.get(number) for number in range(start, end + 1)):
+                    continue
+                send(executor, {'startPart': start, 'endPart': end})
+
+            for _ in range(part_retries):
+                numbers = missing()
+                if not numbers:
+                    break
+                for i in range(0, len(numbers), PART_URL_BATCH):
+                    send(executor, {'partNumbers': numbers[i:i + PART_URL_BATCH]})
+
+        numbers = missing()
+        if numbers:
+            raise IOError(f'Multipart upload {file_id} is missing parts {numbers}; '
+                          f'call resume_multipart again to retry')
+
+        self._api('POST', f'/api/files/multipart/{file_id}/complete', json={
+            'parts': [{'partNumber': n, 'etag': etags[n]} for n in range(1, part_count + 1)]
+        })
+        return file_id
+
+    # -- Downloads ---------------------------------------------------------
+
+    def _write_stream(self, response, fileobj):
+        written = 0
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            fileobj.write(chunk)
+            written += len(chunk)
+            self.stats.add_bytes(len(chunk))
+        return written
+
+    def download_to_file(self, file_id, path, range_threshold=None, range_size=16 * MB, max_workers=8):
+        """
+        Stream an object to disk in chunk_size pieces; returns bytes written
+        With range_threshold set, objects at least that large are fetched
+        with parallel Range requests instead (decided from the first
+        response's Content-Length, so small files cost one request)
+        """
+        url = self.download_url(file_id)
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            size = int(response.headers.get('Content-Length', 0))
+            if not range_threshold or size < max(range_threshold, range_size + 1):
+                with open(path, 'wb') as f:
+                    return self._write_stream(response, f)
+        return self.download_ranged(file_id, path, range_size, max_workers, size=size)
+
+    def download_bytes(self, file_id):
+        url = self.download_url(file_id)
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        self.stats.add_bytes(len(response.content))
+        return response.content
+
+    def object_size(self, url):
+        """Size from a one-byte Range request (works wherever GET is signed)"""
+        with self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code == 206 and '/' in content_range:
+                total = content_range.rsplit('/', 1)[1]
+                return int(total) if total != '*' else None
+            return int(response.headers['Content-Length']) if 'Content-Length' in response.headers else None
+
+    def download_ranged(self, file_id, path, range_size=16 * MB, max_workers=8, size=None):
+        """
+        Download a large object as parallel Range requests written into a
+        preallocated file; falls back to a single stream when the size is
+        unknown or the object fits in one range
+        """
+        url = self.download_url(file_id)
+        if size is None:
+            size = self.object_size(url)
+        if size is None or size <= range_size:
+            return self.download_to_file(file_id, path)
+
+        with open(path, 'wb') as f:
+            f.truncate(size)
+
+        def fetch(offset):
+            end = min(offset + range_size, size) - 1
+            headers = {'Range': f'bytes={offset}-{end}'}
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise IOError(f'Range request for {file_id} returned {response.status_code}')
+                with open(path, 'r+b') as out:
+                    out.seek(offset)
+                    return self._write_stream(response, out)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(fetch, range(0, size, range_size)))
+
+
+class TransferManager:
+    """
+    Many uploads/downloads on a thread pool sharing one client
+    Each method returns {name: result or Exception} and resets stats
+    """
+
+    def __init__(self, client, max_workers=8, multipart_threshold=256 * MB, part_size=64 * MB,
+                 range_threshold=64 * MB, range_size=16 * MB):
+        self.client = client
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.range_threshold = range_threshold
+        self.range_size = range_size
+
+    @property
+    def stats(self):
+        return self.client.stats
+
+    def _run(self, jobs):
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, *args): name for name, func, args in jobs}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    self.stats.file_done(True)
+                except Exception as e:
+                    results[name] = e
+                    self.stats.file_done(False)
+        return results
+
+    def upload_files(self, paths):
+        """Upload local files; returns {path: file_id or Exception}"""
+        self.stats.reset()
+        small = [path for path in paths if os.path.getsize(path) < self.multipart_threshold]
+        large = [path for path in paths if os.path.getsize(path) >= self.multipart_threshold]
+
+        # One API call per 500 small files instead of one per file
+        wanted = [(os.path.basename(path), mimetypes.guess_type(path)[0] or 'application/octet-stream')
+                  for path in small]
+        issued = self.client.request_uploads(wanted) if small else []
+
+        jobs = []
+        for path, grant, (_, content_type) in zip(small, issued, wanted):
+            if grant is None:
+                jobs.append((path, _raise, (f'Could not get an upload URL for {path}',)))
+            else:
+                file_id, url = grant
+                jobs.append((path, self.client.upload_file, (path, None, content_type, url, file_id)))
+        for path in large:
+            # Parts are parallel within the file, so run large files one at a time per worker
+            jobs.append((path, self.client.upload_multipart, (path, None, None, self.part_size, self.max_workers)))
+        return self._run(jobs)
+
+    def download_files(self, file_ids, output_dir, names=None):
+        """Download to output_dir; returns {file_id: bytes written or Exception}"""
+        self.stats.reset()
+        os.makedirs(output_dir, exist_ok=True)
+        self.client.prefetch_download_urls(file_ids)
+
+        def download(file_id):
+            path = os.path.join(output_dir, (names or {}).get(file_id) or file_id)
+            return self.client.download_to_file(file_id, path, self.range_threshold, self.range_size,
+                                                self.max_workers)
+
+        return self._run([(file_id, download, (file_id,)) for file_id in file_ids])
+
+
+def _raise(message):
+    raise RuntimeError(message)
@@ -1,14 +1,42 @@
 #!/usr/bin/env python3
 """
 Example: Upload and download files using CloudFront Signed URLs
+
+Without arguments, runs the upload / list / download / verify walkthrough.
+Subcommands use cloudfront_client.py for bulk transfers:
+
+    python3 upload_download.py upload *.jpg --workers 16
+    python3 upload_download.py download abc123_a.jpg def456_b.jpg -o downloads/
+    python3 upload_download.py list --status uploaded
+    python3 upload_download.py delete abc123_a.jpg def456_b.jpg
+
+Every transfer run ends with a throughput line (MB/s, files/s).
+Set API_URL or pass --api-url to point at another deployment.
 """
 
-import requests
+import argparse
 import json
+import os
 import sys
 
+import requests
+
+from cloudfront_client import MB, SignedUrlClient, TransferManager
+
 # Configuration
-API_URL = "https://r1ebp4qfic.execute-api.us-east-1.amazonaws.com/prod"
+API_URL = os.environ.get('API_URL', "https://r1ebp4qfic.execute-api.us-east-1.amazonaws.com/prod")
+
+_client = None
+
+
+def get_client():
+    """
+    Shared client, so every call reuses the same pooled connections
+    """
+    global _client
+    if _client is None:
+        _client = SignedUrlClient(API_URL)
+    return _client
 
 
 def upload_file(filename, content, content_type='text/plain'):
@@ -26,18 +54,7 @@ def upload_file(filename, content, content_type='text/plain'):
     print(f"Uploading {filename}...")
     
     # Step 1: Generate upload URL
-    response = requests.post(
-        f"{API_URL}/api/files/upload",
-        json={
-            'filename': filename,
-            'contentType': content_type
-        }
-    )
-    response.raise_for_status()
-    data = response.json()
-    
-    upload_url = data['uploadUrl']
-    file_id = data['fileId']
+    file_id, upload_url = get_client().request_upload(filename, content_type)
     
     print(f"  Upload URL generated")
     print(f"  File ID: {file_id}")
@@ -45,8 +62,8 @@ def upload_file(filename, content, content_type='text/plain'):
     # Step 2: Upload file
     if isinstance(content, str):
         content = content.encode('utf-8')
-        
-    response = requests.put(
+    
+    response = get_client().session.put(
         upload_url,
         data=content,
         headers={'Content-Type': content_type}
@@ -70,24 +87,12 @@ def download_file(file_id):
     """
     print(f"Downloading file {file_id}...")
     
-    # Step 1: Generate download URL
-    response = requests.get(f"{API_URL}/api/files/download/{file_id}")
-    response.raise_for_status()
-    data = response.json()
-    
-    download_url = data['downloadUrl']
-    filename = data['filename']
-    
-    print(f"  Download URL generated")
-    print(f"  Filename: {filename}")
-    
-    # Step 2: Download file
-    response = requests.get(download_url)
-    response.raise_for_status()
+    # Signed URLs are cached by the client until shortly before they expire
+    content = get_client().download_bytes(file_id)
     
     print(f"  ✓ File downloaded successfully")
     
-    return response.content
+    return content
 
 
 def list_files():
@@ -97,11 +102,7 @@ def list_files():
     Returns:
         files: List of file metadata
     """
-    response = requests.get(f"{API_URL}/api/files")
-    response.raise_for_status()
-    data = response.json()
-    
-    return data['files']
+    return list(get_client().list_files())
 
 
 def delete_file(file_id):
@@ -113,13 +114,12 @@ def delete_file(file_id):
     """
     print(f"Deleting file {file_id}...")
     
-    response = requests.delete(f"{API_URL}/api/files/{file_id}")
-    response.raise_for_status()
+    get_client().delete_file(file_id)
     
     print(f"  ✓ File deleted successfully")
 
 
-def main():
+def run_example():
     """
     Main example flow
     """
@@ -128,44 +128,116 @@ def main():
     print("=" * 50)
     print()
     
+    # Upload a file
+    content = "Hello from Python!\nThis is a test file."
+    file_id = upload_file("example.txt", content, "text/plain")
+    print()
+    
+    # List files
+    print("Listing all files...")
+    files = list_files()
+    print(f"  Found {len(files)} file(s)")
+    for f in files:
+        print(f"    - {f['filename']} ({f['fileId']})")
+    print()
+    
+    # Download the file
+    downloaded_content = download_file(file_id)
+    print(f"  Content: {downloaded_content.decode('utf-8')}")
+    print()
+    
+    # Verify content matches
+    if downloaded_content.decode('utf-8') == content:
+        print("✓ Content verification: PASSED")
+    else:
+        print("✗ Content verification: FAILED")
+    print()
+    
+    # Optional: Delete the file
+    # delete_file(file_id)
+    
+    print("=" * 50)
+    print("✓ All operations completed successfully!")
+    print("=" * 50)
+
+
+def report(manager, results, label):
+    failed = {name: error for name, error in results.items() if isinstance(error, Exception)}
+    for name, error in failed.items():
+        print(f"  ✗ {name}: {error}", file=sys.stderr)
+    print(f"{label}: {manager.stats.format()}")
+    return 1 if failed else 0
+
+
+def main():
+    global API_URL
+    
+    parser = argparse.ArgumentParser(description='CloudFront Signed URLs example client')
+    parser.add_argument('--api-url', default=API_URL, help='API base URL (default: $API_URL)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent transfers (default 8)')
+    parser.add_argument('--json', action='store_true', help='print the throughput summary as JSON')
+    commands = parser.add_subparsers(dest='command')
+    
+    upload = commands.add_parser('upload', help='upload local files')
+    upload.add_argument('paths', nargs='+')
+    upload.add_argument('--multipart-threshold-mb', type=int, default=256,
+                        help='use parallel multipart uploads from this size (default 256)')
+    
+    download = commands.add_parser('download', help='download files by ID')
+    download.add_argument('file_ids', nargs='+')
+    download.add_argument('-o', '--output-dir', default='.')
+    download.add_argument('--range-threshold-mb', type=int, default=64,
+                          help='use parallel Range requests from this size, 0 disables (default 64)')
+    download.add_argument('--range-size-mb', type=int, default=16, help='bytes per Range request (default 16)')
+    
+    listing = commands.add_parser('list', help='list files')
+    listing.add_argument('--status')
+    
+    delete = commands.add_parser('delete', help='delete files by ID')
+    delete.add_argument('file_ids', nargs='+')
+    
+    args = parser.parse_args()
+    API_URL = args.api_url
+    
     try:
-        # Upload a file
-        content = "Hello from Python!\nThis is a test file."
-        file_id = upload_file("example.txt", content, "text/plain")
-        print()
-        
-        # List files
-        print("Listing all files...")
-        files = list_files()
-        print(f"  Found {len(files)} file(s)")
-        for f in files:
-            print(f"    - {f['filename']} ({f['fileId']})")
-        print()
+        if args.command is None:
+            run_example()
+            return 0
         
-        # Download the file
-        downloaded_content = download_file(file_id)
-        print(f"  Content: {downloaded_content.decode('utf-8')}")
-        print()
+        client = SignedUrlClient(API_URL, pool_size=max(args.workers * 2, 10))
         
-        # Verify content matches
-        if downloaded_content.decode('utf-8') == content:
-            print("✓ Content verification: PASSED")
-        else:
-            print("✗ Content verification: FAILED")
-        print()
+        if args.command == 'list':
+            for entry in client.list_files(status=args.status):
+                print(f"{entry['fileId']}\t{entry.get('status', '')}\t{entry.get('uploadedAt', '')}")
+            return 0
         
-        # Optional: Delete the file
-        # delete_file(file_id)
+        if args.command == 'delete':
+            result = client.delete_files(args.file_ids)
+            print(f"Deleted {result['deleted']} file(s), {len(result['failed'])} failed, "
+                  f"{len(result['notFound'])} not found")
+            return 0 if result['success'] else 1
         
-        print("=" * 50)
-        print("✓ All operations completed successfully!")
-        print("=" * 50)
+        if args.command == 'upload':
+            manager = TransferManager(client, args.workers, multipart_threshold=args.multipart_threshold_mb * MB)
+            results = manager.upload_files(args.paths)
+            for path, file_id in results.items():
+                if not isinstance(file_id, Exception):
+                    print(f"  ✓ {path} -> {file_id}")
+            status = report(manager, results, 'Uploaded')
+        else:
+            manager = TransferManager(client, args.workers, range_threshold=args.range_threshold_mb * MB,
+                                      range_size=args.range_size_mb * MB)
+            results = manager.download_files(args.file_ids, args.output_dir)
+            status = report(manager, results, 'Downloaded')
         
+        if args.json:
+            print(json.dumps(manager.stats.summary()))
+        return status
+    
     except requests.exceptions.RequestException as e:
         print(f"Error: {e}", file=sys.stderr)
-        sys.exit(1)
+        return 1
 
 
 if __name__ == "__main__":
-    main()
-
+    sys.exit(main())
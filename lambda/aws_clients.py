@@ -0,0 +1,164 @@
+"""
+Shared factory for tuned boto3 clients and resources
+
+botocore's defaults (10 pooled connections, legacy retries with 60 s
+connect/read timeouts, no TCP keepalive) let one slow call hold an
+invocation far past its latency budget. Every client built here gets:
+
+  AWS_MAX_POOL_CONNECTIONS  connection pool size (callers pass a default
+                            sized for their own thread pools)
+  AWS_CONNECT_TIMEOUT       seconds, default 2
+  AWS_READ_TIMEOUT          seconds, default 10
+  AWS_RETRY_MODE            default adaptive (client-side rate limiting
+                            on throttles, on top of standard retries)
+  AWS_MAX_ATTEMPTS          total attempts including the first, default 3
+  AWS_TCP_KEEPALIVE         default true
+
+Each client also counts its attempts, retries, throttled responses and
+timeouts per service (stats()), so their effect on tail latency can be read
+next to the per-invocation EMF metrics (invocation_properties()).
+
+boto3/botocore are imported on first use, like everywhere else in the
+Lambda.
+"""
+
+import os
+import threading
+
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '0'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'adaptive')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '3'))
+AWS_TCP_KEEPALIVE = os.environ.get('AWS_TCP_KEEPALIVE', 'true').lower() == 'true'
+
+DEFAULT_POOL_SIZE = 10
+
+THROTTLE_CODES = frozenset([
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'TransactionInProgressException',
+    'RequestLimitExceeded', 'BandwidthLimitExceeded', 'LimitExceededException', 'RequestThrottled',
+    'SlowDown', 'PriorRequestNotComplete', 'EC2ThrottledException',
+])
+
+_lock = threading.Lock()
+_counters = {}
+_totals = {'retries': 0, 'throttles': 0}
+
+
+def client_config(pool_size=None, **overrides):
+    """
+    botocore Config with the tuned defaults; keyword arguments override
+    any Config option (e.g. read_timeout=60 for long scans).
+    AWS_MAX_POOL_CONNECTIONS, when set, wins over pool_size.
+    """
+    from botocore.config import Config
+
+    options = {
+        'max_pool_connections': AWS_MAX_POOL_CONNECTIONS or pool_size or DEFAULT_POOL_SIZE,
+        'connect_timeout': AWS_CONNECT_TIMEOUT,
+        'read_timeout': AWS_READ_TIMEOUT,
+        'retries': {'mode': AWS_RETRY_MODE, 'total_max_attempts': AWS_MAX_ATTEMPTS},
+        'tcp_keepalive': AWS_TCP_KEEPALIVE,
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def client(service, pool_size=None, config=None, **kwargs):
+    """
+    boto3 client for service with the tuned configuration and counters
+    config is a dict of Config overrides; other keyword arguments
+    (region_name, endpoint_url, ...) go to boto3.client
+    """
+    import boto3
+    instance = boto3.client(service, config=client_config(pool_size, **(config or {})), **kwargs)
+    instrument(instance)
+    return instance
+
+
+def resource(service, pool_size=None, config=None, **kwargs):
+    """
+    boto3 service resource (e.g. DynamoDB) with the tuned configuration
+    """
+    import boto3
+    instance = boto3.resource(service, config=client_config(pool_size, **(config or {})), **kwargs)
+    instrument(instance.meta.client)
+    return instance
+
+
+def instrument(instance):
+    """
+    Count attempts, retries, throttles and timeouts of a botocore client
+    """
+    service = instance.meta.service_model.service_name
+    with _lock:
+        _counters.setdefault(service, {'attempts': 0, 'retries': 0, 'throttles': 0, 'timeouts': 0})
+    service_id = instance.meta.service_model.service_id.hyphenize()
+    instance.meta.events.register(f"needs-retry.{service_id}", _attempt_handler(service))
+
+
+def _attempt_handler(service):
+    from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+    def on_attempt(attempts=1, response=None, caught_exception=None, **kwargs):
+        # Called once per attempt before botocore decides whether to retry;
+        # returning None leaves that decision to the retry handler
+        throttled = False
+        if response is not None:
+            error = (response[1] or {}).get('Error', {})
+            throttled = error.get('Code') in THROTTLE_CODES
+        timed_out = isinstance(caught_exception, (ConnectTimeoutError, ReadTimeoutError))
+
+        with _lock:
+            counters = _counters[service]
+            counters['attempts'] += 1
+            if attempts > 1:
+                counters['retries'] += 1
+                _totals['retries'] += 1
+            if throttled:
+                counters['throttles'] += 1
+                _totals['throttles'] += 1
+            if timed_out:
+                counters['timeouts'] += 1
+        return None
+
+    return on_attempt
+
+
+def stats():
+    """
+    Per-service counters plus the effective client settings
+    """
+    with _lock:
+        services = {service: dict(counters) for service, counters in _counters.items()}
+    return {
+        'services': services,
+        'retry_mode': AWS_RETRY_MODE,
+        'max_attempts': AWS_MAX_ATTEMPTS,
+        'connect_timeout': AWS_CONNECT_TIMEOUT,
+        'read_timeout': AWS_READ_TIMEOUT,
+        'tcp_keepalive': AWS_TCP_KEEPALIVE,
+    }
+
+
+def totals():
+    """
+    (retries, throttles) across all clients so far
+    """
+    return _totals['retries'], _totals['throttles']
+
+
+def invocation_properties(before):
+    """
+    AwsRetries/AwsThrottles since before (a totals() snapshot), for the EMF
+    line; empty when there were none. Exact in Lambda, where a container
+    runs one invocation at a time.
+    """
+    retries, throttles = totals()
+    properties = {}
+    if retries > before[0]:
+        properties['AwsRetries'] = retries - before[0]
+    if throttles > before[1]:
+        properties['AwsThrottles'] = throttles - before[1]
+    return properties
@@ -36,7 +36,7 @@ docker run --rm \
 
 # Copy Lambda function
 echo "Copying Lambda function..."
-cp index.py package/
+cp *.py package/
 
 # Create deployment package
 echo "Creating deployment package..."
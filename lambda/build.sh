@@ -20,7 +20,7 @@ python3 -m pip install -r requirements.txt -t package/ --quiet
 
 # Copy Lambda function
 echo "Copying Lambda function..."
-cp index.py package/
+cp *.py package/
 
 # Create deployment package
 echo "Creating deployment package..."
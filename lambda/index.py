@@ -1,291 +1,1919 @@
 """
 Lambda function for generating CloudFront signed URLs
-Uses boto3's CloudFrontSigner - no external dependencies needed
+Signs with fast_signer (byte-identical to boto3's CloudFrontSigner, which
+remains available via SIGNER_IMPLEMENTATION=botocore)
+
+boto3, botocore and cryptography are imported lazily so each route only
+pays for what it uses; set PRELOAD_SIGNING_KEY=true to load the key and
+signer during the init phase instead (provisioned concurrency/SnapStart)
 """
 
+import base64
+import gzip
+import hashlib
 import json
 import os
+import random
+import re
+import threading
 import time
-import boto3
-from datetime import datetime, timedelta
-from botocore.signers import CloudFrontSigner
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, unquote, unquote_plus
 import uuid
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-secretsmanager = boto3.client('secretsmanager')
+import aws_clients
+import metrics
+import profiling
+from key_cache import KeyRing
 
 # Environment variables
 BUCKET_NAME = os.environ['BUCKET_NAME']
 TABLE_NAME = os.environ['TABLE_NAME']
 CLOUDFRONT_DOMAIN = os.environ['CLOUDFRONT_DOMAIN']
-CLOUDFRONT_KEY_PAIR_ID = os.environ['CLOUDFRONT_KEY_PAIR_ID']
-PRIVATE_KEY_SECRET_ARN = os.environ['PRIVATE_KEY_SECRET_ARN']
+CLOUDFRONT_KEY_PAIR_ID = os.environ.get('CLOUDFRONT_KEY_PAIR_ID', '')
+PRIVATE_KEY_SECRET_ARN = os.environ.get('PRIVATE_KEY_SECRET_ARN', '')
 UPLOAD_EXPIRATION = int(os.environ.get('UPLOAD_EXPIRATION', '900'))
 DOWNLOAD_EXPIRATION = int(os.environ.get('DOWNLOAD_EXPIRATION', '3600'))
+# 'fast' (default) or 'botocore'; both produce identical URLs
+SIGNER_IMPLEMENTATION = os.environ.get('SIGNER_IMPLEMENTATION', 'fast').lower()
+PRELOAD_SIGNING_KEY = os.environ.get('PRELOAD_SIGNING_KEY', 'false').lower() == 'true'
+COOKIE_DOMAIN = os.environ.get('COOKIE_DOMAIN', '')
+
+# Key rotation (SSM parameters written by scripts/rotate-keys.py). When
+# ACTIVE_KEY_ID_PARAM is unset the static CLOUDFRONT_KEY_PAIR_ID /
+# PRIVATE_KEY_SECRET_ARN pair is used and never refreshed.
+ACTIVE_KEY_ID_PARAM = os.environ.get('ACTIVE_KEY_ID_PARAM', '')
+ACTIVE_SECRET_ARN_PARAM = os.environ.get('ACTIVE_SECRET_ARN_PARAM', '')
+INACTIVE_KEY_ID_PARAM = os.environ.get('INACTIVE_KEY_ID_PARAM', '')
+INACTIVE_SECRET_ARN_PARAM = os.environ.get('INACTIVE_SECRET_ARN_PARAM', '')
+KEY_CACHE_TTL = int(os.environ.get('KEY_CACHE_TTL', '300'))
+
+# Batch settings
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '500'))
+SIGNING_WORKERS = int(os.environ.get('SIGNING_WORKERS', '8'))
+BATCH_MAX_RETRIES = int(os.environ.get('BATCH_MAX_RETRIES', '5'))
+DYNAMODB_BATCH_WRITE_SIZE = 25  # BatchWriteItem hard limit
+DYNAMODB_BATCH_GET_SIZE = 100  # BatchGetItem hard limit
+S3_DELETE_BATCH_SIZE = 1000  # DeleteObjects hard limit
+
+# Bulk delete settings
+DELETE_WORKERS = int(os.environ.get('DELETE_WORKERS', '4'))
+MAX_DELETE_BATCH_SIZE = int(os.environ.get('MAX_DELETE_BATCH_SIZE', '5000'))
+
+# Concurrent metadata updates per S3 notification batch
+UPLOAD_EVENT_WORKERS = int(os.environ.get('UPLOAD_EVENT_WORKERS', '8'))
+
+# Pooled connections per AWS client: every signing and delete worker (or
+# upload-event worker, in the notification function) can hold one at the
+# same time (AWS_MAX_POOL_CONNECTIONS overrides)
+AWS_POOL_SIZE = max(SIGNING_WORKERS + DELETE_WORKERS, UPLOAD_EVENT_WORKERS)
+
+# Multipart upload settings
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE', str(64 * 1024 * 1024)))
+MULTIPART_MAX_URLS = int(os.environ.get('MULTIPART_MAX_URLS', '100'))
+MULTIPART_TTL_HOURS = int(os.environ.get('MULTIPART_TTL_HOURS', '168'))
+S3_MIN_PART_SIZE = 5 * 1024 * 1024  # except the last part
+S3_MAX_PARTS = 10000
+
+# Listing settings
+STATUS_INDEX_NAME = os.environ.get('STATUS_INDEX_NAME', 'status-uploaded-at-index')
+LIST_DEFAULT_LIMIT = int(os.environ.get('LIST_DEFAULT_LIMIT', '100'))
+LIST_MAX_LIMIT = int(os.environ.get('LIST_MAX_LIMIT', '1000'))
+# Pages listed with includeUrls=true are capped at this many rows
+LIST_MAX_URLS = int(os.environ.get('LIST_MAX_URLS', '100'))
+
+# Signed URL memoization (disabled when URL_EXPIRY_WINDOW is 0)
+# Expiry times are rounded up to the next window boundary so repeated
+# downloads of an object within a window get the identical, cacheable URL
+URL_EXPIRY_WINDOW = int(os.environ.get('URL_EXPIRY_WINDOW', '0'))
+SIGNED_URL_CACHE_SIZE = int(os.environ.get('SIGNED_URL_CACHE_SIZE', '2048'))
+
+# File metadata cache for downloads (0 disables)
+# Metadata of uploaded files never changes, so entries only go stale when a
+# file is deleted through another container; TTLs bound that window. Unknown
+# file IDs are remembered briefly in a separate, smaller cache so 404 storms
+# neither reach DynamoDB nor evict hot entries.
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', '4096'))
+METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL', '300'))
+METADATA_NEGATIVE_CACHE_SIZE = int(os.environ.get('METADATA_NEGATIVE_CACHE_SIZE', '1024'))
+METADATA_NEGATIVE_TTL = int(os.environ.get('METADATA_NEGATIVE_TTL', '5'))
+
+# Object key layout of new uploads
+# flat:    uploads/<file_id>
+# sharded: uploads/ab/cd/<file_id>, KEY_SHARD_LEVELS segments of
+#          KEY_SHARD_WIDTH hex digits of md5(file_id)
+# Uploads made for a tenant go under uploads/<tenant>/ in either layout, so
+# signed cookies for that prefix cover the tenant's files and nothing else.
+# S3 scales request rates per key prefix, so sharding spreads heavy ingest
+# over up to 16^(levels*width) prefixes instead of throttling (503 SlowDown)
+# on one. Items store their object_key, so switching layouts only affects
+# new uploads; existing keys keep resolving.
+KEY_LAYOUT = os.environ.get('KEY_LAYOUT', 'flat').lower()
+KEY_SHARD_LEVELS = int(os.environ.get('KEY_SHARD_LEVELS', '2'))
+KEY_SHARD_WIDTH = int(os.environ.get('KEY_SHARD_WIDTH', '2'))
+UPLOAD_PREFIX = 'uploads/'
+# Tenants are single key segments without '_', so they never look like the
+# start of a file ID (8 hex digits and '_')
+TENANT_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9-]{0,62}$')
+FILE_ID_START = re.compile(r'^[0-9a-f]{8}_')
+
+# Response bodies at least this large are gzip-compressed for clients that
+# accept it (0 disables). Compressed bodies are base64 encoded, so a REST API
+# needs binary media types ("*/*"); HTTP APIs and function URLs need nothing.
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '0'))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '5'))
+
+# Content-hash deduplication: known SHA-256 digests map to stored objects
+# with a reference count (disabled when no index table is configured)
+CONTENT_INDEX_TABLE_NAME = os.environ.get('CONTENT_INDEX_TABLE_NAME', '')
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU cache with hit/miss counters
+    Entries stored with a ttl (seconds) expire; others live until evicted
+    """
+    
+    def __init__(self, maxsize, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+    
+    def put(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
 
-# Cache for private key and signer
-_private_key_cache = None
-_cloudfront_signer_cache = None
 
+# AWS clients (created on first use)
+_s3_client = None
+_dynamodb = None
+_secretsmanager = None
+_ssm = None
+_client_lock = threading.Lock()
 
-def rsa_signer(message):
+# Signing keys by key-pair ID, and botocore signers per key
+_key_ring = None
+_cloudfront_signer_cache = {}
+_signed_url_cache = LRUCache(SIGNED_URL_CACHE_SIZE)
+_metadata_cache = LRUCache(METADATA_CACHE_SIZE)
+_missing_file_cache = LRUCache(METADATA_NEGATIVE_CACHE_SIZE)
+
+
+def get_s3_client():
     """
-    RSA signer function for CloudFrontSigner
+    Get S3 client (created on first use)
     """
-    private_key = get_private_key()
-    return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+    global _s3_client
+    
+    if _s3_client is None:
+        with _client_lock:
+            if _s3_client is None:
+                with metrics.phase('ClientInit'):
+                    _s3_client = aws_clients.client('s3', pool_size=AWS_POOL_SIZE)
+    
+    return _s3_client
 
 
-def get_private_key():
+def get_dynamodb():
+    """
+    Get DynamoDB service resource (created on first use)
+    """
+    global _dynamodb
+    
+    if _dynamodb is None:
+        with _client_lock:
+            if _dynamodb is None:
+                with metrics.phase('ClientInit'):
+                    _dynamodb = aws_clients.resource('dynamodb', pool_size=AWS_POOL_SIZE)
+    
+    return _dynamodb
+
+
+def get_secretsmanager():
+    """
+    Get Secrets Manager client (created on first use)
+    """
+    global _secretsmanager
+    
+    if _secretsmanager is None:
+        with _client_lock:
+            if _secretsmanager is None:
+                with metrics.phase('ClientInit'):
+                    _secretsmanager = aws_clients.client('secretsmanager', pool_size=AWS_POOL_SIZE)
+    
+    return _secretsmanager
+
+
+def get_ssm():
+    """
+    Get SSM client (created on first use)
+    """
+    global _ssm
+    
+    if _ssm is None:
+        with _client_lock:
+            if _ssm is None:
+                with metrics.phase('ClientInit'):
+                    _ssm = aws_clients.client('ssm', pool_size=AWS_POOL_SIZE)
+    
+    return _ssm
+
+
+def rsa_signer(private_key):
+    """
+    RSA signer function for CloudFrontSigner, bound to one private key
+    """
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    
+    def sign(message):
+        return private_key.sign(message, padding.PKCS1v15(), hashes.SHA1())
+    
+    return sign
+
+
+def load_private_key(private_key_pem):
+    """
+    Parse a PEM encoded RSA private key
+    """
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import serialization
+    
+    # The key comes from our own secret, so skip the costly RSA consistency
+    # checks (tens of milliseconds on every cold start)
+    return serialization.load_pem_private_key(
+        private_key_pem.encode('utf-8'),
+        password=None,
+        backend=default_backend(),
+        unsafe_skip_rsa_key_validation=True
+    )
+
+
+def load_key_metadata():
+    """
+    Active and inactive (key ID, secret ARN) pairs, from SSM when configured
+    """
+    if not ACTIVE_KEY_ID_PARAM:
+        return {'active': (CLOUDFRONT_KEY_PAIR_ID, PRIVATE_KEY_SECRET_ARN), 'inactive': None}
+    
+    names = [name for name in (ACTIVE_KEY_ID_PARAM, ACTIVE_SECRET_ARN_PARAM,
+                               INACTIVE_KEY_ID_PARAM, INACTIVE_SECRET_ARN_PARAM) if name]
+    with metrics.phase('KeyLoad'):
+        response = get_ssm().get_parameters(Names=names)
+    values = {param['Name']: param['Value'] for param in response['Parameters']}
+    
+    active = (values[ACTIVE_KEY_ID_PARAM], values.get(ACTIVE_SECRET_ARN_PARAM, PRIVATE_KEY_SECRET_ARN))
+    inactive = None
+    if values.get(INACTIVE_KEY_ID_PARAM) and values.get(INACTIVE_SECRET_ARN_PARAM):
+        inactive = (values[INACTIVE_KEY_ID_PARAM], values[INACTIVE_SECRET_ARN_PARAM])
+    return {'active': active, 'inactive': inactive}
+
+
+def load_private_key_secret(secret_arn):
+    """
+    Fetch and parse a CloudFront private key from Secrets Manager
+    """
+    with metrics.phase('KeyLoad'):
+        response = get_secretsmanager().get_secret_value(SecretId=secret_arn)
+        return load_private_key(response['SecretString'])
+
+
+def get_key_ring():
     """
-    Retrieve CloudFront private key from Secrets Manager (with caching)
+    Get the rotation-aware signing key cache (created on first use)
     """
-    global _private_key_cache
+    global _key_ring
     
-    if _private_key_cache is not None:
-        return _private_key_cache
+    if _key_ring is None:
+        with _client_lock:
+            if _key_ring is None:
+                ttl = KEY_CACHE_TTL if ACTIVE_KEY_ID_PARAM else 0
+                _key_ring = KeyRing(load_key_metadata, load_private_key_secret, ttl_seconds=ttl)
     
+    return _key_ring
+
+
+def get_active_key():
+    """
+    Active signing key entry (key_id, private_key, signer)
+    """
     try:
-        response = secretsmanager.get_secret_value(SecretId=PRIVATE_KEY_SECRET_ARN)
-        private_key_pem = response['SecretString']
-        
-        # Load private key
-        _private_key_cache = serialization.load_pem_private_key(
-            private_key_pem.encode('utf-8'),
-            password=None,
-            backend=default_backend()
+        return get_key_ring().active()
+    except Exception as e:
+        print(f"Error loading private key: {str(e)}")
+        raise
+
+
+def get_private_key():
+    """
+    Retrieve the active CloudFront private key (cached per key ID)
+    """
+    return get_active_key().private_key
+
+
+def get_cloudfront_signer():
+    """
+    Get botocore CloudFront signer for the active key (cached per key ID)
+    """
+    entry = get_active_key()
+    signer = _cloudfront_signer_cache.get(entry.key_id)
+    if signer is not None:
+        return signer
+    
+    from botocore.signers import CloudFrontSigner
+    
+    signer = CloudFrontSigner(entry.key_id, rsa_signer(entry.private_key))
+    _cloudfront_signer_cache[entry.key_id] = signer
+    return signer
+
+
+def get_fast_signer():
+    """
+    Get fast-path signer for the active key
+    """
+    return get_active_key().signer
+
+
+def get_key_cache_stats():
+    """
+    Refresh/switch counters and loaded key IDs of the signing key cache
+    """
+    if _key_ring is None:
+        return {'loaded': False}
+    return dict(_key_ring.describe(), loaded=True)
+
+
+def compute_expire_timestamp(expiration_seconds):
+    """
+    Calculate the Unix expiry for a new signature
+    With URL_EXPIRY_WINDOW set, the start time is rounded up to the next
+    window boundary, so the URL stays valid for at least expiration_seconds
+    """
+    now = time.time()
+    if URL_EXPIRY_WINDOW > 0:
+        now = -(-int(now) // URL_EXPIRY_WINDOW) * URL_EXPIRY_WINDOW
+    return int(now + expiration_seconds)
+
+
+def get_signed_url_cache_stats():
+    """
+    Hit/miss counters for the quantized signed URL cache
+    """
+    return dict(_signed_url_cache.stats(), enabled=URL_EXPIRY_WINDOW > 0, window=URL_EXPIRY_WINDOW)
+
+
+def generate_signed_url_botocore(url, expire_timestamp, custom_policy):
+    """
+    Sign url with boto3's CloudFrontSigner (reference implementation)
+    """
+    signer = get_cloudfront_signer()
+    
+    if custom_policy:
+        # Create custom policy JSON
+        policy = {
+            "Statement": [
+                {
+                    "Resource": url,
+                    "Condition": {
+                        "DateLessThan": {
+                            "AWS:EpochTime": expire_timestamp
+                        }
+                    }
+                }
+            ]
+        }
+        
+        # Generate signed URL with custom policy
+        policy_json = json.dumps(policy, separators=(',', ':'))
+        return signer.generate_presigned_url(
+            url,
+            policy=policy_json
         )
+    
+    # For GET/HEAD, use simple canned policy
+    expire_date = datetime.utcfromtimestamp(expire_timestamp)
+    return signer.generate_presigned_url(
+        url,
+        date_less_than=expire_date
+    )
+
+
+def generate_signed_url(object_key, expiration_seconds, method='GET'):
+    """
+    Generate CloudFront signed URL
+    For PUT/POST, uses custom policy to avoid method restrictions
+    GET/HEAD URLs are memoized per expiry window when URL_EXPIRY_WINDOW is set
+    """
+    try:
+        # Calculate expiration time (Unix timestamp)
+        expire_timestamp = compute_expire_timestamp(expiration_seconds)
+        
+        cache_key = None
+        if URL_EXPIRY_WINDOW > 0 and method.upper() in ['GET', 'HEAD']:
+            cache_key = (object_key, method.upper(), expire_timestamp, get_fast_signer().key_id)
+            cached_url = _signed_url_cache.get(cache_key)
+            if cached_url is not None:
+                return cached_url
+        
+        # Build CloudFront URL
+        url = f"https://{CLOUDFRONT_DOMAIN}/{object_key}"
+        
+        # For PUT/POST, we need a custom policy that doesn't restrict HTTP method
+        # CloudFront's canned policy only works for GET requests
+        custom_policy = method.upper() in ['PUT', 'POST', 'DELETE', 'PATCH']
+        
+        if SIGNER_IMPLEMENTATION == 'botocore':
+            signed_url = generate_signed_url_botocore(url, expire_timestamp, custom_policy)
+        elif custom_policy:
+            signed_url = get_fast_signer().custom_url(url, expire_timestamp)
+        else:
+            signed_url = get_fast_signer().canned_url(url, expire_timestamp)
         
-        return _private_key_cache
+        if cache_key is not None:
+            _signed_url_cache.put(cache_key, signed_url)
+        
+        return signed_url
+    
     except Exception as e:
-        print(f"Error loading private key: {str(e)}")
+        print(f"Error generating signed URL: {str(e)}")
+        raise
+
+
+def generate_signed_cookies(resource_path, expiration_seconds):
+    """
+    Generate CloudFront signed cookies for a custom policy
+    resource_path may end in a wildcard (e.g. "uploads/acme/*") so one
+    signature covers every object under the prefix
+    """
+    try:
+        resource = f"https://{CLOUDFRONT_DOMAIN}/{resource_path}"
+        expire_timestamp = int(time.time() + expiration_seconds)
+        
+        return get_fast_signer().signed_cookies(resource, expire_timestamp)
+    
+    except Exception as e:
+        print(f"Error generating signed cookies: {str(e)}")
         raise
 
 
-def get_cloudfront_signer():
+def sign_many(object_keys, expiration_seconds, method='GET'):
+    """
+    Sign several object keys concurrently
+    Returns a list of (signed_url, error) tuples in input order
+    """
+    # Load the key once up front so workers don't race to Secrets Manager
+    get_private_key()
+
+    def sign_one(object_key):
+        try:
+            return generate_signed_url(object_key, expiration_seconds, method=method), None
+        except Exception as e:
+            return None, str(e)
+
+    if len(object_keys) <= 1:
+        return [sign_one(key) for key in object_keys]
+
+    with ThreadPoolExecutor(max_workers=min(SIGNING_WORKERS, len(object_keys))) as executor:
+        return list(executor.map(sign_one, object_keys))
+
+
+def backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter for DynamoDB batch retries
+    """
+    return random.uniform(0, min(1.0, 0.05 * (2 ** attempt)))
+
+
+def batch_write(write_requests):
+    """
+    Send PutRequest/DeleteRequest entries with BatchWriteItem
+    Unprocessed items are retried with backoff; returns (request, error)
+    pairs for anything that could not be written
+    """
+    failed = []
+
+    for start in range(0, len(write_requests), DYNAMODB_BATCH_WRITE_SIZE):
+        pending = write_requests[start:start + DYNAMODB_BATCH_WRITE_SIZE]
+        attempt = 0
+
+        while pending:
+            try:
+                response = get_dynamodb().batch_write_item(RequestItems={TABLE_NAME: pending})
+            except Exception as e:
+                print(f"Batch write error: {str(e)}")
+                failed.extend((request, str(e)) for request in pending)
+                break
+
+            pending = response.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+            if not pending:
+                break
+
+            attempt += 1
+            if attempt > BATCH_MAX_RETRIES:
+                failed.extend((request, 'Write throttled, retry later') for request in pending)
+                break
+            time.sleep(backoff_delay(attempt))
+
+    return failed
+
+
+def batch_get(file_ids, consistent=False):
+    """
+    Fetch metadata items with BatchGetItem
+    Unprocessed keys are retried with backoff; returns (items_by_id, unresolved)
+    where unresolved maps file IDs that could not be read to an error
+    """
+    items = {}
+    unresolved = {}
+
+    for start in range(0, len(file_ids), DYNAMODB_BATCH_GET_SIZE):
+        keys = [{'file_id': file_id} for file_id in file_ids[start:start + DYNAMODB_BATCH_GET_SIZE]]
+        attempt = 0
+
+        while keys:
+            try:
+                response = get_dynamodb().batch_get_item(
+                    RequestItems={TABLE_NAME: {'Keys': keys, 'ConsistentRead': consistent}}
+                )
+            except Exception as e:
+                print(f"Batch get error: {str(e)}")
+                unresolved.update((key['file_id'], str(e)) for key in keys)
+                break
+
+            for item in response.get('Responses', {}).get(TABLE_NAME, []):
+                items[item['file_id']] = item
+
+            keys = response.get('UnprocessedKeys', {}).get(TABLE_NAME, {}).get('Keys', [])
+            if not keys:
+                break
+
+            attempt += 1
+            if attempt > BATCH_MAX_RETRIES:
+                unresolved.update((key['file_id'], 'Read throttled, retry later') for key in keys)
+                break
+            time.sleep(backoff_delay(attempt))
+
+    return items, unresolved
+
+
+def serialize_body(body):
+    """
+    JSON encode a response body (timed as the Serialize phase)
+    """
+    with metrics.phase('Serialize'):
+        return json.dumps(body)
+
+
+def create_response(status_code, body):
+    """
+    Create API Gateway response
+    """
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+        },
+        'body': serialize_body(body)
+    }
+
+
+def request_header(event, name):
+    """
+    Case-insensitive request header lookup (None when absent)
+    """
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is None:
+        name = name.lower()
+        value = next((v for k, v in headers.items() if k.lower() == name), None)
+    return value
+
+
+def accepts_gzip(event):
+    """
+    True when Accept-Encoding allows gzip (and does not refuse it with q=0)
+    """
+    accept = request_header(event, 'Accept-Encoding')
+    if not accept:
+        return False
+    for coding in accept.lower().split(','):
+        name, _, params = coding.partition(';')
+        if name.strip() not in ('gzip', '*'):
+            continue
+        params = params.replace(' ', '')
+        if not params.startswith('q='):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def create_conditional_response(event, body):
+    """
+    200 response with an ETag over the serialized body, or 304 when it
+    matches If-None-Match (weak, since the body may also be sent gzipped)
+    """
+    response = create_response(200, body)
+    etag = 'W/"%s"' % hashlib.md5(response['body'].encode('utf-8'), usedforsecurity=False).hexdigest()
+    response['headers']['ETag'] = etag
+    
+    if_none_match = request_header(event, 'If-None-Match')
+    if if_none_match:
+        # Weak comparison: opaque tags must match, with or without W/
+        candidates = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' in candidates or etag[2:] in [tag[2:] if tag.startswith('W/') else tag for tag in candidates]:
+            response['statusCode'] = 304
+            response['body'] = ''
+            metrics.set_property('NotModified', True)
+    return response
+
+
+def encode_response(event, response):
+    """
+    gzip large bodies for clients that accept it (COMPRESS_MIN_BYTES)
+    """
+    body = response.get('body')
+    if (COMPRESS_MIN_BYTES <= 0 or not body or response.get('isBase64Encoded')
+            or len(body) < COMPRESS_MIN_BYTES or not accepts_gzip(event)):
+        return response
+    
+    with metrics.phase('Serialize'):
+        raw = body.encode('utf-8')
+        compressed = gzip.compress(raw, compresslevel=COMPRESS_LEVEL, mtime=0)
+        if len(compressed) >= len(raw):
+            return response
+        response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    headers = response.setdefault('headers', {})
+    headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept-Encoding'
+    metrics.set_property('CompressionRatio', round(len(raw) / len(compressed), 2))
+    return response
+
+
+def key_shard(file_id):
+    """
+    Hashed prefix segments of file_id in the sharded layout, e.g. 'ab/cd'
+    """
+    digest = hashlib.md5(file_id.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return '/'.join(digest[level * KEY_SHARD_WIDTH:(level + 1) * KEY_SHARD_WIDTH]
+                    for level in range(KEY_SHARD_LEVELS))
+
+
+def tenant_prefix(tenant):
+    """
+    Key prefix of a tenant's uploads, e.g. 'uploads/acme/'
+    """
+    return f"{UPLOAD_PREFIX}{tenant}/"
+
+
+def object_key_for(file_id, tenant=None):
+    """
+    S3 object key of a new upload in the configured KEY_LAYOUT
+    """
+    prefix = tenant_prefix(tenant) if tenant else UPLOAD_PREFIX
+    if KEY_LAYOUT == 'sharded':
+        return f"{prefix}{key_shard(file_id)}/{file_id}"
+    return f"{prefix}{file_id}"
+
+
+def file_id_for_key(object_key):
+    """
+    File ID an upload's object key was built from, in either layout, with
+    or without a tenant; returns None for keys outside the uploads prefix
+    """
+    if not object_key.startswith(UPLOAD_PREFIX):
+        return None
+    path = object_key[len(UPLOAD_PREFIX):]
+    # Tenant and shard segments never contain '_'; the ID starts at the first
+    # segment that looks like one and may itself contain '/'
+    segments = path.split('/')
+    for position, segment in enumerate(segments):
+        if FILE_ID_START.match(segment):
+            return '/'.join(segments[position:])
+    return path
+
+
+def build_upload_item(filename, content_type, tenant=None):
+    """
+    Build the DynamoDB metadata item for a new upload
+    """
+    # Generate unique file ID
+    file_id = f"{uuid.uuid4().hex[:8]}_{filename}"
+
+    item = {
+        'file_id': file_id,
+        'original_filename': filename,
+        'content_type': content_type,
+        'object_key': object_key_for(file_id, tenant),
+        'upload_url_generated_at': datetime.utcnow().isoformat(),
+        'status': 'pending',
+        'ttl': int(time.time()) + (24 * 3600)  # 24 hours TTL
+    }
+    if tenant:
+        item['tenant'] = tenant
+    return item
+
+
+def parse_tenant(value):
+    """
+    Tenant from a request, or None when not given
+    Raises ValueError for anything that cannot be a single key segment
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str) or not TENANT_PATTERN.match(value):
+        raise ValueError('tenant must be 1-63 letters, digits or hyphens')
+    return value
+
+
+def parse_content_hash(value):
+    """
+    Lower-case hex SHA-256 from a request, or None when not given
+    Raises ValueError for anything that is not a SHA-256 digest
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str) or not SHA256_PATTERN.match(value.lower()):
+        raise ValueError('sha256 must be a hex-encoded SHA-256 digest')
+    return value.lower()
+
+
+def checksum_sha256(content_hash):
+    """
+    Base64 digest for the x-amz-checksum-sha256 header; S3 rejects a PUT
+    whose body does not match it
+    """
+    return base64.b64encode(bytes.fromhex(content_hash)).decode('ascii')
+
+
+def error_code(error):
+    """
+    AWS error code of a botocore ClientError (None for other exceptions)
+    """
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+def get_content_index():
+    return get_dynamodb().Table(CONTENT_INDEX_TABLE_NAME)
+
+
+def content_index_key(content_hash, tenant=None):
+    """
+    Content index key of a digest; each tenant has its own entries, so a
+    tenant's files only ever point at objects under the tenant's prefix
+    """
+    return {'content_hash': f"{tenant}/{content_hash}" if tenant else content_hash}
+
+
+def acquire_content_ref(content_hash, tenant=None):
+    """
+    Take a reference on the stored object with this content hash
+    Returns the index entry, or None when the hash is unknown, its object is
+    gone, or its last reference is being released (upload normally then)
+    """
+    from boto3.dynamodb.conditions import Attr
+    
+    index = get_content_index()
+    key = content_index_key(content_hash, tenant)
+    with metrics.phase('DynamoDB'):
+        entry = index.get_item(Key=key).get('Item')
+    if entry is None or entry.get('revoked'):
+        return None
+    
+    # Lifecycle rules or manual cleanup can remove objects behind the index
+    try:
+        with metrics.phase('S3'):
+            get_s3_client().head_object(Bucket=BUCKET_NAME, Key=entry['object_key'])
+    except Exception as e:
+        if error_code(e) not in ('404', 'NoSuchKey'):
+            raise
+        print(f"Stored object {entry['object_key']} is missing, dropping content index entry")
+        try:
+            with metrics.phase('DynamoDB'):
+                index.delete_item(
+                    Key=key,
+                    ConditionExpression=Attr('object_key').eq(entry['object_key'])
+                )
+        except Exception as delete_error:
+            if error_code(delete_error) != 'ConditionalCheckFailedException':
+                raise
+        return None
+    
+    try:
+        with metrics.phase('DynamoDB'):
+            response = index.update_item(
+                Key=key,
+                UpdateExpression='SET ref_count = ref_count + :one',
+                ConditionExpression=(Attr('object_key').eq(entry['object_key']) & Attr('ref_count').gt(0)
+                                     & Attr('revoked').not_exists()),
+                ExpressionAttributeValues={':one': 1},
+                ReturnValues='ALL_NEW'
+            )
+    except Exception as e:
+        if error_code(e) == 'ConditionalCheckFailedException':
+            return None
+        raise
+    return response['Attributes']
+
+
+def release_content_ref(item):
+    """
+    Drop a deduplicated file's reference on its stored object
+    Returns True when it was the last one and the object can be deleted
+    """
+    from boto3.dynamodb.conditions import Attr
+    
+    index = get_content_index()
+    key = content_index_key(item['content_hash'], item.get('tenant'))
+    try:
+        with metrics.phase('DynamoDB'):
+            response = index.update_item(
+                Key=key,
+                UpdateExpression='SET ref_count = ref_count - :one',
+                ConditionExpression=Attr('object_key').eq(item['object_key']),
+                ExpressionAttributeValues={':one': 1},
+                ReturnValues='UPDATED_NEW'
+            )
+    except Exception as e:
+        if error_code(e) == 'ConditionalCheckFailedException':
+            # The entry was dropped (object missing) or now points elsewhere
+            return True
+        raise
+    
+    if response['Attributes']['ref_count'] > 0:
+        return False
+    
+    # No new references can be taken at zero; remove the entry with the object
+    try:
+        with metrics.phase('DynamoDB'):
+            index.delete_item(
+                Key=key,
+                ConditionExpression=Attr('object_key').eq(item['object_key']) & Attr('ref_count').lte(0)
+            )
+    except Exception as e:
+        if error_code(e) == 'ConditionalCheckFailedException':
+            return False
+        raise
+    return True
+
+
+def release_shared_object(item):
+    """
+    Release a deduplicated file's reference, deleting the object with the last one
+    """
+    if release_content_ref(item):
+        with metrics.phase('S3'):
+            get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=item['object_key'])
+
+
+def upload_duplicate(filename, content_type, content_hash, tenant=None):
+    """
+    Create a file that shares an already stored object with the same content
+    Returns the new metadata item, or None when the content is not stored yet
+    """
+    entry = acquire_content_ref(content_hash, tenant)
+    if entry is None:
+        return None
+    
+    item = build_upload_item(filename, content_type, tenant)
+    item.update({
+        'object_key': entry['object_key'],
+        'status': 'uploaded',
+        'size': entry.get('size', 0),
+        'uploaded_at': datetime.utcnow().isoformat(),
+        'content_hash': content_hash,
+        'content_ref': True
+    })
+    # Only pending uploads expire; TTL deletes would leak the reference
+    del item['ttl']
+    
+    try:
+        table = get_dynamodb().Table(TABLE_NAME)
+        with metrics.phase('DynamoDB'):
+            table.put_item(Item=item)
+    except Exception:
+        release_shared_object(item)
+        raise
+    return item
+
+
+def register_content(item):
+    """
+    Add an uploaded object to the content index, or re-check a registered one
+    Objects are registered only when their S3 SHA-256 checksum matches the
+    hash the client sent, so a wrong hash can never redirect other uploads.
+    A registered object that is overwritten with other bytes (its upload URL
+    is still valid) is revoked: existing references stay, no new ones are
+    taken. Returns True when the item holds a reference.
+    """
+    from boto3.dynamodb.conditions import Attr
+    
+    with metrics.phase('S3'):
+        head = get_s3_client().head_object(Bucket=BUCKET_NAME, Key=item['object_key'], ChecksumMode='ENABLED')
+    verified = head.get('ChecksumSHA256') == checksum_sha256(item['content_hash'])
+    
+    index = get_content_index()
+    key = content_index_key(item['content_hash'], item.get('tenant'))
+    if item.get('content_ref'):
+        if not verified:
+            print(f"Content of {item['object_key']} no longer matches {item['content_hash']}, revoking")
+            try:
+                with metrics.phase('DynamoDB'):
+                    index.update_item(
+                        Key=key,
+                        UpdateExpression='SET revoked = :true',
+                        ConditionExpression=Attr('object_key').eq(item['object_key']),
+                        ExpressionAttributeValues={':true': True}
+                    )
+            except Exception as e:
+                if error_code(e) != 'ConditionalCheckFailedException':
+                    raise
+        return True
+    if not verified:
+        return False
+    
+    try:
+        with metrics.phase('DynamoDB'):
+            index.put_item(
+                Item={
+                    **key,
+                    'object_key': item['object_key'],
+                    'ref_count': 1,
+                    'size': item.get('size', 0),
+                    'created_at': datetime.utcnow().isoformat()
+                },
+                ConditionExpression=Attr('content_hash').not_exists()
+            )
+    except Exception as e:
+        if error_code(e) != 'ConditionalCheckFailedException':
+            raise
+        # Already registered: by this object (a retried event) or by another copy
+        with metrics.phase('DynamoDB'):
+            entry = index.get_item(Key=key, ConsistentRead=True).get('Item')
+        return entry is not None and entry['object_key'] == item['object_key']
+    return True
+
+
+def dedup_response(item):
+    """
+    Upload response for a file created from stored content (nothing to PUT)
+    """
+    return {
+        'success': True,
+        'deduplicated': True,
+        'uploadUrl': None,
+        'fileId': item['file_id'],
+        'filename': item['original_filename'],
+        'size': int(item['size'])
+    }
+
+
+@metrics.route('upload')
+def handle_upload(event, body_data):
+    """
+    Generate CloudFront signed URL for file upload (PUT)
+    Uses custom policy to support PUT operations through CloudFront
+    """
+    try:
+        # Get parameters
+        filename = body_data.get('filename')
+        content_type = body_data.get('contentType', 'application/octet-stream')
+        
+        if not filename:
+            return create_response(400, {'success': False, 'error': 'filename is required'})
+        
+        try:
+            content_hash = parse_content_hash(body_data.get('sha256'))
+            tenant = parse_tenant(body_data.get('tenant'))
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+        
+        # Known content: point a new file at the stored object, nothing to upload
+        if content_hash and CONTENT_INDEX_TABLE_NAME:
+            shared = upload_duplicate(filename, content_type, content_hash, tenant)
+            if shared is not None:
+                return create_response(200, dedup_response(shared))
+        
+        item = build_upload_item(filename, content_type, tenant)
+        if content_hash:
+            item['content_hash'] = content_hash
+        
+        # Generate CloudFront signed URL for upload with custom policy
+        # Custom policy allows PUT operations through CloudFront
+        with metrics.phase('Signing'):
+            signed_url = generate_signed_url(item['object_key'], UPLOAD_EXPIRATION, method='PUT')
+        
+        # Store metadata in DynamoDB
+        table = get_dynamodb().Table(TABLE_NAME)
+        with metrics.phase('DynamoDB'):
+            table.put_item(Item=item)
+        
+        body = {
+            'success': True,
+            'uploadUrl': signed_url,
+            'fileId': item['file_id'],
+            'expiresIn': UPLOAD_EXPIRATION
+        }
+        if content_hash:
+            # S3 verifies the body against this header; verified uploads join the content index
+            body['headers'] = {'x-amz-checksum-sha256': checksum_sha256(content_hash)}
+        
+        return create_response(200, body)
+    
+    except Exception as e:
+        print(f"Error in handle_upload: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+@metrics.route('upload_batch')
+def handle_upload_batch(event, body_data):
+    """
+    Generate signed upload URLs for many files in one request
+    Signing runs concurrently and metadata is written with BatchWriteItem;
+    failures are reported per item instead of failing the whole batch
+    """
+    try:
+        entries = body_data.get('files')
+        
+        if not isinstance(entries, list) or not entries:
+            return create_response(400, {'success': False, 'error': 'files must be a non-empty list'})
+        if len(entries) > MAX_BATCH_SIZE:
+            return create_response(400, {
+                'success': False,
+                'error': f'At most {MAX_BATCH_SIZE} files per batch'
+            })
+        
+        try:
+            tenant = parse_tenant(body_data.get('tenant'))
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+        
+        results = [None] * len(entries)
+        requests = []
+        
+        for index, entry in enumerate(entries):
+            filename = entry.get('filename') if isinstance(entry, dict) else None
+            if not filename:
+                results[index] = {'index': index, 'success': False, 'error': 'filename is required'}
+                continue
+            try:
+                content_hash = parse_content_hash(entry.get('sha256'))
+            except ValueError as e:
+                results[index] = {'index': index, 'success': False, 'error': str(e)}
+                continue
+            requests.append((index, filename, entry.get('contentType', 'application/octet-stream'), content_hash))
+        
+        # Entries whose content is already stored become files without an upload
+        hashed = [request for request in requests if request[3]] if CONTENT_INDEX_TABLE_NAME else []
+        if hashed:
+            def reuse(request):
+                try:
+                    return upload_duplicate(*request[1:], tenant), None
+                except Exception as e:
+                    return None, str(e)
+            
+            # Phases are not recorded in worker threads; the fan-out (DynamoDB and
+            # S3 calls per entry) gets a phase of its own
+            with metrics.phase('Dedup'):
+                with ThreadPoolExecutor(max_workers=min(SIGNING_WORKERS, len(hashed))) as executor:
+                    reused = list(executor.map(reuse, hashed))
+            for request, (shared, error) in zip(hashed, reused):
+                index = request[0]
+                if error:
+                    results[index] = {'index': index, 'success': False, 'error': error}
+                elif shared is not None:
+                    results[index] = dict(index=index, **dedup_response(shared))
+        
+        items = []
+        for index, filename, content_type, content_hash in requests:
+            if results[index] is not None:
+                continue
+            item = build_upload_item(filename, content_type, tenant)
+            if content_hash:
+                item['content_hash'] = content_hash
+            items.append((index, item))
+        
+        # Sign all valid entries concurrently
+        with metrics.phase('Signing'):
+            signatures = sign_many([item['object_key'] for _, item in items], UPLOAD_EXPIRATION, method='PUT')
+        
+        signed = []
+        for (index, item), (signed_url, error) in zip(items, signatures):
+            if error:
+                results[index] = {'index': index, 'success': False, 'error': error}
+                continue
+            results[index] = {
+                'index': index,
+                'success': True,
+                'uploadUrl': signed_url,
+                'fileId': item['file_id'],
+                'filename': item['original_filename']
+            }
+            if 'content_hash' in item:
+                results[index]['headers'] = {'x-amz-checksum-sha256': checksum_sha256(item['content_hash'])}
+            signed.append((index, item))
+        
+        # Store metadata only for entries that were signed
+        with metrics.phase('DynamoDB'):
+            failed_writes = batch_write([{'PutRequest': {'Item': item}} for _, item in signed])
+        if failed_writes:
+            index_by_file_id = {item['file_id']: index for index, item in signed}
+            for request, error in failed_writes:
+                index = index_by_file_id[request['PutRequest']['Item']['file_id']]
+                results[index] = {'index': index, 'success': False, 'error': error}
+        
+        failed = sum(1 for result in results if not result['success'])
+        metrics.set_property('BatchSize', len(results))
+        
+        return create_response(200, {
+            'success': failed == 0,
+            'files': results,
+            'count': len(results),
+            'failed': failed,
+            'expiresIn': UPLOAD_EXPIRATION
+        })
+    
+    except Exception as e:
+        print(f"Error in handle_upload_batch: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+def multipart_part_key(object_key, upload_id, part_number):
+    """
+    Object key plus the UploadPart query string, signed as one resource
+    """
+    return f"{object_key}?partNumber={part_number}&uploadId={quote(upload_id, safe='')}"
+
+
+def get_multipart_item(file_id):
+    """
+    Metadata item of an in-progress multipart upload, or None
+    """
+    table = get_dynamodb().Table(TABLE_NAME)
+    with metrics.phase('DynamoDB'):
+        response = table.get_item(Key={'file_id': file_id}, ConsistentRead=True)
+    item = response.get('Item')
+    if item is None or item.get('status') != 'uploading' or not item.get('upload_id'):
+        return None
+    return item
+
+
+def parse_part_list(parts):
+    """
+    Validate [{partNumber, etag}] entries; returns {part_number: etag}
+    """
+    if not isinstance(parts, list):
+        raise ValueError('parts must be a list of {partNumber, etag}')
+    
+    result = {}
+    for part in parts:
+        try:
+            number = int(part['partNumber'])
+            etag = str(part.get('etag') or part['ETag'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('parts must be a list of {partNumber, etag}')
+        if number < 1 or number > S3_MAX_PARTS:
+            raise ValueError(f'partNumber must be between 1 and {S3_MAX_PARTS}')
+        result[number] = etag
+    return result
+
+
+def recorded_parts(item):
+    """
+    {part_number: etag} stored on a multipart upload item
+    """
+    return {int(number): etag for number, etag in (item.get('parts') or {}).items()}
+
+
+@metrics.route('multipart_initiate')
+def handle_multipart_initiate(event, body_data):
+    """
+    Start an S3 multipart upload and record it on a new metadata item
+    Part URLs are then requested in ranges, so large files can be uploaded
+    in parallel and resumed after a failure
+    """
+    try:
+        filename = body_data.get('filename')
+        content_type = body_data.get('contentType', 'application/octet-stream')
+        
+        if not filename:
+            return create_response(400, {'success': False, 'error': 'filename is required'})
+        
+        try:
+            file_size = int(body_data['fileSize']) if body_data.get('fileSize') is not None else None
+            part_size = int(body_data.get('partSize') or MULTIPART_PART_SIZE)
+        except (TypeError, ValueError):
+            return create_response(400, {'success': False, 'error': 'fileSize and partSize must be integers'})
+        
+        if part_size < S3_MIN_PART_SIZE:
+            return create_response(400, {
+                'success': False,
+                'error': f'partSize must be at least {S3_MIN_PART_SIZE} bytes'
+            })
+        
+        part_count = None
+        if file_size is not None:
+            # Grow the part size so the file fits in S3's part limit
+            part_size = max(part_size, -(-file_size // S3_MAX_PARTS))
+            part_count = max(1, -(-file_size // part_size))
+        
+        try:
+            content_hash = parse_content_hash(body_data.get('sha256'))
+            tenant = parse_tenant(body_data.get('tenant'))
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+        
+        # Multipart checksums are per part, so these uploads can reuse stored
+        # content but never register their own
+        if content_hash and CONTENT_INDEX_TABLE_NAME:
+            shared = upload_duplicate(filename, content_type, content_hash, tenant)
+            if shared is not None:
+                return create_response(200, dedup_response(shared))
+        
+        item = build_upload_item(filename, content_type, tenant)
+        
+        with metrics.phase('S3'):
+            response = get_s3_client().create_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=item['object_key'],
+                ContentType=content_type
+            )
+        
+        item.update({
+            'status': 'uploading',
+            'upload_id': response['UploadId'],
+            'part_size': part_size,
+            'parts': {},
+            'ttl': int(time.time()) + MULTIPART_TTL_HOURS * 3600
+        })
+        if file_size is not None:
+            item['file_size'] = file_size
+        
+        table = get_dynamodb().Table(TABLE_NAME)
+        with metrics.phase('DynamoDB'):
+            table.put_item(Item=item)
+        
+        return create_response(200, {
+            'success': True,
+            'fileId': item['file_id'],
+            'uploadId': item['upload_id'],
+            'partSize': part_size,
+            'partCount': part_count
+        })
+    
+    except Exception as e:
+        print(f"Error in handle_multipart_initiate: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+@metrics.route('multipart_status')
+def handle_multipart_status(event, file_id):
+    """
+    Report an upload's part size and recorded parts, for resuming
+    """
+    try:
+        item = get_multipart_item(file_id)
+        if item is None:
+            return create_response(404, {'success': False, 'error': 'Multipart upload not found'})
+        
+        parts = recorded_parts(item)
+        return create_response(200, {
+            'success': True,
+            'fileId': file_id,
+            'uploadId': item['upload_id'],
+            'partSize': int(item['part_size']),
+            'fileSize': int(item['file_size']) if 'file_size' in item else None,
+            'completedParts': [{'partNumber': number, 'etag': parts[number]} for number in sorted(parts)]
+        })
+    
+    except Exception as e:
+        print(f"Error in handle_multipart_status: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+@metrics.route('multipart_parts')
+def handle_multipart_parts(event, file_id, body_data):
+    """
+    Record finished parts and sign PUT URLs for a range of part numbers
+    Parts already recorded as finished are skipped, so a resumed client
+    can ask for the full range again
+    """
+    try:
+        try:
+            completed = parse_part_list(body_data.get('completedParts') or [])
+            if body_data.get('partNumbers') is not None:
+                numbers = [int(number) for number in body_data['partNumbers']]
+            elif body_data.get('startPart') is not None:
+                start = int(body_data['startPart'])
+                end = int(body_data.get('endPart', start))
+                numbers = list(range(start, end + 1))
+            else:
+                numbers = []
+        except (TypeError, ValueError) as e:
+            return create_response(400, {'success': False, 'error': str(e) or 'Invalid part numbers'})
+        
+        if any(number < 1 or number > S3_MAX_PARTS for number in numbers):
+            return create_response(400, {
+                'success': False,
+                'error': f'Part numbers must be between 1 and {S3_MAX_PARTS}'
+            })
+        if len(numbers) > MULTIPART_MAX_URLS:
+            return create_response(400, {
+                'success': False,
+                'error': f'At most {MULTIPART_MAX_URLS} part URLs per request'
+            })
+        
+        item = get_multipart_item(file_id)
+        if item is None:
+            return create_response(404, {'success': False, 'error': 'Multipart upload not found'})
+        
+        parts = recorded_parts(item)
+        
+        if completed:
+            # One attribute per part, so parallel uploaders never overwrite each other
+            from boto3.dynamodb.conditions import Attr
+            
+            names = {'#parts': 'parts'}
+            values = {}
+            assignments = []
+            for i, (number, etag) in enumerate(sorted(completed.items())):
+                names[f'#p{i}'] = str(number)
+                values[f':e{i}'] = etag
+                assignments.append(f'#parts.#p{i} = :e{i}')
+            table = get_dynamodb().Table(TABLE_NAME)
+            with metrics.phase('DynamoDB'):
+                table.update_item(
+                    Key={'file_id': file_id},
+                    UpdateExpression='SET ' + ', '.join(assignments),
+                    ConditionExpression=Attr('upload_id').eq(item['upload_id']),
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+            parts.update(completed)
+        
+        pending = [number for number in dict.fromkeys(numbers) if number not in parts]
+        keys = [multipart_part_key(item['object_key'], item['upload_id'], number) for number in pending]
+        
+        with metrics.phase('Signing'):
+            signatures = sign_many(keys, UPLOAD_EXPIRATION, method='PUT')
+        
+        urls = []
+        for number, (signed_url, error) in zip(pending, signatures):
+            if error:
+                urls.append({'partNumber': number, 'success': False, 'error': error})
+            else:
+                urls.append({'partNumber': number, 'success': True, 'uploadUrl': signed_url})
+        
+        metrics.set_property('BatchSize', len(pending))
+        
+        return create_response(200, {
+            'success': all(entry['success'] for entry in urls),
+            'fileId': file_id,
+            'parts': urls,
+            'completedParts': sorted(parts),
+            'expiresIn': UPLOAD_EXPIRATION
+        })
+    
+    except Exception as e:
+        print(f"Error in handle_multipart_parts: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+MULTIPART_CONFLICT = {
+    'success': False,
+    'error': 'Multipart upload was completed, aborted or deleted concurrently'
+}
+
+
+@metrics.route('multipart_complete')
+def handle_multipart_complete(event, file_id, body_data):
+    """
+    Complete a multipart upload and mark the file uploaded
+    Parts are merged from the item's recorded parts, the request and S3
+    ListParts, whose ETags win. When the file size is known, every part it
+    needs must be present, so a partial upload is never marked uploaded.
+    """
+    try:
+        try:
+            parts = parse_part_list(body_data.get('parts') or [])
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+        
+        item = get_multipart_item(file_id)
+        if item is None:
+            return create_response(404, {'success': False, 'error': 'Multipart upload not found'})
+        
+        s3 = get_s3_client()
+        parts = {**recorded_parts(item), **parts}
+        
+        # Clients may report only some of their parts; S3 knows them all
+        params = {'Bucket': BUCKET_NAME, 'Key': item['object_key'], 'UploadId': item['upload_id']}
+        while True:
+            with metrics.phase('S3'):
+                response = s3.list_parts(**params)
+            for part in response.get('Parts', []):
+                parts[part['PartNumber']] = part['ETag']
+            if not response.get('IsTruncated'):
+                break
+            params['PartNumberMarker'] = response['NextPartNumberMarker']
+        
+        if not parts:
+            return create_response(400, {'success': False, 'error': 'No parts have been uploaded'})
+        
+        if 'file_size' in item:
+            part_count = max(1, -(-int(item['file_size']) // int(item['part_size'])))
+            missing = [number for number in range(1, part_count + 1) if number not in parts]
+            unexpected = sorted(number for number in parts if number > part_count)
+            if missing or unexpected:
+                return create_response(400, {
+                    'success': False,
+                    'error': f'Upload needs parts 1-{part_count}',
+                    'missingParts': missing,
+                    'unexpectedParts': unexpected
+                })
+        
+        with metrics.phase('S3'):
+            response = s3.complete_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=item['object_key'],
+                UploadId=item['upload_id'],
+                MultipartUpload={'Parts': [
+                    {'PartNumber': number, 'ETag': parts[number]} for number in sorted(parts)
+                ]}
+            )
+        
+        from boto3.dynamodb.conditions import Attr
+        
+        table = get_dynamodb().Table(TABLE_NAME)
+        try:
+            with metrics.phase('DynamoDB'):
+                table.update_item(
+                    Key={'file_id': file_id},
+                    UpdateExpression='SET #status = :uploaded, etag = :etag, uploaded_at = :now '
+                                     'REMOVE upload_id, parts, #ttl',
+                    # Never recreate an aborted or deleted file, and only one complete wins
+                    ConditionExpression=Attr('file_id').exists() & Attr('upload_id').eq(item['upload_id']),
+                    ExpressionAttributeNames={'#status': 'status', '#ttl': 'ttl'},
+                    ExpressionAttributeValues={
+                        ':uploaded': 'uploaded',
+                        ':etag': response.get('ETag', ''),
+                        ':now': datetime.utcnow().isoformat()
+                    }
+                )
+        except Exception as e:
+            if error_code(e) != 'ConditionalCheckFailedException':
+                raise
+            return create_response(409, MULTIPART_CONFLICT)
+        
+        return create_response(200, {
+            'success': True,
+            'fileId': file_id,
+            'partCount': len(parts),
+            'etag': response.get('ETag')
+        })
+    
+    except Exception as e:
+        # S3 no longer knows the upload: another request completed or aborted it
+        if error_code(e) == 'NoSuchUpload':
+            return create_response(409, MULTIPART_CONFLICT)
+        print(f"Error in handle_multipart_complete: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+@metrics.route('multipart_abort')
+def handle_multipart_abort(event, file_id):
+    """
+    Abort a multipart upload, freeing its parts, and drop the metadata
+    """
+    try:
+        item = get_multipart_item(file_id)
+        if item is None:
+            return create_response(404, {'success': False, 'error': 'Multipart upload not found'})
+        
+        with metrics.phase('S3'):
+            get_s3_client().abort_multipart_upload(
+                Bucket=BUCKET_NAME,
+                Key=item['object_key'],
+                UploadId=item['upload_id']
+            )
+        
+        table = get_dynamodb().Table(TABLE_NAME)
+        with metrics.phase('DynamoDB'):
+            table.delete_item(Key={'file_id': file_id})
+        invalidate_file_metadata([file_id])
+        
+        return create_response(200, {'success': True, 'message': 'Multipart upload aborted'})
+    
+    except Exception as e:
+        print(f"Error in handle_multipart_abort: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+def get_file_metadata(file_id):
+    """
+    Metadata item for a download, or None when the file does not exist
+    Served from the in-process caches when possible; only uploaded files are
+    cached, since pending items change when the upload completes
+    """
+    item = _metadata_cache.get(file_id)
+    if item is not None:
+        metrics.set_property('MetadataCache', 'hit')
+        return item
+    if _missing_file_cache.get(file_id) is not None:
+        metrics.set_property('MetadataCache', 'negative_hit')
+        return None
+    metrics.set_property('MetadataCache', 'miss')
+    
+    table = get_dynamodb().Table(TABLE_NAME)
+    with metrics.phase('DynamoDB'):
+        response = table.get_item(Key={'file_id': file_id})
+    
+    item = response.get('Item')
+    if item is None:
+        _missing_file_cache.put(file_id, True, ttl=METADATA_NEGATIVE_TTL)
+    elif item.get('status') == 'uploaded':
+        _metadata_cache.put(file_id, item, ttl=METADATA_CACHE_TTL)
+    return item
+
+
+def invalidate_file_metadata(file_ids):
     """
-    Get CloudFront signer instance (with caching)
+    Drop cached metadata for deleted or replaced files
     """
-    global _cloudfront_signer_cache
-    
-    if _cloudfront_signer_cache is not None:
-        return _cloudfront_signer_cache
-    
-    # Create CloudFront signer
-    _cloudfront_signer_cache = CloudFrontSigner(
-        CLOUDFRONT_KEY_PAIR_ID,
-        rsa_signer
-    )
-    
-    return _cloudfront_signer_cache
+    for file_id in file_ids:
+        _metadata_cache.invalidate(file_id)
+        _missing_file_cache.invalidate(file_id)
 
 
-def generate_signed_url(object_key, expiration_seconds, method='GET'):
+def get_metadata_cache_stats():
     """
-    Generate CloudFront signed URL using boto3's CloudFrontSigner
-    For PUT/POST, uses custom policy to avoid method restrictions
+    Hit/miss counters of the download metadata caches
+    """
+    found = _metadata_cache.stats()
+    missing = _missing_file_cache.stats()
+    lookups = found['hits'] + found['misses']
+    hits = found['hits'] + missing['hits']
+    return {
+        'enabled': METADATA_CACHE_SIZE > 0,
+        'ttl': METADATA_CACHE_TTL,
+        'negativeTtl': METADATA_NEGATIVE_TTL,
+        'hitRate': round(hits / lookups, 4) if lookups else 0.0,
+        'found': found,
+        'notFound': missing
+    }
+
+
+@metrics.route('download')
+def handle_download(event, file_id):
+    """
+    Generate signed URL for file download (GET)
     """
     try:
-        # Get signer
-        signer = get_cloudfront_signer()
+        # Get file metadata (cached in warm containers)
+        item = get_file_metadata(file_id)
         
-        # Build CloudFront URL
-        url = f"https://{CLOUDFRONT_DOMAIN}/{object_key}"
+        if item is None:
+            return create_response(404, {'success': False, 'error': 'File not found'})
         
-        # Calculate expiration time (Unix timestamp)
-        expire_timestamp = int((datetime.utcnow() + timedelta(seconds=expiration_seconds)).timestamp())
+        object_key = item['object_key']
         
-        # For PUT/POST, we need a custom policy that doesn't restrict HTTP method
-        # CloudFront's canned policy only works for GET requests
-        if method.upper() in ['PUT', 'POST', 'DELETE', 'PATCH']:
-            # Create custom policy JSON
-            policy = {
-                "Statement": [
-                    {
-                        "Resource": url,
-                        "Condition": {
-                            "DateLessThan": {
-                                "AWS:EpochTime": expire_timestamp
-                            }
-                        }
-                    }
-                ]
-            }
-            
-            # Generate signed URL with custom policy
-            import json
-            policy_json = json.dumps(policy, separators=(',', ':'))
-            signed_url = signer.generate_presigned_url(
-                url,
-                policy=policy_json
-            )
-        else:
-            # For GET/HEAD, use simple canned policy
-            expire_date = datetime.utcnow() + timedelta(seconds=expiration_seconds)
-            signed_url = signer.generate_presigned_url(
-                url,
-                date_less_than=expire_date
-            )
+        # Generate signed URL for download
+        with metrics.phase('Signing'):
+            signed_url = generate_signed_url(object_key, DOWNLOAD_EXPIRATION, method='GET')
         
-        return signed_url
+        return create_response(200, {
+            'success': True,
+            'downloadUrl': signed_url,
+            'filename': item['original_filename'],
+            'contentType': item.get('content_type', 'application/octet-stream'),
+            'status': item.get('status', 'unknown'),
+            'size': int(item['size']) if 'size' in item else None,
+            'expiresIn': DOWNLOAD_EXPIRATION
+        })
     
     except Exception as e:
-        print(f"Error generating signed URL: {str(e)}")
-        raise
-
-
-def create_response(status_code, body):
-    """
-    Create API Gateway response
-    """
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-        },
-        'body': json.dumps(body)
-    }
+        print(f"Error in handle_download: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
 
 
-def handle_upload(event, body_data):
+@metrics.route('download_batch')
+def handle_download_batch(event, body_data):
     """
-    Generate CloudFront signed URL for file upload (PUT)
-    Uses custom policy to support PUT operations through CloudFront
+    Generate signed download URLs for many files in one request
+    Metadata is resolved with BatchGetItem and URLs are signed concurrently
     """
     try:
-        # Get parameters
-        filename = body_data.get('filename')
-        content_type = body_data.get('contentType', 'application/octet-stream')
+        file_ids = body_data.get('fileIds')
         
-        if not filename:
-            return create_response(400, {'success': False, 'error': 'filename is required'})
+        if not isinstance(file_ids, list) or not file_ids:
+            return create_response(400, {'success': False, 'error': 'fileIds must be a non-empty list'})
+        if len(file_ids) > MAX_BATCH_SIZE:
+            return create_response(400, {
+                'success': False,
+                'error': f'At most {MAX_BATCH_SIZE} file IDs per batch'
+            })
         
-        # Generate unique file ID
-        file_id = f"{uuid.uuid4().hex[:8]}_{filename}"
-        object_key = f"uploads/{file_id}"
+        # Drop duplicates and non-string IDs while keeping request order
+        unique_ids = list(dict.fromkeys(str(file_id) for file_id in file_ids if file_id))
         
-        # Generate CloudFront signed URL for upload with custom policy
-        # Custom policy allows PUT operations through CloudFront
-        signed_url = generate_signed_url(object_key, UPLOAD_EXPIRATION, method='PUT')
+        with metrics.phase('DynamoDB'):
+            items, unresolved = batch_get(unique_ids)
+        found = [items[file_id] for file_id in unique_ids if file_id in items]
         
-        # Store metadata in DynamoDB
-        table = dynamodb.Table(TABLE_NAME)
-        table.put_item(
-            Item={
-                'file_id': file_id,
-                'original_filename': filename,
-                'content_type': content_type,
-                'object_key': object_key,
-                'upload_url_generated_at': datetime.utcnow().isoformat(),
-                'status': 'pending',
-                'ttl': int(time.time()) + (24 * 3600)  # 24 hours TTL
+        with metrics.phase('Signing'):
+            signatures = sign_many([item['object_key'] for item in found], DOWNLOAD_EXPIRATION, method='GET')
+        
+        files = {}
+        for file_id in unique_ids:
+            if file_id in unresolved:
+                files[file_id] = {'success': False, 'error': unresolved[file_id]}
+            elif file_id not in items:
+                files[file_id] = {'success': False, 'error': 'File not found'}
+        
+        for item, (signed_url, error) in zip(found, signatures):
+            if error:
+                files[item['file_id']] = {'success': False, 'error': error}
+                continue
+            files[item['file_id']] = {
+                'success': True,
+                'downloadUrl': signed_url,
+                'filename': item['original_filename'],
+                'contentType': item.get('content_type', 'application/octet-stream')
             }
-        )
+        
+        failed = sum(1 for result in files.values() if not result['success'])
+        metrics.set_property('BatchSize', len(unique_ids))
         
         return create_response(200, {
-            'success': True,
-            'uploadUrl': signed_url,
-            'fileId': file_id,
-            'expiresIn': UPLOAD_EXPIRATION
+            'success': failed == 0,
+            'files': {file_id: files[file_id] for file_id in unique_ids},
+            'count': len(unique_ids),
+            'failed': failed,
+            'expiresIn': DOWNLOAD_EXPIRATION
         })
     
     except Exception as e:
-        print(f"Error in handle_upload: {str(e)}")
+        print(f"Error in handle_download_batch: {str(e)}")
         return create_response(500, {'success': False, 'error': str(e)})
 
 
-def handle_download(event, file_id):
+@metrics.route('cookies')
+def handle_signed_cookies(event, body_data):
     """
-    Generate signed URL for file download (GET)
+    Issue CloudFront signed cookies covering one tenant's uploads
+    Lets clients fetch the tenant's objects (uploads/<tenant>/*) for
+    DOWNLOAD_EXPIRATION seconds without requesting a signed URL per object
     """
     try:
-        # Get file metadata from DynamoDB
-        table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'file_id': file_id})
-        
-        if 'Item' not in response:
-            return create_response(404, {'success': False, 'error': 'File not found'})
+        query = event.get('queryStringParameters') or {}
+        try:
+            tenant = parse_tenant(body_data.get('tenant') or query.get('tenant'))
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+        # A cookie for the whole uploads prefix would open every tenant's files
+        if tenant is None:
+            return create_response(400, {'success': False, 'error': 'tenant is required'})
         
-        item = response['Item']
-        object_key = item['object_key']
+        resource_path = f"{tenant_prefix(tenant)}*"
+        with metrics.phase('Signing'):
+            cookies = generate_signed_cookies(resource_path, DOWNLOAD_EXPIRATION)
         
-        # Generate signed URL for download
-        signed_url = generate_signed_url(object_key, DOWNLOAD_EXPIRATION, method='GET')
+        cookie_attributes = f"Path=/; Secure; HttpOnly; SameSite=None; Max-Age={DOWNLOAD_EXPIRATION}"
+        if COOKIE_DOMAIN:
+            cookie_attributes += f"; Domain={COOKIE_DOMAIN}"
         
-        return create_response(200, {
+        response = create_response(200, {
             'success': True,
-            'downloadUrl': signed_url,
-            'filename': item['original_filename'],
-            'contentType': item.get('content_type', 'application/octet-stream'),
+            'cookies': cookies,
+            'resource': f"https://{CLOUDFRONT_DOMAIN}/{resource_path}",
             'expiresIn': DOWNLOAD_EXPIRATION
         })
+        response['multiValueHeaders'] = {
+            'Set-Cookie': [f"{name}={value}; {cookie_attributes}" for name, value in cookies.items()]
+        }
+        return response
     
     except Exception as e:
-        print(f"Error in handle_download: {str(e)}")
+        print(f"Error in handle_signed_cookies: {str(e)}")
         return create_response(500, {'success': False, 'error': str(e)})
 
 
+def encode_page_token(last_evaluated_key):
+    """
+    Turn a DynamoDB LastEvaluatedKey into an opaque nextToken
+    """
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def decode_page_token(token):
+    """
+    Turn a nextToken back into an ExclusiveStartKey (raises ValueError if invalid)
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('utf-8')))
+    except Exception:
+        raise ValueError('Invalid nextToken')
+    if not isinstance(key, dict) or 'file_id' not in key:
+        raise ValueError('Invalid nextToken')
+    return key
+
+
+def file_filter_params(status=None, uploaded_from=None, uploaded_to=None):
+    """
+    Pick the table read for a status/time-range filter
+    Returns (table.query or table.scan, keyword arguments). Filtering by
+    status queries the status/upload-time GSI, newest first; otherwise the
+    table is scanned with an optional time-range filter.
+    """
+    from boto3.dynamodb.conditions import Attr, Key
+    
+    table = get_dynamodb().Table(TABLE_NAME)
+    
+    if status:
+        # Index-backed: newest first within a status, optional time range
+        condition = Key('status').eq(status)
+        if uploaded_from and uploaded_to:
+            condition = condition & Key('upload_url_generated_at').between(uploaded_from, uploaded_to)
+        elif uploaded_from:
+            condition = condition & Key('upload_url_generated_at').gte(uploaded_from)
+        elif uploaded_to:
+            condition = condition & Key('upload_url_generated_at').lte(uploaded_to)
+        return table.query, {
+            'IndexName': STATUS_INDEX_NAME,
+            'KeyConditionExpression': condition,
+            'ScanIndexForward': False
+        }
+    
+    params = {}
+    if uploaded_from or uploaded_to:
+        time_filter = None
+        if uploaded_from:
+            time_filter = Attr('upload_url_generated_at').gte(uploaded_from)
+        if uploaded_to:
+            upper = Attr('upload_url_generated_at').lte(uploaded_to)
+            time_filter = upper if time_filter is None else time_filter & upper
+        params['FilterExpression'] = time_filter
+    return table.scan, params
+
+
+@metrics.route('list')
 def handle_list_files(event):
     """
-    List all files from DynamoDB
+    List files from DynamoDB one page at a time
+    Filtering by status queries the status/upload-time GSI; otherwise the
+    table is scanned page by page. Pass nextToken back to get the next page.
+    With includeUrls=true every row also carries a signed download URL
+    (pages are then capped at LIST_MAX_URLS rows)
     """
     try:
-        table = dynamodb.Table(TABLE_NAME)
-        response = table.scan()
+        query = event.get('queryStringParameters') or {}
+        
+        try:
+            limit = int(query.get('limit', LIST_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return create_response(400, {'success': False, 'error': 'limit must be an integer'})
+        if limit < 1 or limit > LIST_MAX_LIMIT:
+            return create_response(400, {
+                'success': False,
+                'error': f'limit must be between 1 and {LIST_MAX_LIMIT}'
+            })
+        
+        include_urls = str(query.get('includeUrls', '')).lower() == 'true'
+        if include_urls:
+            limit = min(limit, LIST_MAX_URLS)
+        
+        params = {'Limit': limit}
+        if query.get('nextToken'):
+            try:
+                params['ExclusiveStartKey'] = decode_page_token(query['nextToken'])
+            except ValueError as e:
+                return create_response(400, {'success': False, 'error': str(e)})
+        
+        read_page, filter_params = file_filter_params(query.get('status'), query.get('from'), query.get('to'))
+        params.update(filter_params)
+        
+        with metrics.phase('DynamoDB'):
+            response = read_page(**params)
+        items = response.get('Items', [])
         
         files = []
-        for item in response.get('Items', []):
+        for item in items:
             files.append({
                 'fileId': item['file_id'],
                 'filename': item['original_filename'],
                 'contentType': item.get('content_type', 'application/octet-stream'),
                 'uploadedAt': item.get('upload_url_generated_at'),
-                'status': item.get('status', 'unknown')
+                'status': item.get('status', 'unknown'),
+                'size': int(item['size']) if 'size' in item else None
             })
         
-        return create_response(200, {
+        body = {
             'success': True,
             'files': files,
-            'count': len(files)
-        })
+            'count': len(files),
+            'nextToken': encode_page_token(response.get('LastEvaluatedKey'))
+        }
+        
+        if include_urls and items:
+            with metrics.phase('Signing'):
+                signatures = sign_many([item['object_key'] for item in items], DOWNLOAD_EXPIRATION, method='GET')
+            for entry, (signed_url, error) in zip(files, signatures):
+                entry['downloadUrl'] = signed_url
+                if error:
+                    entry['error'] = error
+            metrics.set_property('BatchSize', len(items))
+        if include_urls:
+            body['expiresIn'] = DOWNLOAD_EXPIRATION
+        
+        return create_conditional_response(event, body)
     
     except Exception as e:
         print(f"Error in handle_list_files: {str(e)}")
         return create_response(500, {'success': False, 'error': str(e)})
 
 
+@metrics.route('delete')
 def handle_delete_file(event, file_id):
     """
     Delete file from S3 and DynamoDB
+    The metadata delete returns the old item, so the object key is known
+    without a separate read (one DynamoDB round trip)
     """
     try:
-        # Get file metadata
-        table = dynamodb.Table(TABLE_NAME)
-        response = table.get_item(Key={'file_id': file_id})
+        table = get_dynamodb().Table(TABLE_NAME)
+        with metrics.phase('DynamoDB'):
+            response = table.delete_item(Key={'file_id': file_id}, ReturnValues='ALL_OLD')
+        invalidate_file_metadata([file_id])
         
-        if 'Item' not in response:
+        if 'Attributes' not in response:
             return create_response(404, {'success': False, 'error': 'File not found'})
         
-        item = response['Item']
-        object_key = item['object_key']
+        old_item = response['Attributes']
         
-        # Delete from S3
+        # Delete from S3 (shared objects only with their last reference)
         try:
-            s3_client.delete_object(Bucket=BUCKET_NAME, Key=object_key)
+            if old_item.get('content_ref'):
+                release_shared_object(old_item)
+            else:
+                with metrics.phase('S3'):
+                    get_s3_client().delete_object(Bucket=BUCKET_NAME, Key=old_item['object_key'])
         except Exception as s3_error:
             print(f"S3 delete error (non-fatal): {str(s3_error)}")
         
-        # Delete from DynamoDB
-        table.delete_item(Key={'file_id': file_id})
-        
         return create_response(200, {
             'success': True,
             'message': 'File deleted successfully'
@@ -296,6 +1924,157 @@ def handle_delete_file(event, file_id):
         return create_response(500, {'success': False, 'error': str(e)})
 
 
+def find_files_to_delete(filter_data, limit):
+    """
+    Collect (file_id, object_key) pairs matching a bulk delete filter
+    Returns (items, truncated) where truncated means more files match than limit
+    """
+    read_page, params = file_filter_params(
+        filter_data.get('status'), filter_data.get('from'), filter_data.get('to')
+    )
+    params['ProjectionExpression'] = 'file_id, object_key, content_hash, content_ref, tenant'
+    
+    items = []
+    while True:
+        with metrics.phase('DynamoDB'):
+            response = read_page(**params)
+        items.extend(response.get('Items', []))
+        if len(items) > limit:
+            return items[:limit], True
+        if 'LastEvaluatedKey' not in response:
+            return items, False
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def delete_chunk(items):
+    """
+    Delete up to S3_DELETE_BATCH_SIZE files: objects with one DeleteObjects
+    call, then metadata with BatchWriteItem for the objects that are gone
+    Deduplicated files drop their metadata first; their shared object goes
+    with the last reference
+    Returns (deleted_file_ids, {file_id: error})
+    """
+    failed = {}
+    shared = [item for item in items if item.get('content_ref')]
+    by_key = {item['object_key']: item['file_id'] for item in items if not item.get('content_ref')}
+    
+    if by_key:
+        try:
+            response = get_s3_client().delete_objects(
+                Bucket=BUCKET_NAME,
+                Delete={'Objects': [{'Key': key} for key in by_key], 'Quiet': True}
+            )
+            for error in response.get('Errors', []):
+                failed[by_key[error['Key']]] = error.get('Message') or error.get('Code', 'S3 delete failed')
+        except Exception as e:
+            print(f"S3 bulk delete error: {str(e)}")
+            failed.update((file_id, str(e)) for file_id in by_key.values())
+    
+    # Keep metadata for objects that could not be removed so they can be retried
+    removable = [item['file_id'] for item in items if item['file_id'] not in failed]
+    write_requests = [{'DeleteRequest': {'Key': {'file_id': file_id}}} for file_id in removable]
+    for request, error in batch_write(write_requests):
+        failed[request['DeleteRequest']['Key']['file_id']] = error
+    invalidate_file_metadata(removable)
+    
+    orphaned = []
+    for item in shared:
+        if item['file_id'] in failed:
+            continue
+        try:
+            if release_content_ref(item):
+                orphaned.append(item['object_key'])
+        except Exception as e:
+            # The metadata is gone; the object is kept (a reference too many)
+            print(f"Content reference release error for {item['file_id']}: {str(e)}")
+    if orphaned:
+        try:
+            get_s3_client().delete_objects(
+                Bucket=BUCKET_NAME,
+                Delete={'Objects': [{'Key': key} for key in orphaned], 'Quiet': True}
+            )
+        except Exception as e:
+            print(f"S3 bulk delete error for shared objects: {str(e)}")
+    
+    return [file_id for file_id in removable if file_id not in failed], failed
+
+
+@metrics.route('delete_batch')
+def handle_delete_batch(event, body_data):
+    """
+    Delete many files in one request, by ID list or by filter
+    Keys are resolved in batches, then chunks of up to 1000 files are deleted
+    concurrently (S3 DeleteObjects + DynamoDB BatchWriteItem per chunk)
+    """
+    try:
+        file_ids = body_data.get('fileIds')
+        filter_data = body_data.get('filter')
+        
+        if file_ids is not None and filter_data is not None:
+            return create_response(400, {'success': False, 'error': 'Pass either fileIds or filter, not both'})
+        
+        not_found = []
+        failed = {}
+        truncated = False
+        
+        if file_ids is not None:
+            if not isinstance(file_ids, list) or not file_ids:
+                return create_response(400, {'success': False, 'error': 'fileIds must be a non-empty list'})
+            if len(file_ids) > MAX_DELETE_BATCH_SIZE:
+                return create_response(400, {
+                    'success': False,
+                    'error': f'At most {MAX_DELETE_BATCH_SIZE} file IDs per request'
+                })
+            
+            unique_ids = list(dict.fromkeys(str(file_id) for file_id in file_ids if file_id))
+            with metrics.phase('DynamoDB'):
+                found, unresolved = batch_get(unique_ids)
+            items = [found[file_id] for file_id in unique_ids if file_id in found]
+            failed.update(unresolved)
+            not_found = [file_id for file_id in unique_ids if file_id not in found and file_id not in unresolved]
+        
+        elif isinstance(filter_data, dict):
+            if not any(filter_data.get(name) for name in ('status', 'from', 'to')):
+                return create_response(400, {
+                    'success': False,
+                    'error': 'filter needs at least one of status, from, to'
+                })
+            items, truncated = find_files_to_delete(filter_data, MAX_DELETE_BATCH_SIZE)
+        
+        else:
+            return create_response(400, {'success': False, 'error': 'fileIds or filter is required'})
+        
+        chunks = [items[start:start + S3_DELETE_BATCH_SIZE] for start in range(0, len(items), S3_DELETE_BATCH_SIZE)]
+        deleted = []
+        
+        with metrics.phase('Delete'):
+            if len(chunks) <= 1:
+                results = [delete_chunk(chunk) for chunk in chunks]
+            else:
+                with ThreadPoolExecutor(max_workers=min(DELETE_WORKERS, len(chunks))) as executor:
+                    results = list(executor.map(delete_chunk, chunks))
+        
+        for chunk_deleted, chunk_failed in results:
+            deleted.extend(chunk_deleted)
+            failed.update(chunk_failed)
+        
+        metrics.set_property('BatchSize', len(items))
+        
+        return create_response(200, {
+            'success': not failed,
+            'deleted': len(deleted),
+            'notFound': not_found,
+            'failed': [{'fileId': file_id, 'error': error} for file_id, error in failed.items()],
+            # More files match the filter; repeat the request to continue
+            'truncated': truncated
+        })
+    
+    except Exception as e:
+        print(f"Error in handle_delete_batch: {str(e)}")
+        return create_response(500, {'success': False, 'error': str(e)})
+
+
+@metrics.route('config')
 def handle_config(event):
     """
     Return configuration information
@@ -306,64 +2085,425 @@ def handle_config(event):
             'cloudfront_domain': CLOUDFRONT_DOMAIN,
             'upload_expiration': UPLOAD_EXPIRATION,
             'download_expiration': DOWNLOAD_EXPIRATION,
+            'signed_url_cache': get_signed_url_cache_stats(),
+            'key_cache': get_key_cache_stats(),
+            'metadata_cache': get_metadata_cache_stats(),
+            'profiling': profiling.summary(),
+            'aws_clients': aws_clients.stats(),
+            'key_layout': KEY_LAYOUT,
             'bucket': BUCKET_NAME
         }
     }
     return create_response(200, config)
 
 
+def parse_s3_records(event):
+    """
+    ObjectCreated records from a direct S3 notification, or from SQS/SNS
+    messages wrapping S3 notifications
+    """
+    records = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:s3':
+            records.append(record)
+        elif record.get('eventSource') == 'aws:sqs' or 'Sns' in record:
+            message = record['body'] if 'body' in record else record['Sns']['Message']
+            records.extend(parse_s3_records(json.loads(message)))
+    return [record for record in records if record.get('eventName', '').startswith('ObjectCreated:')]
+
+
+def record_upload(file_id, object_key, record):
+    """
+    Mark one file uploaded; returns 'updated', 'unknown' or an error string
+    The update is conditional on the item still existing with this object
+    key, so a file deleted (or re-pointed) since the object was written is
+    never brought back, and only the completion attributes are written, so
+    concurrent changes to other attributes survive.
+    """
+    from boto3.dynamodb.conditions import Attr
+    
+    table = get_dynamodb().Table(TABLE_NAME)
+    current = Attr('file_id').exists() & Attr('object_key').eq(object_key)
+    try:
+        with metrics.phase('DynamoDB'):
+            item = table.update_item(
+                Key={'file_id': file_id},
+                # Multipart bookkeeping is finished once the object exists, and
+                # uploaded files no longer expire with their upload URL
+                UpdateExpression='SET #status = :uploaded, #size = :size, etag = :etag, uploaded_at = :at '
+                                 'REMOVE upload_id, parts, #ttl',
+                ConditionExpression=current,
+                ExpressionAttributeNames={'#status': 'status', '#size': 'size', '#ttl': 'ttl'},
+                ExpressionAttributeValues={
+                    ':uploaded': 'uploaded',
+                    ':size': int(record['s3']['object'].get('size', 0)),
+                    ':etag': record['s3']['object'].get('eTag', ''),
+                    ':at': record.get('eventTime') or datetime.utcnow().isoformat()
+                },
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+    except Exception as e:
+        if error_code(e) == 'ConditionalCheckFailedException':
+            return 'unknown'
+        print(f"Upload event update failed for {file_id}: {str(e)}")
+        return str(e)
+    
+    if CONTENT_INDEX_TABLE_NAME and item.get('content_hash'):
+        try:
+            if register_content(item) and not item.get('content_ref'):
+                try:
+                    with metrics.phase('DynamoDB'):
+                        table.update_item(
+                            Key={'file_id': file_id},
+                            UpdateExpression='SET content_ref = :true',
+                            ConditionExpression=current,
+                            ExpressionAttributeValues={':true': True}
+                        )
+                except Exception as e:
+                    if error_code(e) != 'ConditionalCheckFailedException':
+                        raise
+                    # Deleted meanwhile: its delete did not see the reference
+                    release_shared_object(item)
+        except Exception as e:
+            # Still record the upload; the content just isn't deduplicated
+            print(f"Content index registration failed for {file_id}: {str(e)}")
+    return 'updated'
+
+
+@metrics.route('upload_events')
+def process_upload_events(records):
+    """
+    Mark the metadata items of newly created objects as uploaded
+    One conditional UpdateItem per object, run concurrently; objects
+    without a matching metadata item are ignored. Returns counters.
+    """
+    uploads = {}
+    for record in records:
+        s3_info = record['s3']
+        if s3_info['bucket']['name'] != BUCKET_NAME:
+            continue
+        # Keys in notifications are URL encoded (spaces as '+')
+        object_key = unquote_plus(s3_info['object']['key'])
+        file_id = file_id_for_key(object_key)
+        if file_id is None:
+            continue
+        # Later records for the same object win
+        uploads[file_id] = (object_key, record)
+    
+    def record_one(entry):
+        file_id, (object_key, record) = entry
+        return record_upload(file_id, object_key, record)
+    
+    if len(uploads) <= 1:
+        results = [record_one(entry) for entry in uploads.items()]
+    else:
+        with ThreadPoolExecutor(max_workers=min(UPLOAD_EVENT_WORKERS, len(uploads))) as executor:
+            results = list(executor.map(record_one, uploads.items()))
+    
+    updated = results.count('updated')
+    unknown = results.count('unknown')
+    return {
+        'records': len(records),
+        'updated': updated,
+        'unknown': unknown,
+        'failed': len(results) - updated - unknown
+    }
+
+
+def s3_event_handler(event, context):
+    """
+    Lambda handler for S3 ObjectCreated notifications on the uploads/ prefix
+    Moves items from pending to uploaded with size, ETag and completion time
+    Raises when writes fail so the batch is retried (updates are idempotent)
+    """
+    token = metrics.start_invocation()
+    aws_calls = aws_clients.totals()
+    result = process_upload_events(parse_s3_records(event))
+    metrics.set_property('BatchSize', result['records'])
+    for name, value in aws_clients.invocation_properties(aws_calls).items():
+        metrics.set_property(name, value)
+    print(json.dumps({'upload_events': result}))
+    metrics.finish_invocation(token, 500 if result['failed'] else 200)
+    
+    if result['failed']:
+        raise RuntimeError(f"{result['failed']} upload event(s) could not be recorded")
+    return result
+
+
+
+@metrics.route('metadata_expiry')
+def process_expired_items(records):
+    """
+    Release the content references of metadata items deleted by TTL
+    API deletes release their own reference; an item that expired still
+    held one, which would otherwise keep the shared object forever. Records
+    are handled in stream order and processing stops at the first failure,
+    so a retried batch never releases a reference twice. Returns counters
+    and the sequence number of the failed record (None when all succeeded).
+    """
+    from boto3.dynamodb.types import TypeDeserializer
+    
+    deserializer = TypeDeserializer()
+    released = 0
+    for record in records:
+        # TTL deletes are REMOVE records made by the DynamoDB service itself
+        if record.get('eventName') != 'REMOVE' or \
+                (record.get('userIdentity') or {}).get('principalId') != 'dynamodb.amazonaws.com':
+            continue
+        image = record['dynamodb'].get('OldImage') or {}
+        item = {name: deserializer.deserialize(value) for name, value in image.items()}
+        if not item.get('content_ref') or 'content_hash' not in item:
+            continue
+        try:
+            release_shared_object(item)
+        except Exception as e:
+            print(f"Releasing the content reference of expired {item.get('file_id')} failed: {str(e)}")
+            return {'records': len(records), 'released': released, 'failedAt': record['dynamodb']['SequenceNumber']}
+        released += 1
+    return {'records': len(records), 'released': released, 'failedAt': None}
+
+
+def expiry_event_handler(event, context):
+    """
+    Lambda handler for the metadata table's stream (TTL deletes)
+    Reports the first failed record, so the stream retries from there
+    """
+    token = metrics.start_invocation()
+    result = process_expired_items(event.get('Records', []))
+    metrics.set_property('BatchSize', result['records'])
+    print(json.dumps({'metadata_expiry': result}))
+    metrics.finish_invocation(token, 500 if result['failedAt'] else 200)
+    
+    failures = [{'itemIdentifier': result['failedAt']}] if result['failedAt'] else []
+    return {'batchItemFailures': failures}
+
+
+def warm_up():
+    """
+    Load the signing key and build the signer ahead of the first request
+    Called at import time when PRELOAD_SIGNING_KEY is enabled so the work
+    lands in the Lambda init phase
+    """
+    try:
+        get_private_key()
+        if SIGNER_IMPLEMENTATION == 'botocore':
+            get_cloudfront_signer()
+        else:
+            get_fast_signer()
+        get_dynamodb()
+    except Exception as e:
+        # Fall back to loading on the first signing request
+        print(f"Init-phase warm-up failed (non-fatal): {str(e)}")
+
+
 def lambda_handler(event, context):
     """
-    Main Lambda handler for API Gateway
+    Main Lambda handler for API Gateway (REST or HTTP API) and function URLs
+    Emits one EMF metrics line per invocation
+    """
+    token = metrics.start_invocation()
+    aws_calls = aws_clients.totals()
+    response = dispatch(event)
+    for name, value in aws_clients.invocation_properties(aws_calls).items():
+        metrics.set_property(name, value)
+    metrics.finish_invocation(token, response.get('statusCode'))
+    return response
+
+
+def dispatch(event):
+    """
+    Route the event and encode the response
+    Replaced by a sampled, profiled version when PROFILE_SAMPLE_RATE > 0
+    """
+    return encode_response(event, route_request(event))
+
+
+dispatch = profiling.wrap(dispatch)
+
+
+def request_line(event):
+    """
+    (method, path, payload_v2) of a REST API (payload 1.0) or HTTP API /
+    function URL (payload 2.0) event; the path is percent-decoded
+    """
+    method = event.get('httpMethod')
+    if method is not None:
+        # API Gateway decodes the v1 path itself
+        return method, event.get('path', ''), False
+    context = event.get('requestContext')
+    http = context.get('http') if context else None
+    if http is None:
+        return 'GET', event.get('path', ''), False
+    
+    # rawPath is sent as the client encoded it; file IDs hold filenames
+    path = unquote(event.get('rawPath') or http.get('path', ''))
+    # HTTP API stages other than $default appear in rawPath
+    stage = context.get('stage')
+    if stage and stage != '$default' and path.startswith(f"/{stage}/"):
+        path = path[len(stage) + 1:]
+    return http.get('method', 'GET'), path, True
+
+
+def parse_body(event):
+    """
+    JSON request body, {} when absent or not valid JSON
+    Only called for routes that take a body
+    """
+    body = event.get('body', '{}')
+    if body and event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    if not body:
+        return {}
+    try:
+        return json.loads(body) if isinstance(body, str) else body
+    except ValueError:
+        return {}
+
+
+def payload_v2_response(response):
+    """
+    Adapt a response for payload format 2.0, which has no multiValueHeaders:
+    Set-Cookie values move to 'cookies', other headers are comma-joined
+    """
+    multi_value_headers = response.pop('multiValueHeaders', None)
+    if multi_value_headers:
+        headers = response.setdefault('headers', {})
+        for name, values in multi_value_headers.items():
+            if name.lower() == 'set-cookie':
+                response['cookies'] = list(values)
+            else:
+                headers[name] = ','.join(values)
+    return response
+
+
+# Route table: (methods, path, target, takes_body)
+# methods None matches any method. A path ending in '/' is a prefix whose
+# last path segment is passed to the handler as the file ID; its target may
+# instead be a {(method, action): (handler, takes_body)} table for paths of
+# the form <prefix><file_id>/<action>. Earlier entries win, so e.g.
+# POST /api/files/download/batch never reaches the download prefix.
+ROUTES = [
+    (('POST',), '/api/files/upload', handle_upload, True),
+    (('POST',), '/api/files/upload/batch', handle_upload_batch, True),
+    (('POST',), '/api/files/download/batch', handle_download_batch, True),
+    (None, '/api/files/download/', handle_download, False),
+    (('POST',), '/api/files/multipart', handle_multipart_initiate, True),
+    (None, '/api/files/multipart/', {
+        ('GET', ''): (handle_multipart_status, False),
+        ('POST', 'parts'): (handle_multipart_parts, True),
+        ('POST', 'complete'): (handle_multipart_complete, True),
+        ('POST', 'abort'): (handle_multipart_abort, False),
+        ('DELETE', ''): (handle_multipart_abort, False),
+    }, False),
+    (('POST',), '/api/files/delete/batch', handle_delete_batch, True),
+    (('GET',), '/api/files', handle_list_files, False),
+    (('DELETE',), '/api/files/', handle_delete_file, False),
+    (('GET', 'POST'), '/api/files/cookies', handle_signed_cookies, True),
+    (None, '/api/files/config', handle_config, False),
+    # Old routes (backward compatibility)
+    (None, '/api/files/generate-upload-url', handle_upload, True),
+    (None, '/api/files/generate-download-url/', handle_download, False),
+    (None, '/api/files/list', handle_list_files, False),
+    (None, '/api/files/delete/', handle_delete_file, False),
+]
+
+
+# Methods API Gateway and function URLs deliver
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+
+def scan_routes(routes, method, path):
+    """
+    (target, remainder, takes_body) of the first entry of routes matching
+    the request, or None; remainder is the path after a matched prefix
+    """
+    for methods, route_path, target, takes_body in routes:
+        if methods is not None and method not in methods:
+            continue
+        if route_path.endswith('/'):
+            if path.startswith(route_path):
+                return target, path[len(route_path):], takes_body
+        elif path == route_path:
+            return target, None, takes_body
+    return None
+
+
+def compile_routes(routes):
+    """
+    Lookup tables giving the same results as scan_routes(routes, ...)
+    Returns (exact, prefixes, methods). exact maps (method, path) to
+    (target, takes_body) wherever the scan stops at an exact-path entry, for
+    every method the table names (plus HTTP_METHODS). A miss with one of
+    those methods can only match a prefix entry, so prefixes holds just
+    those, in table order, as (prefix, methods, target, takes_body).
+    """
+    methods = frozenset(HTTP_METHODS).union(*(route[0] for route in routes if route[0]))
+    exact = {}
+    for _, path, _, _ in routes:
+        if not path.endswith('/'):
+            for method in methods:
+                route = scan_routes(routes, method, path)
+                if route and route[1] is None:
+                    exact[(method, path)] = route[0], route[2]
+    prefixes = [(path, route_methods, target, takes_body)
+                for route_methods, path, target, takes_body in routes if path.endswith('/')]
+    return exact, prefixes, methods
+
+
+ROUTE_TABLE, ROUTE_PREFIXES, ROUTE_METHODS = compile_routes(ROUTES)
+
+
+def route_request(event):
+    """
+    Dispatch an API Gateway or function URL event to the matching handler
+    Bodies are only decoded for routes that read them
     """
     try:
-        # Parse request
-        http_method = event.get('httpMethod', 'GET')
-        path = event.get('path', '')
-        body = event.get('body', '{}')
+        http_method, path, payload_v2 = request_line(event)
         
         print(f"Request: {http_method} {path}")
         
-        # Parse body if present
-        if body:
-            try:
-                body_data = json.loads(body) if isinstance(body, str) else body
-            except:
-                body_data = {}
-        else:
-            body_data = {}
-        
-        # Route to appropriate handler
-        # New clean routes
-        if path == '/api/files/upload' and http_method == 'POST':
-            return handle_upload(event, body_data)
-        elif path.startswith('/api/files/download/'):
-            file_id = path.split('/')[-1]
-            return handle_download(event, file_id)
-        elif path == '/api/files' and http_method == 'GET':
-            return handle_list_files(event)
-        elif path.startswith('/api/files/') and http_method == 'DELETE':
-            file_id = path.split('/')[-1]
-            return handle_delete_file(event, file_id)
-        elif path == '/api/files/config':
-            return handle_config(event)
-        # Old routes (backward compatibility)
-        elif path == '/api/files/generate-upload-url':
-            return handle_upload(event, body_data)
-        elif path.startswith('/api/files/generate-download-url/'):
-            file_id = path.split('/')[-1]
-            return handle_download(event, file_id)
-        elif path == '/api/files/list':
-            return handle_list_files(event)
-        elif path.startswith('/api/files/delete/'):
-            file_id = path.split('/')[-1]
-            return handle_delete_file(event, file_id)
+        route = ROUTE_TABLE.get((http_method, path))
+        if route is not None:
+            target, takes_body = route
+            response = target(event, parse_body(event)) if takes_body else target(event)
         else:
-            return create_response(404, {'error': 'Not found', 'path': path})
+            if http_method in ROUTE_METHODS:
+                # Not an exact path: the first matching prefix entry wins
+                for prefix, methods, target, takes_body in ROUTE_PREFIXES:
+                    if path.startswith(prefix) and (methods is None or http_method in methods):
+                        route = target, path[len(prefix):], takes_body
+                        break
+            else:
+                route = scan_routes(ROUTES, http_method, path)
+            if route is None:
+                return create_response(404, {'error': 'Not found', 'path': path})
+            target, remainder, takes_body = route
+            if remainder is None:
+                response = target(event, parse_body(event)) if takes_body else target(event)
+            else:
+                if isinstance(target, dict):
+                    # <prefix><file_id>[/<action>]
+                    file_id, _, action = remainder.partition('/')
+                    route = target.get((http_method, action.partition('/')[0]))
+                    if route is None:
+                        return create_response(404, {'error': 'Not found', 'path': path})
+                    target, takes_body = route
+                else:
+                    # Last path segment
+                    file_id = remainder.rpartition('/')[2]
+                response = target(event, file_id, parse_body(event)) if takes_body else target(event, file_id)
+        
+        if payload_v2:
+            response = payload_v2_response(response)
+        return response
     
     except Exception as e:
-        print(f"Error in lambda_handler: {str(e)}")
+        print(f"Error in route_request: {str(e)}")
         import traceback
         traceback.print_exc()
         return create_response(500, {'error': 'Internal server error', 'message': str(e)})
 
+
+if PRELOAD_SIGNING_KEY:
+    warm_up()
@@ -0,0 +1,166 @@
+"""
+Rotation-aware cache of CloudFront signing keys
+
+Keys are cached by key-pair ID. Which key is active (and which is staged as
+inactive) comes from a metadata source - SSM parameters maintained by
+scripts/rotate-keys.py, or fixed environment values - re-read every TTL.
+Refreshes are stale-while-revalidate: once a key is loaded, requests keep
+signing with it while a background thread re-reads the metadata and loads any
+new key, then the active key is switched atomically. Active and inactive keys
+(and the previously active key, for one more TTL) stay loaded so a rotation
+never blocks a request on Secrets Manager.
+"""
+
+import threading
+import time
+
+from fast_signer import FastCloudFrontSigner
+
+# After a failed refresh, retry sooner than a full TTL
+REFRESH_RETRY_SECONDS = 30
+
+
+class KeyEntry:
+    """A loaded signing key"""
+
+    __slots__ = ('key_id', 'secret_arn', 'private_key', 'signer', 'loaded_at')
+
+    def __init__(self, key_id, secret_arn, private_key):
+        self.key_id = key_id
+        self.secret_arn = secret_arn
+        self.private_key = private_key
+        self.signer = FastCloudFrontSigner(key_id, private_key)
+        self.loaded_at = time.time()
+
+
+class KeyRing:
+    """
+    Multi-key cache with TTL refresh of the active/inactive key metadata
+
+    load_metadata() returns {'active': (key_id, secret_arn), 'inactive': (key_id, secret_arn) or None}
+    load_private_key(secret_arn) returns a private key object
+    ttl_seconds of 0/None disables refreshing (static configuration)
+    """
+
+    def __init__(self, load_metadata, load_private_key, ttl_seconds=300, clock=time.monotonic):
+        self._load_metadata = load_metadata
+        self._load_private_key = load_private_key
+        self.ttl = ttl_seconds
+        self._clock = clock
+
+        self._keys = {}
+        self._active_id = None
+        self._inactive_id = None
+        self._next_refresh = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+        self.stats = {
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'background_refreshes': 0,
+            'key_switches': 0,
+            'keys_loaded': 0,
+        }
+
+    def active(self):
+        """
+        Entry for the active key; only blocks when no key is loaded yet
+        """
+        entry = self._keys.get(self._active_id)
+        if entry is None:
+            with self._refresh_lock:
+                entry = self._keys.get(self._active_id)
+                if entry is None:
+                    self._refresh()
+                    entry = self._keys[self._active_id]
+        elif self._next_refresh is not None and self._clock() >= self._next_refresh:
+            self._start_background_refresh()
+        return entry
+
+    def get(self, key_id):
+        """
+        Entry for any loaded key (active, inactive or previously active)
+        """
+        return self._keys.get(key_id)
+
+    def key_ids(self):
+        return list(self._keys)
+
+    def refresh(self):
+        """
+        Re-read metadata and load new keys now (blocking)
+        """
+        with self._refresh_lock:
+            self._refresh()
+
+    def describe(self):
+        """
+        Counters plus the currently loaded key IDs
+        """
+        return dict(self.stats, active_key_id=self._active_id, inactive_key_id=self._inactive_id,
+                    loaded_key_ids=sorted(self._keys), ttl=self.ttl or 0)
+
+    def _refresh(self):
+        try:
+            metadata = self._load_metadata()
+            active_id, active_secret = metadata['active']
+            inactive = metadata.get('inactive')
+
+            keys = {}
+            keys[active_id] = self._entry_for(active_id, active_secret)
+
+            if inactive and inactive[0] and inactive[0] != active_id:
+                try:
+                    keys[inactive[0]] = self._entry_for(*inactive)
+                except Exception as e:
+                    # The staged key is optional; keep signing with the active one
+                    print(f"Inactive key {inactive[0]} not loaded: {str(e)}")
+
+            with self._lock:
+                previous_id = self._active_id
+                if previous_id is not None and previous_id != active_id:
+                    self.stats['key_switches'] += 1
+                    print(f"Signing key switched: {previous_id} -> {active_id}")
+                    # Keep the old active key loaded through the rotation window
+                    if previous_id in self._keys and previous_id not in keys:
+                        keys[previous_id] = self._keys[previous_id]
+
+                self._keys = keys
+                self._active_id = active_id
+                self._inactive_id = inactive[0] if inactive else None
+                self.stats['refreshes'] += 1
+                self._next_refresh = self._clock() + self.ttl if self.ttl else None
+
+        except Exception:
+            self.stats['refresh_failures'] += 1
+            if self._next_refresh is not None:
+                self._next_refresh = self._clock() + min(self.ttl, REFRESH_RETRY_SECONDS)
+            raise
+
+    def _entry_for(self, key_id, secret_arn):
+        existing = self._keys.get(key_id)
+        if existing is not None and existing.secret_arn == secret_arn:
+            return existing
+        entry = KeyEntry(key_id, secret_arn, self._load_private_key(secret_arn))
+        self.stats['keys_loaded'] += 1
+        return entry
+
+    def _start_background_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        thread = threading.Thread(target=self._background_refresh, name='key-ring-refresh', daemon=True)
+        thread.start()
+
+    def _background_refresh(self):
+        try:
+            self.stats['background_refreshes'] += 1
+            self.refresh()
+        except Exception as e:
+            print(f"Key metadata refresh failed, still signing with {self._active_id}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
@@ -0,0 +1,176 @@
+"""
+Per-phase latency metrics emitted as CloudWatch Embedded Metric Format
+
+Handlers mark phases (key load, DynamoDB, signing, S3, serialization) with
+`with metrics.phase('DynamoDB'):` and lambda_handler emits one EMF JSON line
+per invocation with Route and ColdStart dimensions. Phase times are
+exclusive: time spent in a nested phase (e.g. the first key load inside
+signing) is only counted once. Outside an invocation, and in worker threads,
+phase() is a shared no-op object, so the overhead is a ContextVar lookup and
+two perf_counter() calls per phase.
+"""
+
+import contextvars
+import json
+import os
+import time
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CloudFrontSignedUrls')
+
+_current = contextvars.ContextVar('invocation_metrics', default=None)
+_cold_start = True
+
+
+class InvocationMetrics:
+    """Timings collected during one invocation"""
+
+    __slots__ = ('route', 'started', 'timings', 'stack', 'properties')
+
+    def __init__(self):
+        self.route = 'unknown'
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.stack = []
+        self.properties = {}
+
+
+class _Phase:
+    __slots__ = ('invocation', 'name')
+
+    def __init__(self, invocation, name):
+        self.invocation = invocation
+        self.name = name
+
+    def __enter__(self):
+        now = time.perf_counter()
+        stack = self.invocation.stack
+        if stack:
+            # Pause the enclosing phase
+            parent = stack[-1]
+            timings = self.invocation.timings
+            timings[parent[0]] = timings.get(parent[0], 0.0) + (now - parent[1])
+        stack.append([self.name, now])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        now = time.perf_counter()
+        stack = self.invocation.stack
+        name, resumed = stack.pop()
+        timings = self.invocation.timings
+        timings[name] = timings.get(name, 0.0) + (now - resumed)
+        if stack:
+            stack[-1][1] = now
+        return False
+
+
+class _NoopPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_PHASE = _NoopPhase()
+
+
+def phase(name):
+    """
+    Context manager timing a phase of the current invocation
+    """
+    invocation = _current.get()
+    if invocation is None:
+        return _NOOP_PHASE
+    return _Phase(invocation, name)
+
+
+def route(name):
+    """
+    Decorator naming the route a handler serves (the Route dimension)
+    """
+    def decorator(handler):
+        def wrapper(*args, **kwargs):
+            invocation = _current.get()
+            if invocation is not None:
+                invocation.route = name
+            return handler(*args, **kwargs)
+        wrapper.__name__ = handler.__name__
+        wrapper.__doc__ = handler.__doc__
+        wrapper.__wrapped__ = handler
+        return wrapper
+    return decorator
+
+
+def current_route():
+    """
+    Route name of the current invocation ('unknown' outside one)
+    """
+    invocation = _current.get()
+    return invocation.route if invocation is not None else 'unknown'
+
+
+def set_property(name, value):
+    """
+    Attach a non-metric property (e.g. batch size) to the EMF line
+    """
+    invocation = _current.get()
+    if invocation is not None:
+        invocation.properties[name] = value
+
+
+def start_invocation():
+    """
+    Begin collecting metrics; returns a token for finish_invocation
+    """
+    if not METRICS_ENABLED:
+        return None
+    return _current.set(InvocationMetrics())
+
+
+def finish_invocation(token, status_code):
+    """
+    Stop collecting and print the EMF line for this invocation
+    """
+    global _cold_start
+
+    if token is None:
+        return None
+
+    invocation = _current.get()
+    _current.reset(token)
+    duration = time.perf_counter() - invocation.started
+
+    cold_start = _cold_start
+    _cold_start = False
+
+    record = build_emf_record(invocation, duration, status_code, cold_start)
+    print(json.dumps(record, separators=(',', ':')))
+    return record
+
+
+def build_emf_record(invocation, duration, status_code, cold_start):
+    """
+    EMF document: one metric per phase plus total duration
+    """
+    values = {f"{name}Time": round(seconds * 1000, 3) for name, seconds in invocation.timings.items()}
+    values['Duration'] = round(duration * 1000, 3)
+
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Route', 'ColdStart']],
+                'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in values]
+            }]
+        },
+        'Route': invocation.route,
+        'ColdStart': 'true' if cold_start else 'false',
+        'StatusCode': status_code
+    }
+    record.update(invocation.properties)
+    record.update(values)
+    return record
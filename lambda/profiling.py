@@ -0,0 +1,292 @@
+"""
+Sampled profiling of live invocations
+
+Off unless PROFILE_SAMPLE_RATE is above 0. Each invocation is then profiled
+with that probability (1 = every invocation), and results are aggregated
+per route for the life of the warm container:
+
+  PROFILE_MODE=cprofile  deterministic cProfile; dumped as pstats
+  PROFILE_MODE=stack     a sampler thread records the handler thread's
+                         stack every PROFILE_STACK_INTERVAL_MS; dumped as
+                         collapsed stacks (flamegraph.pl / speedscope input)
+
+At most every PROFILE_DUMP_SECONDS, at the end of a sampled invocation,
+the aggregates are written to the function log (PROFILE_OUTPUT=log, the
+top PROFILE_TOP entries) or as complete files to a directory
+(PROFILE_OUTPUT=/tmp/profiles: <route>.pstats / <route>.collapsed,
+rewritten on every dump). Sampled invocations carry Profiled=true on their
+EMF line, since profiling makes them slower.
+
+When disabled, wrap() returns the function unchanged and nothing here runs.
+"""
+
+import atexit
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'cprofile').lower()
+PROFILE_OUTPUT = os.environ.get('PROFILE_OUTPUT', 'log')
+PROFILE_DUMP_SECONDS = float(os.environ.get('PROFILE_DUMP_SECONDS', '60'))
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', '30'))
+PROFILE_STACK_INTERVAL_MS = float(os.environ.get('PROFILE_STACK_INTERVAL_MS', '2'))
+
+ENABLED = PROFILE_SAMPLE_RATE > 0
+
+# Frames of this module and the dispatch wrapper are left out of stacks
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class CProfileCollector:
+    """
+    Per-route pstats aggregated from cProfile runs
+
+    cProfile can only run one profile at a time, so an invocation that
+    starts while another is being profiled (server.py threads) is skipped.
+    """
+
+    def __init__(self):
+        import cProfile
+        self._profile_class = cProfile.Profile
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def start(self):
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = self._profile_class()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, route):
+        import pstats
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            if route in self.stats:
+                self.stats[route].add(profile)
+            else:
+                self.stats[route] = pstats.Stats(profile)
+
+    def report(self, route, top):
+        import io
+        buffer = io.StringIO()
+        with self._lock:
+            stats = self.stats[route]
+            stats.stream = buffer
+            stats.sort_stats('cumulative').print_stats(top)
+        return buffer.getvalue()
+
+    def write(self, route, path):
+        with self._lock:
+            self.stats[route].dump_stats(path + '.pstats')
+
+    def routes(self):
+        with self._lock:
+            return list(self.stats)
+
+
+class StackCollector:
+    """
+    Per-route collapsed-stack counts from a background sampler thread
+
+    Works for concurrent invocations: every sampled handler thread is
+    registered and sampled until its invocation ends.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self.stacks = {}
+
+    def start(self):
+        ident = threading.get_ident()
+        samples = Counter()
+        with self._lock:
+            self._active[ident] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return ident
+
+    def stop(self, ident, route):
+        with self._lock:
+            samples = self._active.pop(ident)
+            if not self._active:
+                self._wake.clear()
+            aggregate = self.stacks.setdefault(route, Counter())
+            for stack, count in samples.items():
+                aggregate[f"{route};{stack}" if stack else route] += count
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[collapse(frame)] += 1
+
+    def report(self, route, top):
+        with self._lock:
+            stacks = self.stacks[route].most_common(top)
+        return '\n'.join(f"{stack} {count}" for stack, count in stacks)
+
+    def write(self, route, path):
+        with self._lock:
+            stacks = sorted(self.stacks[route].items())
+        with open(path + '.collapsed', 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in stacks)
+
+    def routes(self):
+        with self._lock:
+            return list(self.stacks)
+
+
+def collapse(frame):
+    """
+    'module:function;...' from the outermost frame down to frame
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename != _THIS_FILE:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SampledProfiler:
+    """Sampling decision, collection and periodic dumps"""
+
+    def __init__(self, sample_rate, mode='cprofile', output='log', dump_seconds=60.0, top=30,
+                 stack_interval_ms=2.0, clock=time.monotonic):
+        if mode == 'stack':
+            self.collector = StackCollector(stack_interval_ms / 1000.0)
+        elif mode == 'cprofile':
+            self.collector = CProfileCollector()
+        else:
+            raise ValueError(f"PROFILE_MODE must be cprofile or stack, not {mode!r}")
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.output = output
+        self.dump_seconds = dump_seconds
+        self.top = top
+        self.clock = clock
+        self.sampled = 0
+        self.skipped = 0
+        self.invocations = Counter()
+        self._dump_lock = threading.Lock()
+        self._last_dump = clock()
+
+    def wrap(self, func):
+        """
+        func(event) profiled with probability sample_rate; the route name
+        is read from the current metrics invocation after func returns
+        """
+        def wrapper(event):
+            if random.random() >= self.sample_rate:
+                return func(event)
+            token = self.collector.start()
+            if token is None:
+                self.skipped += 1
+                return func(event)
+            try:
+                return func(event)
+            finally:
+                route = metrics.current_route()
+                self.collector.stop(token, route)
+                self.sampled += 1
+                self.invocations[route] += 1
+                metrics.set_property('Profiled', True)
+                self.maybe_dump()
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def maybe_dump(self):
+        if self.clock() - self._last_dump >= self.dump_seconds:
+            self.dump()
+
+    def dump(self):
+        """
+        Write every route's aggregate to the log or the output directory
+        """
+        if not self._dump_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_dump = self.clock()
+            routes = self.collector.routes()
+            to_log = self.output == 'log'
+            if not to_log:
+                os.makedirs(self.output, exist_ok=True)
+            for route in routes:
+                if to_log:
+                    print(f"PROFILE route={route} mode={self.mode} invocations={self.invocations[route]}\n"
+                          f"{self.collector.report(route, self.top)}")
+                else:
+                    self.collector.write(route, os.path.join(self.output, re.sub(r'[^\w.-]', '_', route)))
+        except Exception as e:
+            print(f"Profile dump failed (non-fatal): {str(e)}")
+        finally:
+            self._dump_lock.release()
+
+    def summary(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'mode': self.mode,
+            'sampled': self.sampled,
+            'skipped': self.skipped,
+            'routes': dict(self.invocations),
+        }
+
+
+_profiler = None
+
+
+def wrap(func):
+    """
+    Profiled version of func when PROFILE_SAMPLE_RATE > 0, else func itself
+    """
+    global _profiler
+    if not ENABLED:
+        return func
+    if _profiler is None:
+        try:
+            _profiler = SampledProfiler(PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_OUTPUT, PROFILE_DUMP_SECONDS,
+                                        PROFILE_TOP, PROFILE_STACK_INTERVAL_MS)
+        except ValueError as e:
+            # A bad setting must not take the function down
+            print(f"Profiling disabled: {str(e)}")
+            return func
+        # Flush what was collected since the last dump (server.py, tests)
+        atexit.register(_profiler.dump)
+    return _profiler.wrap(func)
+
+
+def summary():
+    """
+    Sampling counters, or None when profiling is disabled
+    """
+    return _profiler.summary() if _profiler is not None else None
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Standalone asyncio HTTP server for the signing service
+
+Serves the same routes and JSON responses as lambda_handler without API
+Gateway or cold starts. Each HTTP request is turned into an API Gateway
+(REST, v1) proxy event and handed to index.lambda_handler unchanged, so
+there is one implementation of every route.
+
+The event loop only parses HTTP and writes responses. Handlers run on a
+thread pool, so RSA signing and blocking boto3 calls of concurrent requests
+overlap, and the AWS clients are created once with a connection pool as
+large as the thread pool. Uses only the standard library plus the Lambda's
+own dependencies.
+
+Examples:
+    python3 lambda/server.py --port 8080                 # real AWS (needs the Lambda's env vars)
+    python3 lambda/server.py --stub --port 8080          # in-memory backends, generated key
+    python3 lambda/server.py --stub --latency-ms 5 --workers 64
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+KEEPALIVE_TIMEOUT = 75
+REQUEST_TIMEOUT = 30
+HEADER_LIMIT = 100
+
+REASONS = {
+    200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+    408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large', 414: 'URI Too Long',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def build_event(method, target, headers, body):
+    """
+    API Gateway proxy event for an HTTP request
+    """
+    url = urlsplit(target)
+    pairs = parse_qsl(url.query, keep_blank_values=True)
+    multi_query = {}
+    for name, value in pairs:
+        multi_query.setdefault(name, []).append(value)
+
+    return {
+        'resource': '/{proxy+}',
+        # API Gateway passes the path percent-decoded (file IDs hold filenames)
+        'path': unquote(url.path),
+        'httpMethod': method,
+        'headers': headers,
+        'multiValueHeaders': {name: [value] for name, value in headers.items()},
+        'queryStringParameters': {name: values[-1] for name, values in multi_query.items()} or None,
+        'multiValueQueryStringParameters': multi_query or None,
+        'pathParameters': None,
+        'requestContext': {
+            'httpMethod': method,
+            'path': url.path,
+            'requestTimeEpoch': int(time.time() * 1000),
+            'stage': 'local',
+        },
+        'body': body.decode('utf-8', errors='replace') if body else None,
+        'isBase64Encoded': False,
+    }
+
+
+def encode_response(response, keep_alive, head_only=False):
+    """
+    Raw HTTP/1.1 response bytes for a Lambda proxy response dict
+    """
+    status = response.get('statusCode', 200)
+    body = response.get('body') or b''
+    if isinstance(body, str):
+        body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+    for name, value in (response.get('headers') or {}).items():
+        lines.append(f"{name}: {value}")
+    for name, values in (response.get('multiValueHeaders') or {}).items():
+        for value in values:
+            lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(body)}")
+    lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    return head if head_only else head + body
+
+
+async def read_line(reader, status, message):
+    """
+    One CRLF-terminated line; a line over the stream limit is a BadRequest
+    """
+    try:
+        return await reader.readline()
+    except ValueError:
+        # readline raises LimitOverrunError as ValueError
+        raise BadRequest(status, message)
+
+
+async def read_request(reader):
+    """
+    Parse one request; returns (method, target, version, headers, body) or
+    None when the client closed the connection
+    Waits up to KEEPALIVE_TIMEOUT for the request line; the headers and body
+    that follow must arrive within REQUEST_TIMEOUT.
+    """
+    line = await asyncio.wait_for(read_line(reader, 414, 'Request line too long'), KEEPALIVE_TIMEOUT)
+    if not line:
+        return None
+    try:
+        return await asyncio.wait_for(read_request_rest(reader, line), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise BadRequest(408, 'Request not received in time')
+
+
+async def read_request_rest(reader, line):
+    """
+    Headers and body of a request whose request line has been read
+    """
+    try:
+        method, target, version = line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    except ValueError:
+        raise BadRequest(400, 'Malformed request line')
+
+    headers = {}
+    for _ in range(HEADER_LIMIT):
+        line = await read_line(reader, 431, 'Header line too long')
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip()] = value.strip()
+    else:
+        raise BadRequest(431, 'Too many headers')
+
+    lowered = {name.lower(): value for name, value in headers.items()}
+    if 'chunked' in lowered.get('transfer-encoding', '').lower():
+        raise BadRequest(411, 'Chunked request bodies are not supported')
+    try:
+        length = int(lowered.get('content-length', '0'))
+    except ValueError:
+        raise BadRequest(400, 'Invalid Content-Length')
+    if length < 0:
+        raise BadRequest(400, 'Invalid Content-Length')
+    if length > MAX_BODY_BYTES:
+        raise BadRequest(413, 'Request body too large')
+
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, version, headers, body
+
+
+class SigningServer:
+    """asyncio front end dispatching to index.lambda_handler on a thread pool"""
+
+    def __init__(self, index, workers=32):
+        self.index = index
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='handler')
+        self.requests = 0
+
+    def handle(self, event):
+        """Runs on a worker thread"""
+        path = event['path']
+        if path == '/healthz':
+            return {'statusCode': 200, 'headers': {'Content-Type': 'text/plain'}, 'body': 'ok'}
+        if event['httpMethod'] == 'OPTIONS':
+            # API Gateway answers CORS preflights itself; mirror its headers
+            response = self.index.create_response(204, {})
+            response['body'] = ''
+            return response
+        return self.index.lambda_handler(event, None)
+
+    async def serve_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    response = self.index.create_response(e.status, {'success': False, 'error': str(e)})
+                    writer.write(encode_response(response, keep_alive=False))
+                    await writer.drain()
+                    return
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                if request is None:
+                    return
+
+                method, target, version, headers, body = request
+                connection = next((v for k, v in headers.items() if k.lower() == 'connection'), '').lower()
+                keep_alive = connection != 'close' and (version != 'HTTP/1.0' or connection == 'keep-alive')
+
+                event = build_event('GET' if method == 'HEAD' else method, target, headers, body)
+                response = await loop.run_in_executor(self.executor, self.handle, event)
+                self.requests += 1
+
+                writer.write(encode_response(response, keep_alive, head_only=method == 'HEAD'))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, host, port):
+        server = await asyncio.start_server(self.serve_connection, host, port, backlog=1024)
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+            except NotImplementedError:
+                pass
+
+        # Key load and client setup happen before the first request
+        await loop.run_in_executor(self.executor, self.index.warm_up)
+
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving on {addresses} ({self.workers} handler threads)")
+        async with server:
+            await stop
+        print(f"Shutting down after {self.requests} request(s)")
+        self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Standalone HTTP server for the signing service')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '8080')))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVER_WORKERS', '32')),
+                        help='handler threads, also the AWS connection pool size (default 32)')
+    parser.add_argument('--stub', action='store_true', help='use in-memory AWS backends (benchmarks/stubs.py)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per stubbed AWS call')
+    args = parser.parse_args()
+
+    if args.stub:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+        from stubs import load_index
+        index, _ = load_index(latency_ms=args.latency_ms, fresh=False)
+    else:
+        # Warm-up happens once the server is up, not at import
+        os.environ['PRELOAD_SIGNING_KEY'] = 'false'
+        # One pooled connection per handler thread (boto3 clients are
+        # thread-safe and shared by all handlers)
+        os.environ.setdefault('AWS_MAX_POOL_CONNECTIONS', str(args.workers))
+        import index
+
+    asyncio.run(SigningServer(index, args.workers).run(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Export the file metadata table as NDJSON with a parallel scan
+
+The table is split into --segments DynamoDB scan segments (Segment /
+TotalSegments) that a pool of --workers threads scans concurrently. Each
+segment streams its pages straight to its own file in the work directory,
+so memory use does not grow with the table. Finished segments are recorded
+in <work-dir>/manifest.json; after an interruption, --resume scans only the
+segments that did not finish. The segment files are then concatenated into
+the output, either a local file or an S3 object written as a multipart
+upload.
+
+Numbers are written as JSON numbers, string/number sets as sorted lists and
+binary attributes as base64 strings. Rows/sec is reported while scanning.
+
+Examples:
+    python3 scripts/export-catalog.py --table cloudfront-signed-urls-demo-files-metadata --output catalog.ndjson
+    python3 scripts/export-catalog.py --output s3://my-bucket/exports/catalog.ndjson --segments 32 --workers 16
+    python3 scripts/export-catalog.py --output catalog.ndjson --resume          # after an interruption
+    python3 scripts/export-catalog.py --stub --stub-items 200000 --output /tmp/catalog.ndjson
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+MANIFEST = 'manifest.json'
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def json_default(value):
+    """
+    JSON encoding of the types boto3 returns for DynamoDB attributes
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(json_default(v) if isinstance(v, Decimal) else v for v in value)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    if hasattr(value, 'value') and isinstance(value.value, (bytes, bytearray)):
+        # boto3.dynamodb.types.Binary
+        return base64.b64encode(value.value).decode('ascii')
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def projection_params(attributes):
+    """
+    ProjectionExpression for a list of attribute names (placeholders avoid
+    clashes with reserved words such as status and size)
+    """
+    if not attributes:
+        return {}
+    names = {f"#a{i}": name for i, name in enumerate(attributes)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+
+def parse_s3_url(url):
+    """
+    (bucket, key) for s3://bucket/key, or None for a local path
+    """
+    if not url.startswith('s3://'):
+        return None
+    bucket, _, key = url[len('s3://'):].partition('/')
+    if not bucket or not key:
+        raise ValueError(f"Expected s3://bucket/key, got {url}")
+    return bucket, key
+
+
+class Progress:
+    """Thread-safe row counter with a periodic rows/sec report"""
+
+    def __init__(self, total_segments, interval=5.0):
+        self.total_segments = total_segments
+        self.interval = interval
+        self.rows = 0
+        self.segments_done = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, rows, segment_done=False):
+        with self._lock:
+            self.rows += rows
+            self.segments_done += segment_done
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        print(f"  {self.rows} rows, {self.rate():.0f} rows/s, "
+              f"{self.segments_done}/{self.total_segments} segments, {self.elapsed():.1f}s", flush=True)
+
+    def start(self):
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+
+class ExportManifest:
+    """
+    Finished segments of one export, persisted after every segment
+
+    A manifest is only reused for the same table, segment count and
+    projection; otherwise the segment boundaries would not line up.
+    """
+
+    def __init__(self, work_dir, settings):
+        self.work_dir = work_dir
+        self.path = os.path.join(work_dir, MANIFEST)
+        self.settings = settings
+        self.segments = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('settings') != self.settings:
+            raise ValueError(f"{self.path} belongs to a different export: {data.get('settings')}")
+        self.segments = {int(segment): info for segment, info in data.get('segments', {}).items()}
+        # A segment only counts as done if its file survived
+        self.segments = {segment: info for segment, info in self.segments.items()
+                         if os.path.exists(self.segment_path(segment))}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def segment_path(self, segment):
+        return os.path.join(self.work_dir, f"segment-{segment:05d}.ndjson")
+
+    def pending(self):
+        return [segment for segment in range(self.settings['total_segments']) if segment not in self.segments]
+
+    def mark_done(self, segment, info):
+        with self._lock:
+            self.segments[segment] = info
+            self.save()
+
+    def save(self):
+        data = {'settings': self.settings,
+                'segments': {str(segment): info for segment, info in sorted(self.segments.items())}}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def scan_segment(table, segment, total_segments, path, progress, page_size=None, scan_params=None):
+    """
+    Stream one scan segment to path as NDJSON; returns {'rows', 'bytes', 'seconds'}
+    The file appears under its final name only once the segment is complete.
+    """
+    started = time.perf_counter()
+    params = dict(scan_params or {}, Segment=segment, TotalSegments=total_segments)
+    if page_size:
+        params['Limit'] = page_size
+
+    rows = size = 0
+    tmp = path + '.partial'
+    with open(tmp, 'wb') as out:
+        while True:
+            response = table.scan(**params)
+            items = response.get('Items', [])
+            for item in items:
+                line = json.dumps(item, default=json_default, separators=(',', ':')).encode('utf-8') + b'\n'
+                out.write(line)
+                size += len(line)
+            rows += len(items)
+            progress.add(len(items))
+
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            params['ExclusiveStartKey'] = last_key
+    os.replace(tmp, path)
+    progress.add(0, segment_done=True)
+    return {'rows': rows, 'bytes': size, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def parallel_scan(table, manifest, workers, progress, page_size=None, scan_params=None):
+    """
+    Scan every pending segment of manifest on a pool of workers
+    Returns the number of segments that failed (their errors are printed)
+    """
+    total = manifest.settings['total_segments']
+
+    def run(segment):
+        info = scan_segment(table, segment, total, manifest.segment_path(segment),
+                            progress, page_size, scan_params)
+        manifest.mark_done(segment, info)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scan') as executor:
+        futures = {executor.submit(run, segment): segment for segment in manifest.pending()}
+        for future, segment in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                print(f"  Segment {segment} failed: {str(e)}", file=sys.stderr)
+    return failed
+
+
+def write_local(paths, output):
+    """
+    Concatenate segment files into output (replaced atomically)
+    """
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    tmp = output + '.partial'
+    with open(tmp, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(tmp, output)
+
+
+def iter_parts(paths, part_size):
+    """
+    Fixed-size chunks across the concatenation of paths; only the last
+    one may be smaller than part_size
+    """
+    buffer = bytearray()
+    for path in paths:
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(part_size - len(buffer))
+                if not data:
+                    break
+                buffer += data
+                if len(buffer) >= part_size:
+                    yield bytes(buffer)
+                    buffer = bytearray()
+    if buffer:
+        yield bytes(buffer)
+
+
+def write_s3(s3, bucket, key, paths, part_size, workers):
+    """
+    Upload the concatenated segment files to s3://bucket/key
+    Parts are uploaded concurrently with at most workers + 1 parts in
+    memory; the upload is aborted if any part fails.
+    """
+    total = sum(os.path.getsize(path) for path in paths)
+    content_type = 'application/x-ndjson'
+    if total <= part_size:
+        body = b''.join(iter_parts(paths, part_size))
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+        return 1
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)['UploadId']
+    slots = threading.BoundedSemaphore(workers + 1)
+
+    def upload(number, body):
+        try:
+            response = s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body)
+            return {'PartNumber': number, 'ETag': response['ETag']}
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upload') as executor:
+            futures = []
+            for number, body in enumerate(iter_parts(paths, part_size), start=1):
+                slots.acquire()
+                futures.append(executor.submit(upload, number, body))
+            parts = [future.result() for future in futures]
+        s3.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                     MultipartUpload={'Parts': parts})
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return len(parts)
+
+
+def seed_stub_table(index, backends, count):
+    """Fill the stub metadata table with count uploaded files"""
+    table = backends.table(index)
+    for i in range(count):
+        item = index.build_upload_item(f"export-{i}.bin", 'application/octet-stream')
+        item.update(status='uploaded', size=Decimal(1024 + i % 4096), content_length=Decimal(1024 + i % 4096))
+        table.items[item['file_id']] = item
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the file metadata table as NDJSON')
+    parser.add_argument('--table', default=os.environ.get('TABLE_NAME'),
+                        help='DynamoDB table (default: $TABLE_NAME)')
+    parser.add_argument('--output', required=True, help='local path or s3://bucket/key')
+    parser.add_argument('--segments', type=int, default=16, help='scan segments, TotalSegments (default 16)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent segment scans (default 8)')
+    parser.add_argument('--page-size', type=int, help='items per Scan call (default: 1 MB pages)')
+    parser.add_argument('--attributes', help='comma-separated attributes to export (default: all)')
+    parser.add_argument('--consistent-read', action='store_true', help='strongly consistent scan (2x read cost)')
+    parser.add_argument('--work-dir', help='segment files and manifest (default: <output>.segments)')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted export in --work-dir')
+    parser.add_argument('--keep-segments', action='store_true', help='keep the work directory afterwards')
+    parser.add_argument('--part-size-mb', type=int, default=16, help='S3 multipart part size (default 16)')
+    parser.add_argument('--progress-seconds', type=float, default=5.0, help='rows/sec report interval, 0 = off')
+    parser.add_argument('--stub', action='store_true', help='export an in-memory table (benchmarks/stubs.py)')
+    parser.add_argument('--stub-items', type=int, default=100000, help='items in the stub table (default 100000)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated latency per stubbed AWS call')
+    args = parser.parse_args()
+
+    if args.segments < 1 or args.workers < 1:
+        parser.error('--segments and --workers must be at least 1')
+    part_size = args.part_size_mb * 1024 * 1024
+    if part_size < MIN_PART_SIZE:
+        parser.error('--part-size-mb must be at least 5 (the S3 minimum part size)')
+    try:
+        destination = parse_s3_url(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.stub:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+        from stubs import load_index
+        index, backends = load_index(latency_ms=args.latency_ms)
+        print(f"Seeding stub table with {args.stub_items} items...")
+        table = seed_stub_table(index, backends, args.stub_items)
+        s3 = backends.s3
+        table_name = table.name
+    else:
+        if not args.table:
+            parser.error('--table or $TABLE_NAME is required')
+        sys.path.insert(0, LAMBDA_DIR)
+        import aws_clients
+
+        # Long scans: more patience per page and more retries on throttling
+        config = {'read_timeout': 60, 'retries': {'mode': 'adaptive', 'total_max_attempts': 10}}
+        table = aws_clients.resource('dynamodb', pool_size=args.workers, config=config).Table(args.table)
+        s3 = aws_clients.client('s3', pool_size=args.workers, config=config) if destination else None
+        table_name = args.table
+
+    attributes = [name.strip() for name in args.attributes.split(',') if name.strip()] if args.attributes else None
+    scan_params = projection_params(attributes)
+    if args.consistent_read:
+        scan_params['ConsistentRead'] = True
+
+    if args.work_dir:
+        work_dir = args.work_dir
+    elif destination:
+        work_dir = os.path.basename(destination[1]) + '.segments'
+    else:
+        work_dir = args.output + '.segments'
+
+    manifest = ExportManifest(work_dir, {'table': table_name, 'total_segments': args.segments,
+                                         'attributes': attributes})
+    if manifest.exists():
+        if not args.resume:
+            print(f"{manifest.path} exists; pass --resume to continue it or remove {work_dir}", file=sys.stderr)
+            return 2
+        try:
+            manifest.load()
+        except ValueError as e:
+            print(str(e), file=sys.stderr)
+            return 2
+        print(f"Resuming: {len(manifest.segments)}/{args.segments} segments already exported")
+    else:
+        os.makedirs(work_dir, exist_ok=True)
+        manifest.save()
+
+    pending = manifest.pending()
+    print(f"Scanning {table_name}: {len(pending)} segment(s) on {min(args.workers, max(len(pending), 1))} worker(s)...")
+    progress = Progress(len(pending), args.progress_seconds)
+    progress.start()
+    try:
+        failed = parallel_scan(table, manifest, args.workers, progress, args.page_size, scan_params)
+    finally:
+        progress.stop()
+    progress.report()
+    if failed:
+        print(f"{failed} segment(s) failed; rerun with --resume to retry them", file=sys.stderr)
+        return 1
+
+    paths = [manifest.segment_path(segment) for segment in range(args.segments)]
+    total_rows = sum(info['rows'] for info in manifest.segments.values())
+    total_bytes = sum(info['bytes'] for info in manifest.segments.values())
+
+    print(f"Writing {total_rows} rows ({total_bytes / 1048576:.1f} MB) to {args.output}...")
+    started = time.perf_counter()
+    if destination:
+        parts = write_s3(s3, destination[0], destination[1], paths, part_size, min(args.workers, 8))
+        print(f"  Uploaded {parts} part(s)")
+    else:
+        write_local(paths, args.output)
+    write_seconds = time.perf_counter() - started
+
+    if not args.keep_segments:
+        shutil.rmtree(work_dir)
+
+    print(json.dumps({
+        'table': table_name,
+        'output': args.output,
+        'rows': total_rows,
+        'bytes': total_bytes,
+        'segments': args.segments,
+        'workers': args.workers,
+        'scan_seconds': round(progress.elapsed(), 3),
+        'rows_per_second': round(progress.rate(), 1),
+        'write_seconds': round(write_seconds, 3),
+        'aws_calls': sys.modules['aws_clients'].stats()['services'] if 'aws_clients' in sys.modules else None,
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Measure Lambda cold-start cost of lambda/index.py
+
+Each sample runs in a fresh interpreter so module caches are cold, the same
+way a new Lambda execution environment sees them. Reports:
+  - import time of the handler module
+  - first /api/files/config invocation (needs no AWS dependencies)
+  - import time of the lazily loaded dependencies (boto3, botocore, cryptography)
+  - RSA private key parse time
+  - the slowest modules from `python -X importtime`
+  - optionally the full init-phase warm-up (--preload, needs AWS credentials)
+
+Use --max-import-ms / --max-config-ms to fail CI when startup regresses.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+# Placeholder configuration so the module can be imported outside Lambda
+DEFAULT_ENV = {
+    'BUCKET_NAME': 'cold-start-bucket',
+    'TABLE_NAME': 'cold-start-table',
+    'CLOUDFRONT_DOMAIN': 'cdn.example.com',
+    'CLOUDFRONT_KEY_PAIR_ID': 'KCOLDSTART',
+    'PRIVATE_KEY_SECRET_ARN': 'arn:aws:secretsmanager:us-east-1:000000000000:secret:cold-start',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+}
+
+SAMPLE_CODE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import index
+t1 = time.perf_counter()
+index.lambda_handler({'httpMethod': 'GET', 'path': '/api/files/config'}, None)
+t2 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'config_ms': (t2 - t1) * 1000,
+    'loaded': sorted(m for m in ('boto3', 'botocore', 'cryptography') if m in sys.modules),
+}))
+'''
+
+DEPENDENCY_CODE = r'''
+import json, time
+t0 = time.perf_counter()
+import boto3
+t1 = time.perf_counter()
+from botocore.signers import CloudFrontSigner
+t2 = time.perf_counter()
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+t3 = time.perf_counter()
+key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                        serialization.NoEncryption()).decode('utf-8')
+import index
+t4 = time.perf_counter()
+index.load_private_key(pem)
+t5 = time.perf_counter()
+print(json.dumps({
+    'boto3_ms': (t1 - t0) * 1000,
+    'botocore_signers_ms': (t2 - t1) * 1000,
+    'cryptography_ms': (t3 - t2) * 1000,
+    'key_parse_ms': (t5 - t4) * 1000,
+}))
+'''
+
+PRELOAD_CODE = r'''
+import json, time
+t0 = time.perf_counter()
+import index
+t1 = time.perf_counter()
+print(json.dumps({'init_ms': (t1 - t0) * 1000, 'key_loaded': bool(index.get_key_cache_stats().get('loaded_key_ids'))}))
+'''
+
+
+def run_sample(code, env, extra_args=()):
+    """Run code in a fresh interpreter and return its JSON output"""
+    result = subprocess.run(
+        [sys.executable, *extra_args, '-c', code],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    return json.loads(lines[-1]), result.stderr
+
+
+def summarize(samples, field):
+    values = sorted(sample[field] for sample in samples)
+    return {
+        'min': round(values[0], 2),
+        'median': round(statistics.median(values), 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def slowest_imports(env, top):
+    """Parse `python -X importtime` output for the slowest modules (cumulative)"""
+    _, stderr = run_sample(SAMPLE_CODE, env, extra_args=('-X', 'importtime'))
+    rows = []
+    for line in stderr.splitlines():
+        # Format: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{'module': name, 'cumulative_ms': round(cum / 1000, 2), 'self_ms': round(own / 1000, 2)}
+            for cum, own, name in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import and init time of the signing Lambda')
+    parser.add_argument('--runs', type=int, default=10, help='fresh-interpreter samples (default 10)')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to show (default 15)')
+    parser.add_argument('--preload', action='store_true',
+                        help='also time PRELOAD_SIGNING_KEY init (uses real AWS credentials and env)')
+    parser.add_argument('--max-import-ms', type=float, help='fail if median handler import exceeds this')
+    parser.add_argument('--max-config-ms', type=float, help='fail if median first config call exceeds this')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for name, value in DEFAULT_ENV.items():
+        env.setdefault(name, value)
+    env['PRELOAD_SIGNING_KEY'] = 'false'
+
+    print(f"Sampling cold imports ({args.runs} runs)...")
+    samples = [run_sample(SAMPLE_CODE, env)[0] for _ in range(args.runs)]
+    dependencies = [run_sample(DEPENDENCY_CODE, env)[0] for _ in range(max(1, args.runs // 2))]
+
+    results = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'handler_import_ms': summarize(samples, 'import_ms'),
+        'first_config_call_ms': summarize(samples, 'config_ms'),
+        'deps_loaded_by_config_route': samples[-1]['loaded'],
+        'deferred_dependencies_ms': {
+            field: summarize(dependencies, field)
+            for field in ('boto3_ms', 'botocore_signers_ms', 'cryptography_ms', 'key_parse_ms')
+        },
+        'slowest_imports': slowest_imports(env, args.top),
+    }
+
+    if args.preload:
+        preload_env = dict(env, PRELOAD_SIGNING_KEY='true')
+        preload = [run_sample(PRELOAD_CODE, preload_env)[0] for _ in range(max(1, args.runs // 2))]
+        results['preload_init_ms'] = summarize(preload, 'init_ms')
+        results['preload_key_loaded'] = all(sample['key_loaded'] for sample in preload)
+
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failures = []
+    if args.max_import_ms is not None and results['handler_import_ms']['median'] > args.max_import_ms:
+        failures.append(f"handler import {results['handler_import_ms']['median']}ms > {args.max_import_ms}ms")
+    if args.max_config_ms is not None and results['first_config_call_ms']['median'] > args.max_config_ms:
+        failures.append(f"first config call {results['first_config_call_ms']['median']}ms > {args.max_config_ms}ms")
+    if results['deps_loaded_by_config_route']:
+        failures.append(f"config route loaded {', '.join(results['deps_loaded_by_config_route'])}")
+
+    if failures:
+        print("\n❌ Cold-start regression:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+    print("\n✅ Cold-start budget OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Reconcile the uploads/ prefix of the bucket with the file metadata table
+
+Upload URLs are handed out after a `pending` row is written, so rows can
+exist for bytes that never arrived, and S3 delete errors are not fatal when
+a file is deleted, so objects can outlive their rows. This job finds both
+kinds of drift without loading either side into memory:
+
+  1. A parallel scan (Segment/TotalSegments) reads object_key, status and
+     timestamps of every row. Each worker sorts at most --run-size rows at
+     a time and spills them to a run file in the work directory.
+  2. list_objects_v2 pages, which S3 returns in key order, are streamed
+     (the next page is fetched while the current one is merged) and
+     merge-joined with a heap merge of the sorted runs.
+
+Findings:
+  orphan-object     object without a row (older than --min-age-hours)
+  stale-upload      pending row past --pending-hours, or multipart
+                    (uploading) row past its ttl, with no object
+  missing-object    uploaded row whose object is gone
+  unconfirmed       pending/uploading row whose object exists (the S3
+                    event was missed); reported only
+  recent-orphan / in-progress: too new to judge; counted, never fixed
+
+Nothing is changed unless --fix names the categories to repair: orphan
+objects are removed with DeleteObjects (1000 keys per call), rows with
+BatchWriteItem (25 per call), and open multipart uploads of stale rows are
+aborted first. --report writes every finding as NDJSON.
+
+Examples:
+    python3 scripts/reconcile-storage.py --table my-table --bucket my-bucket
+    python3 scripts/reconcile-storage.py --fix orphan-object,stale-upload --report drift.ndjson
+    python3 scripts/reconcile-storage.py --fix all --segments 32 --workers 16
+"""
+
+import argparse
+import heapq
+import importlib.util
+import itertools
+import json
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from operator import itemgetter
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FIXABLE = ('orphan-object', 'stale-upload', 'missing-object')
+ROW_ATTRIBUTES = ['file_id', 'object_key', 'status', 'upload_url_generated_at', 'ttl', 'upload_id']
+S3_DELETE_BATCH = 1000
+DYNAMODB_DELETE_BATCH = 25
+MAX_RETRIES = 5
+
+# Row records in the sorted runs: [object_key, file_id, status, stale_at, upload_id]
+KEY, FILE_ID, STATUS, STALE_AT, UPLOAD_ID = range(5)
+
+
+def _load_export_catalog():
+    # Shares the parallel-scan helpers of the sibling export script
+    spec = importlib.util.spec_from_file_location('export_catalog', os.path.join(SCRIPTS_DIR, 'export-catalog.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+export_catalog = _load_export_catalog()
+
+
+def epoch(value):
+    """
+    Unix time for an S3 LastModified (datetime) or an ISO timestamp written
+    by the Lambda (naive UTC); None when missing or unreadable
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def backoff_delay(attempt, base=0.05, cap=2.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def prefetch(iterable, depth=2):
+    """
+    Iterate over iterable with up to depth items produced ahead on a
+    background thread (overlaps S3 round trips with the merge)
+    """
+    items = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+class Reconciler:
+    """
+    One reconciliation pass over bucket/prefix and the metadata table
+
+    s3 is an S3 client, dynamodb a DynamoDB service resource (real or
+    benchmarks/stubs.py). fix lists the finding types to repair.
+    """
+
+    def __init__(self, s3, dynamodb, bucket, table_name, prefix='uploads/', segments=16, workers=8,
+                 run_size=100000, page_size=None, list_page_size=1000, min_object_age=24 * 3600,
+                 pending_age=24 * 3600, multipart_age=168 * 3600, fix=(), report=None, work_dir=None,
+                 progress_seconds=5.0, clock=time.time):
+        self.s3 = s3
+        self.dynamodb = dynamodb
+        self.table = dynamodb.Table(table_name)
+        self.bucket = bucket
+        self.table_name = table_name
+        self.prefix = prefix
+        self.segments = segments
+        self.workers = workers
+        self.run_size = run_size
+        self.page_size = page_size
+        self.list_page_size = list_page_size
+        self.min_object_age = min_object_age
+        self.pending_age = pending_age
+        self.multipart_age = multipart_age
+        self.fix = set(fix)
+        self.report = report
+        self.work_dir = work_dir
+        self.progress_seconds = progress_seconds
+        self.now = clock()
+
+        self.counts = dict.fromkeys(FIXABLE + ('unconfirmed', 'recent-orphan', 'in-progress', 'matched',
+                                               'outside-prefix'), 0)
+        self.objects_listed = 0
+        self.rows_scanned = 0
+        self.objects_deleted = 0
+        self.rows_deleted = 0
+        self.uploads_aborted = 0
+        self.errors = []
+        self._object_batch = []
+        self._row_batch = []
+
+    # -- DynamoDB side -----------------------------------------------------
+
+    def row_record(self, item):
+        status = item.get('status')
+        object_key = item.get('object_key') or f"uploads/{item['file_id']}"
+        stale_at = None
+        if status == 'pending':
+            generated = epoch(item.get('upload_url_generated_at'))
+            stale_at = generated + self.pending_age if generated is not None else None
+        elif status == 'uploading':
+            generated = epoch(item.get('upload_url_generated_at'))
+            stale_at = float(item['ttl']) if item.get('ttl') is not None else (
+                generated + self.multipart_age if generated is not None else None)
+        return [object_key, item['file_id'], status, stale_at, item.get('upload_id')]
+
+    def spill_segment(self, segment, run_dir, progress):
+        """
+        Scan one segment into sorted run files of at most run_size rows
+        """
+        params = dict(export_catalog.projection_params(ROW_ATTRIBUTES),
+                      Segment=segment, TotalSegments=self.segments)
+        if self.page_size:
+            params['Limit'] = self.page_size
+
+        runs = []
+        buffer = []
+
+        def flush():
+            buffer.sort(key=itemgetter(KEY))
+            path = os.path.join(run_dir, f"run-{segment:05d}-{len(runs):05d}.ndjson")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(record, separators=(',', ':')) + '\n' for record in buffer)
+            runs.append(path)
+            buffer.clear()
+
+        while True:
+            response = self.table.scan(**params)
+            items = response.get('Items', [])
+            for item in items:
+                buffer.append(self.row_record(item))
+                if len(buffer) >= self.run_size:
+                    flush()
+            progress.add(len(items))
+
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            params['ExclusiveStartKey'] = last_key
+        if buffer:
+            flush()
+        progress.add(0, segment_done=True)
+        return runs
+
+    def scan_runs(self, run_dir):
+        """
+        Parallel scan into sorted runs; returns the run file paths
+        """
+        progress = export_catalog.Progress(self.segments, self.progress_seconds)
+        progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scan') as executor:
+                futures = [executor.submit(self.spill_segment, segment, run_dir, progress)
+                           for segment in range(self.segments)]
+                runs = [path for future in futures for path in future.result()]
+        finally:
+            progress.stop()
+        self.rows_scanned = progress.rows
+        return runs
+
+    @staticmethod
+    def read_run(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def sorted_rows(self, runs):
+        return heapq.merge(*(self.read_run(path) for path in runs), key=itemgetter(KEY))
+
+    # -- S3 side -----------------------------------------------------------
+
+    def object_pages(self):
+        params = {'Bucket': self.bucket, 'Prefix': self.prefix, 'MaxKeys': self.list_page_size}
+        while True:
+            response = self.s3.list_objects_v2(**params)
+            yield [(obj['Key'], epoch(obj.get('LastModified'))) for obj in response.get('Contents', [])]
+            if not response.get('IsTruncated'):
+                return
+            params['ContinuationToken'] = response['NextContinuationToken']
+
+    def sorted_objects(self):
+        for page in prefetch(self.object_pages()):
+            self.objects_listed += len(page)
+            yield from page
+
+    # -- Merge -------------------------------------------------------------
+
+    def merge(self, objects, rows):
+        """
+        Full outer join of two key-ordered streams:
+        yields (object_key, (key, last_modified) or None, [row records])
+        """
+        groups = itertools.groupby(rows, key=itemgetter(KEY))
+        obj = next(objects, None)
+        group = next(groups, None)
+        while obj is not None or group is not None:
+            if group is None or (obj is not None and obj[0] < group[0]):
+                yield obj[0], obj, []
+                obj = next(objects, None)
+            elif obj is None or group[0] < obj[0]:
+                yield group[0], None, list(group[1])
+                group = next(groups, None)
+            else:
+                yield obj[0], obj, list(group[1])
+                obj = next(objects, None)
+                group = next(groups, None)
+
+    def classify(self, object_key, obj, rows):
+        """
+        (finding type, row or None) pairs for one key
+        """
+        if not rows:
+            last_modified = obj[1]
+            if last_modified is not None and self.now - last_modified < self.min_object_age:
+                return [('recent-orphan', None)]
+            return [('orphan-object', None)]
+
+        if not object_key.startswith(self.prefix):
+            return [('outside-prefix', row) for row in rows]
+
+        findings = []
+        for row in rows:
+            if row[STATUS] in ('pending', 'uploading'):
+                if obj is not None:
+                    findings.append(('unconfirmed', row))
+                elif row[STALE_AT] is not None and row[STALE_AT] <= self.now:
+                    findings.append(('stale-upload', row))
+                else:
+                    findings.append(('in-progress', row))
+            elif obj is None:
+                findings.append(('missing-object', row))
+            else:
+                findings.append(('matched', row))
+        return findings
+
+    # -- Repairs -----------------------------------------------------------
+
+    def delete_object(self, object_key):
+        self._object_batch.append(object_key)
+        if len(self._object_batch) >= S3_DELETE_BATCH:
+            self.flush_objects()
+
+    def delete_row(self, row):
+        if row[STATUS] == 'uploading' and row[UPLOAD_ID]:
+            try:
+                self.s3.abort_multipart_upload(Bucket=self.bucket, Key=row[KEY], UploadId=row[UPLOAD_ID])
+                self.uploads_aborted += 1
+            except Exception as e:
+                # NoSuchUpload: S3 already cleaned it up
+                if getattr(e, 'response', {}).get('Error', {}).get('Code') != 'NoSuchUpload':
+                    self.errors.append({'file_id': row[FILE_ID], 'error': str(e)})
+                    return
+        self._row_batch.append(row[FILE_ID])
+        if len(self._row_batch) >= DYNAMODB_DELETE_BATCH:
+            self.flush_rows()
+
+    def flush_objects(self):
+        batch, self._object_batch = self._object_batch, []
+        if not batch:
+            return
+        try:
+            response = self.s3.delete_objects(Bucket=self.bucket,
+                                              Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+        except Exception as e:
+            self.errors.extend({'object_key': key, 'error': str(e)} for key in batch)
+            return
+        errors = response.get('Errors', [])
+        self.errors.extend({'object_key': error.get('Key'), 'error': error.get('Message', error.get('Code'))}
+                           for error in errors)
+        self.objects_deleted += len(batch) - len(errors)
+
+    def flush_rows(self):
+        batch, self._row_batch = self._row_batch, []
+        pending = [{'DeleteRequest': {'Key': {'file_id': file_id}}} for file_id in batch]
+        attempt = 0
+        while pending:
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: pending})
+            except Exception as e:
+                self.errors.extend({'file_id': request['DeleteRequest']['Key']['file_id'], 'error': str(e)}
+                                   for request in pending)
+                return
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            self.rows_deleted += len(pending) - len(unprocessed)
+            pending = unprocessed
+            if not pending:
+                return
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                self.errors.extend({'file_id': request['DeleteRequest']['Key']['file_id'],
+                                    'error': 'Write throttled, retry later'} for request in pending)
+                return
+            time.sleep(backoff_delay(attempt))
+
+    # -- Driver ------------------------------------------------------------
+
+    def run(self):
+        """
+        Scan, merge, report and (optionally) repair; returns a summary dict
+        """
+        started = time.perf_counter()
+        run_dir = tempfile.mkdtemp(prefix='reconcile-', dir=self.work_dir)
+        report = open(self.report, 'w', encoding='utf-8') if self.report else None
+        try:
+            runs = self.scan_runs(run_dir)
+            scan_seconds = time.perf_counter() - started
+
+            merge_started = time.perf_counter()
+            keys = 0
+            for object_key, obj, rows in self.merge(self.sorted_objects(), self.sorted_rows(runs)):
+                keys += 1
+                for finding, row in self.classify(object_key, obj, rows):
+                    self.counts[finding] += 1
+                    if finding in ('matched', 'outside-prefix'):
+                        continue
+                    if report:
+                        entry = {'type': finding, 'object_key': object_key}
+                        if row is not None:
+                            entry.update(file_id=row[FILE_ID], status=row[STATUS])
+                        report.write(json.dumps(entry) + '\n')
+                    if finding in self.fix:
+                        if row is None:
+                            self.delete_object(object_key)
+                        else:
+                            self.delete_row(row)
+            self.flush_objects()
+            self.flush_rows()
+            merge_seconds = time.perf_counter() - merge_started
+        finally:
+            if report:
+                report.close()
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'bucket': self.bucket,
+            'prefix': self.prefix,
+            'table': self.table_name,
+            'objects_listed': self.objects_listed,
+            'rows_scanned': self.rows_scanned,
+            'runs': len(runs),
+            'keys_merged': keys,
+            'findings': {name: count for name, count in self.counts.items() if count},
+            'fixed': {'objects_deleted': self.objects_deleted, 'rows_deleted': self.rows_deleted,
+                      'uploads_aborted': self.uploads_aborted, 'categories': sorted(self.fix)},
+            'errors': len(self.errors),
+            'scan_seconds': round(scan_seconds, 3),
+            'merge_seconds': round(merge_seconds, 3),
+            'total_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows_scanned / scan_seconds, 1) if scan_seconds else 0.0,
+            'keys_per_second': round(keys / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def parse_fix(value):
+    if not value:
+        return ()
+    categories = [name.strip() for name in value.split(',') if name.strip()]
+    if categories == ['all']:
+        return FIXABLE
+    unknown = set(categories) - set(FIXABLE)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown categories {sorted(unknown)}; choose from {', '.join(FIXABLE)}")
+    return tuple(categories)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find and repair drift between the bucket and the metadata table')
+    parser.add_argument('--table', default=os.environ.get('TABLE_NAME'), help='metadata table (default: $TABLE_NAME)')
+    parser.add_argument('--bucket', default=os.environ.get('BUCKET_NAME'), help='bucket (default: $BUCKET_NAME)')
+    parser.add_argument('--prefix', default='uploads/', help='object prefix to reconcile (default uploads/)')
+    parser.add_argument('--segments', type=int, default=16, help='scan segments, TotalSegments (default 16)')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent segment scans (default 8)')
+    parser.add_argument('--run-size', type=int, default=100000,
+                        help='rows each worker sorts in memory before spilling (default 100000)')
+    parser.add_argument('--page-size', type=int, help='items per Scan call (default: 1 MB pages)')
+    parser.add_argument('--min-age-hours', type=float, default=24,
+                        help='ignore objects without a row newer than this (default 24)')
+    parser.add_argument('--pending-hours', type=float, default=24,
+                        help='pending rows older than this are stale (default 24)')
+    parser.add_argument('--fix', type=parse_fix, default=(), metavar='CATEGORIES',
+                        help=f"comma-separated categories to repair ({', '.join(FIXABLE)}) or 'all'")
+    parser.add_argument('--report', help='write findings as NDJSON to this file')
+    parser.add_argument('--work-dir', help='directory for the sorted runs (default: system temp)')
+    parser.add_argument('--progress-seconds', type=float, default=5.0, help='scan progress interval, 0 = off')
+    args = parser.parse_args()
+
+    if not args.table or not args.bucket:
+        parser.error('--table/$TABLE_NAME and --bucket/$BUCKET_NAME are required')
+
+    sys.path.insert(0, os.path.join(SCRIPTS_DIR, '..', 'lambda'))
+    import aws_clients
+
+    config = {'read_timeout': 60, 'retries': {'mode': 'adaptive', 'total_max_attempts': 10}}
+    reconciler = Reconciler(
+        aws_clients.client('s3', pool_size=args.workers, config=config),
+        aws_clients.resource('dynamodb', pool_size=args.workers, config=config), args.bucket, args.table,
+        prefix=args.prefix, segments=args.segments, workers=args.workers, run_size=args.run_size,
+        page_size=args.page_size, min_object_age=args.min_age_hours * 3600,
+        pending_age=args.pending_hours * 3600, fix=args.fix, report=args.report, work_dir=args.work_dir,
+        progress_seconds=args.progress_seconds
+    )
+
+    mode = f"fixing {', '.join(sorted(args.fix))}" if args.fix else 'report only'
+    print(f"Reconciling s3://{args.bucket}/{args.prefix} with {args.table} ({mode})...")
+    summary = reconciler.run()
+    summary['aws_calls'] = aws_clients.stats()['services']
+    print(json.dumps(summary, indent=2))
+    for error in reconciler.errors[:10]:
+        print(f"  ✗ {error}", file=sys.stderr)
+    return 1 if reconciler.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
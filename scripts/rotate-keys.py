@@ -1,11 +1,17 @@
-import boto3
-import OpenSSL
+import os
+import sys
 import time
 
-# Initialize AWS clients
-cloudfront = boto3.client('cloudfront')
-secretsmanager = boto3.client('secretsmanager')
-ssm = boto3.client('ssm')
+import OpenSSL
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+import aws_clients  # noqa: E402
+
+# Initialize AWS clients (control-plane calls: allow slower responses and more retries)
+CLIENT_CONFIG = {'read_timeout': 30, 'retries': {'mode': 'adaptive', 'total_max_attempts': 5}}
+cloudfront = aws_clients.client('cloudfront', config=CLIENT_CONFIG)
+secretsmanager = aws_clients.client('secretsmanager', config=CLIENT_CONFIG)
+ssm = aws_clients.client('ssm', config=CLIENT_CONFIG)
 
 PROJECT_NAME = "cloudfront-signed-urls-demo"
 
@@ -117,6 +123,10 @@ def rotate_keys():
         print(f"\n❌ An error occurred during key rotation: {e}")
         # Add rollback logic here if necessary
 
+    for service, counters in aws_clients.stats()['services'].items():
+        if counters['retries'] or counters['throttles']:
+            print(f"  - {service}: {counters['retries']} retries, {counters['throttles']} throttled responses")
+
 if __name__ == "__main__":
     rotate_keys()
 
@@ -45,7 +45,8 @@ echo "Step 3: Creating updated configuration..."
 # Extract just the DistributionConfig
 jq '.DistributionConfig' /tmp/cf-config.json > /tmp/cf-dist-config.json
 
-# Add ordered cache behavior for /uploads/*
+# Add ordered cache behavior for /uploads/* ("*" also spans the hashed
+# uploads/ab/cd/ prefixes of the sharded key layout)
 jq --arg key_group_id "$KEY_GROUP_ID" '
 .CacheBehaviors = {
   "Quantity": 1,
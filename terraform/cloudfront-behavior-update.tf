@@ -2,6 +2,9 @@
 # This configuration allows:
 # - /uploads/* - PUT operations without OAC (for uploads)
 # - /* (default) - GET operations with OAC (for downloads)
+# Both key layouts live under uploads/: flat uploads/<file_id> and sharded
+# uploads/ab/cd/<file_id> (var.key_layout). "*" in a path pattern also
+# matches "/", so the one behavior covers every shard of either layout.
 
 resource "aws_cloudfront_distribution" "main" {
   enabled             = true
@@ -22,8 +25,9 @@ resource "aws_cloudfront_distribution" "main" {
 
   # BEHAVIOR 1: /uploads/* - For file uploads (PUT operations)
   # No OAC - allows CloudFront to forward PUT requests to S3
+  # Matches flat and sharded keys alike (/uploads/ab/cd/<file_id>)
   ordered_cache_behavior {
-    path_pattern     = "/uploads/*"
+    path_pattern     = "/${local.upload_prefix}*"
     target_origin_id = "S3-${aws_s3_bucket.main.id}"
     
     # Allow all HTTP methods including PUT
@@ -134,7 +138,8 @@ resource "aws_s3_bucket_policy" "main" {
           }
         }
       },
-      # Allow CloudFront to write objects to /uploads/* (for uploads)
+      # Allow CloudFront to write objects to /uploads/* (for uploads),
+      # including the hashed sub-prefixes of the sharded key layout
       {
         Sid    = "AllowCloudFrontPutUploads"
         Effect = "Allow"
@@ -142,7 +147,7 @@ resource "aws_s3_bucket_policy" "main" {
           Service = "cloudfront.amazonaws.com"
         }
         Action   = "s3:PutObject"
-        Resource = "${aws_s3_bucket.main.arn}/uploads/*"
+        Resource = "${aws_s3_bucket.main.arn}/${local.upload_prefix}*"
         Condition = {
           StringEquals = {
             "AWS:SourceArn" = aws_cloudfront_distribution.main.arn
@@ -10,12 +10,34 @@ resource "aws_dynamodb_table" "main" {
     type = "S"
   }
   
+  attribute {
+    name = "status"
+    type = "S"
+  }
+  
+  attribute {
+    name = "upload_url_generated_at"
+    type = "S"
+  }
+  
+  # Listing by status / upload time without a full-table Scan
+  global_secondary_index {
+    name            = local.status_index_name
+    hash_key        = "status"
+    range_key       = "upload_url_generated_at"
+    projection_type = "ALL"
+  }
+  
   # TTL configuration
   ttl {
     enabled        = var.dynamodb_ttl_enabled
     attribute_name = var.dynamodb_ttl_attribute
   }
   
+  # Expired items release their content references (metadata-expiry.tf)
+  stream_enabled   = true
+  stream_view_type = "OLD_IMAGE"
+  
   # Point-in-time recovery
   point_in_time_recovery {
     enabled = var.enable_point_in_time_recovery
@@ -34,3 +56,31 @@ resource "aws_dynamodb_table" "main" {
   )
 }
 
+
+# Content-hash index for upload deduplication
+# Maps a verified SHA-256 digest to the stored object and its reference count
+resource "aws_dynamodb_table" "content_index" {
+  name         = local.content_index_table_name
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "content_hash"
+  
+  attribute {
+    name = "content_hash"
+    type = "S"
+  }
+  
+  point_in_time_recovery {
+    enabled = var.enable_point_in_time_recovery
+  }
+  
+  server_side_encryption {
+    enabled = true
+  }
+  
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "${var.project_name}-content-index"
+    }
+  )
+}
@@ -42,10 +42,29 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:DeleteItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem",
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
-        Resource = aws_dynamodb_table.main.arn
+        Resource = [
+          aws_dynamodb_table.main.arn,
+          "${aws_dynamodb_table.main.arn}/index/*",
+          aws_dynamodb_table.content_index.arn
+        ]
+      },
+      {
+        Sid    = "DynamoDBStreamAccess"
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = [
+          aws_dynamodb_table.main.stream_arn
+        ]
       },
       {
         Sid    = "SecretsManagerAccess"
@@ -67,7 +86,9 @@ resource "aws_iam_role_policy" "lambda_policy" {
         ]
         Resource = [
           aws_ssm_parameter.active_key_id.arn,
-          aws_ssm_parameter.active_secret_arn.arn
+          aws_ssm_parameter.active_secret_arn.arn,
+          aws_ssm_parameter.inactive_key_id.arn,
+          aws_ssm_parameter.inactive_secret_arn.arn
         ]
       },
       {
@@ -77,7 +98,9 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "s3:PutObject",
           "s3:GetObject",
           "s3:DeleteObject",
-          "s3:ListBucket"
+          "s3:ListBucket",
+          "s3:AbortMultipartUpload",
+          "s3:ListMultipartUploadParts"
         ]
         Resource = [
           aws_s3_bucket.main.arn,
@@ -92,7 +115,11 @@ resource "aws_iam_role_policy" "lambda_policy" {
           "logs:CreateLogStream",
           "logs:PutLogEvents"
         ]
-        Resource = "arn:aws:logs:${var.aws_region}:${data.aws_caller_identity.current.account_id}:log-group:/aws/lambda/${local.function_name}:*"
+        Resource = [
+          "arn:aws:logs:${var.aws_region}:${data.aws_caller_identity.current.account_id}:log-group:/aws/lambda/${local.function_name}:*",
+          "arn:aws:logs:${var.aws_region}:${data.aws_caller_identity.current.account_id}:log-group:/aws/lambda/${local.upload_events_function_name}:*",
+          "arn:aws:logs:${var.aws_region}:${data.aws_caller_identity.current.account_id}:log-group:/aws/lambda/${local.metadata_expiry_function_name}:*"
+        ]
       }
     ]
   })
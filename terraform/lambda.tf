@@ -13,13 +13,20 @@ resource "aws_lambda_function" "main" {
   
   environment {
     variables = {
-      BUCKET_NAME              = aws_s3_bucket.main.id
-      TABLE_NAME               = aws_dynamodb_table.main.name
-      CLOUDFRONT_DOMAIN        = var.custom_domain_enabled && var.domain_name != "" ? local.full_domain_name : aws_cloudfront_distribution.main.domain_name
-      UPLOAD_EXPIRATION        = tostring(var.upload_expiration)
-      DOWNLOAD_EXPIRATION      = tostring(var.download_expiration)
-      ACTIVE_KEY_ID_PARAM      = aws_ssm_parameter.active_key_id.name
-      ACTIVE_SECRET_ARN_PARAM  = aws_ssm_parameter.active_secret_arn.name
+      BUCKET_NAME               = aws_s3_bucket.main.id
+      TABLE_NAME                = aws_dynamodb_table.main.name
+      STATUS_INDEX_NAME         = local.status_index_name
+      CLOUDFRONT_DOMAIN         = var.custom_domain_enabled && var.domain_name != "" ? local.full_domain_name : aws_cloudfront_distribution.main.domain_name
+      UPLOAD_EXPIRATION         = tostring(var.upload_expiration)
+      DOWNLOAD_EXPIRATION       = tostring(var.download_expiration)
+      ACTIVE_KEY_ID_PARAM       = aws_ssm_parameter.active_key_id.name
+      ACTIVE_SECRET_ARN_PARAM   = aws_ssm_parameter.active_secret_arn.name
+      INACTIVE_KEY_ID_PARAM     = aws_ssm_parameter.inactive_key_id.name
+      INACTIVE_SECRET_ARN_PARAM = aws_ssm_parameter.inactive_secret_arn.name
+      KEY_CACHE_TTL             = "300"
+      CONTENT_INDEX_TABLE_NAME  = aws_dynamodb_table.content_index.name
+      KEY_LAYOUT                = var.key_layout
+      KEY_SHARD_LEVELS          = tostring(var.key_shard_levels)
     }
   }
   
@@ -49,10 +49,16 @@ data "aws_route53_zone" "main" {
 
 # Local Variables
 locals {
-  full_domain_name = var.custom_domain_enabled && var.domain_name != "" ? "${var.subdomain}.${var.domain_name}" : ""
-  bucket_name      = "${var.project_name}-${data.aws_caller_identity.current.account_id}-${random_string.suffix.result}"
-  table_name       = "${var.project_name}-files-metadata"
-  function_name    = "${var.project_name}-api"
+  full_domain_name         = var.custom_domain_enabled && var.domain_name != "" ? "${var.subdomain}.${var.domain_name}" : ""
+  bucket_name              = "${var.project_name}-${data.aws_caller_identity.current.account_id}-${random_string.suffix.result}"
+  table_name               = "${var.project_name}-files-metadata"
+  status_index_name        = "status-uploaded-at-index"
+  content_index_table_name = "${var.project_name}-content-index"
+  function_name            = "${var.project_name}-api"
+  # Every object key starts with this prefix in both key layouts; CloudFront
+  # path patterns and bucket policies match the sharded uploads/ab/cd/<file_id>
+  # keys through the trailing wildcard, which spans "/"
+  upload_prefix            = "uploads/"
   
   common_tags = merge(
     var.tags,
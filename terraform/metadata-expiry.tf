@@ -0,0 +1,77 @@
+# Metadata Expiry Events
+# DynamoDB TTL deletes expired metadata items without going through the API,
+# so nothing releases the content-index reference a deduplicated item holds.
+# The table stream invokes the Python handler (index.expiry_event_handler) for
+# TTL deletes only; it releases those references and deletes shared objects
+# with the last one. Build the package with lambda/build.sh.
+
+locals {
+  metadata_expiry_function_name = "${var.project_name}-metadata-expiry"
+}
+
+# Lambda Function
+resource "aws_lambda_function" "metadata_expiry" {
+  filename         = local.upload_events_package
+  function_name    = local.metadata_expiry_function_name
+  role             = aws_iam_role.lambda_role.arn
+  handler          = "index.expiry_event_handler"
+  source_code_hash = fileexists(local.upload_events_package) ? filebase64sha256(local.upload_events_package) : null
+  runtime          = var.lambda_runtime
+  memory_size      = 256
+  timeout          = 60
+  
+  environment {
+    variables = {
+      BUCKET_NAME              = aws_s3_bucket.main.id
+      TABLE_NAME               = aws_dynamodb_table.main.name
+      CONTENT_INDEX_TABLE_NAME = aws_dynamodb_table.content_index.name
+      CLOUDFRONT_DOMAIN        = var.custom_domain_enabled && var.domain_name != "" ? local.full_domain_name : aws_cloudfront_distribution.main.domain_name
+    }
+  }
+  
+  tags = merge(
+    local.common_tags,
+    {
+      Name = local.metadata_expiry_function_name
+    }
+  )
+  
+  depends_on = [
+    aws_iam_role_policy_attachment.lambda_basic,
+    aws_iam_role_policy.lambda_policy
+  ]
+}
+
+# CloudWatch Log Group
+resource "aws_cloudwatch_log_group" "metadata_expiry" {
+  count = var.enable_cloudwatch_logs ? 1 : 0
+  
+  name              = "/aws/lambda/${local.metadata_expiry_function_name}"
+  retention_in_days = var.log_retention_days
+  
+  tags = local.common_tags
+}
+
+# Stream of the metadata table, filtered to deletes made by TTL
+resource "aws_lambda_event_source_mapping" "metadata_expiry" {
+  event_source_arn  = aws_dynamodb_table.main.stream_arn
+  function_name     = aws_lambda_function.metadata_expiry.arn
+  starting_position = "LATEST"
+  batch_size        = 100
+  
+  # The handler reports the first record it could not process; the stream
+  # retries from there, so earlier references are never released twice
+  function_response_types = ["ReportBatchItemFailures"]
+  
+  filter_criteria {
+    filter {
+      pattern = jsonencode({
+        eventName = ["REMOVE"]
+        userIdentity = {
+          type        = ["Service"]
+          principalId = ["dynamodb.amazonaws.com"]
+        }
+      })
+    }
+  }
+}
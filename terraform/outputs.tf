@@ -80,6 +80,16 @@ output "lambda_function_arn" {
   value       = aws_lambda_function.main.arn
 }
 
+output "upload_events_function_name" {
+  description = "Lambda function handling S3 upload completion events"
+  value       = aws_lambda_function.upload_events.function_name
+}
+
+output "metadata_expiry_function_name" {
+  description = "Lambda function releasing content references of expired metadata"
+  value       = aws_lambda_function.metadata_expiry.function_name
+}
+
 output "lambda_role_arn" {
   description = "Lambda execution role ARN"
   value       = aws_iam_role.lambda_role.arn
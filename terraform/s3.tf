@@ -59,15 +59,13 @@ resource "aws_s3_bucket_cors_configuration" "main" {
   }
 }
 
-# Lifecycle policy (optional)
+# Lifecycle policy (object expiry is optional)
 resource "aws_s3_bucket_lifecycle_configuration" "main" {
-  count = var.s3_lifecycle_enabled ? 1 : 0
-  
   bucket = aws_s3_bucket.main.id
   
   rule {
     id     = "expire-old-files"
-    status = "Enabled"
+    status = var.s3_lifecycle_enabled ? "Enabled" : "Disabled"
     
     expiration {
       days = var.s3_lifecycle_expiration_days
@@ -77,6 +75,16 @@ resource "aws_s3_bucket_lifecycle_configuration" "main" {
       noncurrent_days = 7
     }
   }
+  
+  # Free the parts of multipart uploads that were never completed or aborted
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+    
+    abort_incomplete_multipart_upload {
+      days_after_initiation = var.multipart_upload_expiration_days
+    }
+  }
 }
 
 # S3 Bucket Policy for CloudFront OAC
@@ -0,0 +1,77 @@
+# Upload Completion Events
+# S3 ObjectCreated notifications on uploads/ invoke the Python handler
+# (index.s3_event_handler), which marks metadata items as uploaded with
+# size, ETag and completion time. Build the package with lambda/build.sh.
+
+locals {
+  upload_events_package       = "${path.module}/../lambda/lambda.zip"
+  upload_events_function_name = "${var.project_name}-upload-events"
+}
+
+# Lambda Function
+resource "aws_lambda_function" "upload_events" {
+  filename         = local.upload_events_package
+  function_name    = local.upload_events_function_name
+  role             = aws_iam_role.lambda_role.arn
+  handler          = "index.s3_event_handler"
+  source_code_hash = fileexists(local.upload_events_package) ? filebase64sha256(local.upload_events_package) : null
+  runtime          = var.lambda_runtime
+  memory_size      = 256
+  timeout          = 60
+  
+  environment {
+    variables = {
+      BUCKET_NAME              = aws_s3_bucket.main.id
+      TABLE_NAME               = aws_dynamodb_table.main.name
+      CONTENT_INDEX_TABLE_NAME = aws_dynamodb_table.content_index.name
+      CLOUDFRONT_DOMAIN        = var.custom_domain_enabled && var.domain_name != "" ? local.full_domain_name : aws_cloudfront_distribution.main.domain_name
+      KEY_LAYOUT               = var.key_layout
+      KEY_SHARD_LEVELS         = tostring(var.key_shard_levels)
+    }
+  }
+  
+  tags = merge(
+    local.common_tags,
+    {
+      Name = local.upload_events_function_name
+    }
+  )
+  
+  depends_on = [
+    aws_iam_role_policy_attachment.lambda_basic,
+    aws_iam_role_policy.lambda_policy
+  ]
+}
+
+# CloudWatch Log Group
+resource "aws_cloudwatch_log_group" "upload_events" {
+  count = var.enable_cloudwatch_logs ? 1 : 0
+  
+  name              = "/aws/lambda/${local.upload_events_function_name}"
+  retention_in_days = var.log_retention_days
+  
+  tags = local.common_tags
+}
+
+# Allow S3 to invoke the function
+resource "aws_lambda_permission" "upload_events_s3" {
+  statement_id   = "AllowS3Invoke"
+  action         = "lambda:InvokeFunction"
+  function_name  = aws_lambda_function.upload_events.function_name
+  principal      = "s3.amazonaws.com"
+  source_arn     = aws_s3_bucket.main.arn
+  source_account = data.aws_caller_identity.current.account_id
+}
+
+# S3 Notification (covers single PUTs and completed multipart uploads)
+resource "aws_s3_bucket_notification" "upload_events" {
+  bucket = aws_s3_bucket.main.id
+  
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.upload_events.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = local.upload_prefix
+  }
+  
+  depends_on = [aws_lambda_permission.upload_events_s3]
+}
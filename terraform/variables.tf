@@ -107,6 +107,29 @@ variable "s3_lifecycle_expiration_days" {
   default     = 30
 }
 
+variable "multipart_upload_expiration_days" {
+  description = "Days before incomplete multipart uploads are aborted"
+  type        = number
+  default     = 7
+}
+
+variable "key_layout" {
+  description = "Object key layout for new uploads: flat (uploads/<file_id>) or sharded (uploads/ab/cd/<file_id>)"
+  type        = string
+  default     = "flat"
+
+  validation {
+    condition     = contains(["flat", "sharded"], var.key_layout)
+    error_message = "key_layout must be flat or sharded."
+  }
+}
+
+variable "key_shard_levels" {
+  description = "Hashed prefix segments per key in the sharded layout"
+  type        = number
+  default     = 2
+}
+
 # CloudFront Configuration
 variable "cloudfront_price_class" {
   description = "CloudFront distribution price class"